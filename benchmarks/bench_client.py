@@ -0,0 +1,548 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+from unittest.mock import patch
+
+from benchmarks.common import canned_response, fake_client, percentiles, timed
+from lambda_cloud.bulk import BulkOperations
+from lambda_cloud.cache import PersistentCache, ResponseCache
+from lambda_cloud.capacity import CapacityWatcher
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.coalesce import SingleFlight
+from lambda_cloud.polling import AdaptiveInterval
+from lambda_cloud.pool import ClientPool
+from lambda_cloud.rate_limit import RateLimiter
+from lambda_cloud.resilience import CircuitBreaker, HedgePolicy
+from lambda_cloud.selector import InstanceSelector
+from lambda_cloud.ssh_key_index import SshKeyIndex
+from lambda_cloud.testing import FakeLambdaCloud
+from lambda_cloud.transport import RecordingTransport, ReplayTransport
+from lambda_cloud.warm_pool import WarmPool
+from utilities import get_json_backend
+
+
+def bench_overhead(scale: float) -> Dict[str, Any]:
+    """
+    per-call cost of the client with the network taken out, and over loopback next to a bare session call
+    """
+    iterations = int(2000 * scale)
+    response = canned_response({"data": [{"id": "key", "name": "macbook-pro", "public_key": "ssh-ed25519 AAAA"}]})
+
+    with FakeLambdaCloud() as fake:
+        client = fake_client(fake)
+        with patch.object(client.session, "request", return_value=response):
+            in_process = timed(client.ssh_keys.get_ssh_keys, iterations)
+
+        url = f"{fake.base_url}/v1/ssh-keys"
+        headers = client.ssh_keys.headers
+        bare = timed(lambda: client.session.get(url, headers=headers).json(), iterations // 4)
+        wrapped = timed(client.ssh_keys.get_ssh_keys, iterations // 4)
+        client.close()
+
+    return {
+        "in_process": percentiles(in_process),
+        "loopback_bare_session": percentiles(bare),
+        "loopback_client": percentiles(wrapped),
+    }
+
+
+def bench_throughput(scale: float) -> Dict[str, Any]:
+    """
+    requests per second listing instances sequentially, from a thread pool and from asyncio
+    """
+    calls = int(400 * scale)
+    workers = 16
+    results = {}  # type: Dict[str, Any]
+
+    with FakeLambdaCloud(latency=0.002) as fake:
+        fake.seed_instances(50)
+        client = fake_client(fake, pool_size=workers)
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            client.instances.get_all_instances()
+        results["sequential_rps"] = calls / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: client.instances.get_all_instances(), range(calls)))
+        results["threaded_rps"] = calls / (time.perf_counter() - started)
+        client.close()
+
+        try:
+            from lambda_cloud.client import AsyncLambdaCloudClient
+            from lambda_cloud.rate_limit import RetryPolicy
+
+            async def run():
+                async with AsyncLambdaCloudClient(
+                    "benchmark-token",
+                    base_url=fake.base_url,
+                    pool_size=workers,
+                    rate_limiter=None,
+                    retry_policy=RetryPolicy(backoff=0.01),
+                ) as async_client:
+                    semaphore = asyncio.Semaphore(workers)
+
+                    async def one():
+                        async with semaphore:
+                            await async_client.instances.get_all_instances()
+
+                    started = time.perf_counter()
+                    await asyncio.gather(*(one() for _ in range(calls)))
+                    return calls / (time.perf_counter() - started)
+
+            results["asyncio_rps"] = asyncio.run(run())
+        except ImportError:
+            results["asyncio_rps"] = None
+
+    results["calls"] = calls
+    results["workers"] = workers
+    return results
+
+
+def bench_tail_latency(scale: float) -> Dict[str, Any]:
+    """
+    latency percentiles of listing calls against slow responses, throttling and server errors
+    """
+    calls = int(300 * scale)
+    results = {}  # type: Dict[str, Any]
+    scenarios = {
+        "slow": {"latency": (0.001, 0.02)},
+        "throttled": {"latency": 0.001, "rate_limit": (200, 10)},
+        "errors": {"latency": 0.001, "error_rate": 0.05, "seed": 7},
+    }
+    for name, options in scenarios.items():
+        with FakeLambdaCloud(**options) as fake:
+            client = fake_client(fake, pool_size=8)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                samples = list(executor.map(lambda _: timed(client.instances.get_all_instances, 1)[0], range(calls)))
+            client.close()
+            results[name] = dict(percentiles(samples), server_requests=sum(fake.calls.values()), calls=calls)
+    return results
+
+
+def bench_large_listing(scale: float) -> Dict[str, Any]:
+    """
+    time and memory to fetch and decode a very large get_all_instances payload, as dicts, as models and streamed
+    """
+    count = int(20000 * scale)
+    with FakeLambdaCloud() as fake:
+        fake.seed_instances(count)
+        client = fake_client(fake, timeout=300)
+        client.instances.get_instance_types()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        listing = client.instances.get_all_instances()
+        duration = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(listing["data"]) == count
+        del listing
+
+        tracemalloc.start()
+        models = client.instances.get_all_instances(models=True)
+        for instance in models:
+            instance.instance_type
+        models_retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del models
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        streamed = sum(1 for _ in client.instances.get_all_instances(stream=True))
+        stream_duration = time.perf_counter() - started
+        _, stream_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        client.close()
+
+    assert streamed == count
+    return {
+        "instances": count,
+        "seconds": duration,
+        "peak_mib": peak / 2**20,
+        "retained_mib": retained / 2**20,
+        "models_retained_mib": models_retained / 2**20,
+        "stream_seconds": stream_duration,
+        "stream_peak_mib": stream_peak / 2**20,
+        "json_backend": get_json_backend(),
+    }
+
+
+def bench_coalescing(scale: float) -> Dict[str, Any]:
+    """
+    requests reaching the API when many threads list instances at the same moment, with and without single-flight
+    """
+    calls = int(400 * scale)
+    workers = 32
+    results = {}  # type: Dict[str, Any]
+    for name, single_flight in (("separate", None), ("single_flight", SingleFlight())):
+        with FakeLambdaCloud(latency=0.02) as fake:
+            fake.seed_instances(50)
+            client = fake_client(fake, pool_size=workers, single_flight=single_flight)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                samples = list(executor.map(lambda _: timed(client.instances.get_all_instances, 1)[0], range(calls)))
+            client.close()
+            results[name] = dict(percentiles(samples), server_requests=fake.calls["GET /v1/instances"], calls=calls)
+    return results
+
+
+def bench_bulk_terminate(scale: float) -> Dict[str, Any]:
+    """
+    time to tear down a large fleet in concurrent batches, with a few server errors along the way
+    """
+    count = int(1000 * scale)
+    with FakeLambdaCloud(latency=0.05) as fake:
+        instance_ids = fake.seed_instances(count)
+        fake.fail_next(503, count=3, path="/v1/instance-operations/terminate")
+        client = fake_client(fake, retry_policy=None)
+        started = time.perf_counter()
+        result = BulkOperations(client.instances).terminate(instance_ids)
+        duration = time.perf_counter() - started
+        client.close()
+    return {
+        "instances": count,
+        "seconds": duration,
+        "requests": result.requests,
+        "succeeded": len(result.succeeded),
+        "failed": len(result.failed),
+    }
+
+
+def bench_warm_start(scale: float) -> Dict[str, Any]:
+    """
+    time a fresh process spends on the four startup listings, without and with a persistent cache on disk
+    """
+    runs = max(1, int(20 * scale))
+    results = {}  # type: Dict[str, Any]
+    with FakeLambdaCloud(latency=0.03) as fake, tempfile.TemporaryDirectory() as directory:
+        fake.seed_instances(200)
+        path = os.path.join(directory, "cache.sqlite3")
+
+        def startup(cache):
+            client = fake_client(fake, cache=cache)
+            client.instances.get_instance_types()
+            client.ssh_keys.get_ssh_keys()
+            client.file_systems.get_file_systems()
+            client.instances.get_all_instances()
+            client.close()
+
+        startup(PersistentCache(path))
+        results["no_cache"] = percentiles(timed(lambda: startup(None), runs))
+        results["persistent_cache"] = percentiles(timed(lambda: startup(PersistentCache(path)), runs))
+    return results
+
+
+def bench_cold_start(scale: float) -> Dict[str, Any]:
+    """
+    wall time of fresh lambda-cloud processes, next to a bare interpreter and to importing the client
+    """
+    runs = max(3, int(20 * scale))
+    results = {}  # type: Dict[str, Any]
+    with FakeLambdaCloud() as fake, tempfile.TemporaryDirectory() as directory:
+        fake.seed_instances(20)
+        env = dict(os.environ, LAMBDA_CLOUD_TOKEN="benchmark-token", XDG_CACHE_HOME=directory)
+        cli = [sys.executable, "-m", "lambda_cloud", "--base-url", fake.base_url]
+        commands = {
+            "python": [sys.executable, "-c", "pass"],
+            "import_client": [sys.executable, "-c", "import lambda_cloud.client"],
+            "help": cli + ["--help"],
+            "list": cli + ["list"],
+            "list_warm_cache": cli + ["--cache", "list"],
+        }
+        subprocess.run(commands["list_warm_cache"], env=env, stdout=subprocess.DEVNULL, check=True)
+        for name, command in commands.items():
+            run = lambda: subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)  # noqa: E731
+            results[name] = percentiles(timed(run, runs))
+    return results
+
+
+def bench_selector(scale: float) -> Dict[str, Any]:
+    """
+    cost of a cheapest-fit query over a catalog of 96 types in 12 regions: on the compiled index alone, through the
+    selector with a cached catalog, and walking the catalog dict by hand
+    """
+    iterations = int(20000 * scale)
+    regions = {f"region-{number}": f"Region {number}" for number in range(12)}
+    instance_types = {
+        f"gpu_{gpus}x_model{model}": (f"{gpus}x MODEL{model}", 50 * gpus + 7 * model, 8 * gpus, 60 * gpus, 500 * gpus)
+        for gpus in (1, 2, 4, 8)
+        for model in range(24)
+    }
+    capacity = {
+        name: {region: 1 for number, region in enumerate(regions) if (index + number) % 5 == 0}
+        for index, name in enumerate(instance_types)
+    }
+    wanted = ["region-3", "region-7"]
+
+    with FakeLambdaCloud(instance_types=instance_types, regions=regions, capacity=capacity) as fake:
+        client = fake_client(fake, cache=ResponseCache())
+        selector = InstanceSelector(client.instances)
+
+        def by_hand():
+            catalog = client.instances.get_instance_types()["data"]
+            fits = [
+                (entry["instance_type"]["price_cents_per_hour"], name, region["name"])
+                for name, entry in catalog.items()
+                if entry["instance_type"]["specs"]["memory_gib"] >= 400
+                for region in entry["regions_with_capacity_available"]
+                if region["name"] in wanted
+            ]
+            return min(fits) if fits else None
+
+        index = selector.index()
+        results = {
+            "index_only": percentiles(timed(lambda: index.select(min_memory_gib=400, regions=wanted, limit=1), iterations)),
+            "selector": percentiles(timed(lambda: selector.cheapest(min_memory_gib=400, regions=wanted), iterations)),
+            "catalog_walk": percentiles(timed(by_hand, iterations)),
+        }
+        client.close()
+    return results
+
+
+def bench_warm_pool(scale: float) -> Dict[str, Any]:
+    """
+    time-to-GPU for jobs arriving every 0.1 seconds on instances that boot in 0.3, launching on demand and
+    from a warm pool of three
+    """
+    jobs = max(4, int(20 * scale))
+    key = ("gpu_1x_a10", "us-tx-1")
+    with FakeLambdaCloud(boot_seconds=0.3, capacity={key[0]: {key[1]: 4 * jobs}}) as fake:
+        client = fake_client(fake)
+        client.ssh_keys.add_ssh_key("benchmark", "ssh-ed25519 AAAA benchmark")
+
+        def on_demand():
+            (instance_id,) = client.instances.launch_instance(
+                region_name=key[1], instance_type_name=key[0], ssh_key_names=["benchmark"], quantity=1
+            )["data"]["instance_ids"]
+            client.instances.wait_for_status([instance_id], "active", interval=AdaptiveInterval(0.02, 0.1))
+            time.sleep(0.1)
+
+        def from_pool():
+            pool.acquire(*key)
+            time.sleep(0.1)
+
+        cold = timed(on_demand, jobs)
+        with WarmPool(client.instances, {key: 3}, ["benchmark"], interval=AdaptiveInterval(0.02, 0.1)) as pool:
+            time.sleep(0.5)
+            warm = timed(from_pool, jobs)
+            stats = pool.stats()
+        client.close()
+    return {
+        "on_demand": percentiles([sample - 0.1 for sample in cold]),
+        "warm_pool": percentiles([sample - 0.1 for sample in warm]),
+        "hit_rate": stats["hit_rate"],
+    }
+
+
+def bench_capacity(scale: float) -> Dict[str, Any]:
+    """
+    detection-to-launch latency of queued launches when capacity shows up, over an API answering in 10 ms
+    """
+    grabs = max(3, int(10 * scale))
+    key = ("gpu_8x_h100_sxm5", "us-east-1")
+    with FakeLambdaCloud(latency=0.01, capacity={key[0]: {key[1]: 0}}) as fake:
+        client = fake_client(fake)
+        client.ssh_keys.add_ssh_key("benchmark", "ssh-ed25519 AAAA benchmark")
+        results = []
+        with CapacityWatcher(client.instances, interval=AdaptiveInterval(0.05, 0.5)) as watcher:
+            for _ in range(grabs):
+                request = watcher.submit(key[0], ["benchmark"])
+                time.sleep(0.1)
+                appeared = time.monotonic()
+                fake.capacity[key[0]][key[1]] = 1
+                grab = request.wait(timeout=5)
+                results.append((grab.round_trip, grab.launched_at - appeared))
+        client.close()
+    return {
+        "detection_to_launch": percentiles([detected for detected, _ in results]),
+        "appearance_to_launch": percentiles([appeared for _, appeared in results]),
+    }
+
+
+def bench_hedging(scale: float) -> Dict[str, Any]:
+    """
+    tail latency of listing calls when one in 25 answers stalls for 300 ms, with and without hedged reads, and the
+    cost of a call while the circuit breaker is open
+    """
+    calls = int(300 * scale)
+    results = {}  # type: Dict[str, Any]
+    for name, hedging in (("plain", None), ("hedged", HedgePolicy())):
+        with FakeLambdaCloud(latency=(0.002, 0.01), seed=3) as fake:
+            client = fake_client(fake, hedging=hedging)
+            samples = []
+            for call in range(calls):
+                if call % 25 == 24:
+                    fake.stall_next(0.3, path="/v1/instances")
+                samples.extend(timed(client.instances.get_all_instances, 1))
+            client.close()
+            results[name] = dict(percentiles(samples), server_requests=fake.calls["GET /v1/instances"])
+    stats = hedging.stats()
+    results["hedged"].update(hedges=stats["hedged"], hedge_wins=stats["hedge_wins"])
+
+    with FakeLambdaCloud() as fake:
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=3600)
+        client = fake_client(fake, circuit_breaker=breaker, retry_policy=None)
+        client.instances.get_all_instances()
+        fake.fail_next(503)
+        try:
+            client.ssh_keys.get_ssh_keys()
+        except OSError:
+            pass
+        results["open_circuit_stale_read"] = percentiles(timed(client.instances.get_all_instances, calls))
+        client.close()
+    return results
+
+
+def bench_client_pool(scale: float) -> Dict[str, Any]:
+    """
+    catalog reads per second when each token is limited to 50 requests a second, for one account and spread over
+    four, and the fleet-wide listing of four accounts answering in 20 ms, one after the other and concurrently
+    """
+    reads = int(100 * scale)
+    results = {}  # type: Dict[str, Any]
+    with FakeLambdaCloud(latency=0.001) as fake:
+        for accounts in (1, 4):
+            clients = {
+                f"account-{index}": fake_client(fake, rate_limiter=RateLimiter(rate=50, burst=1))
+                for index in range(accounts)
+            }
+            with ClientPool(clients) as pool:
+                started = time.perf_counter()
+                for _ in range(reads):
+                    pool.get_instance_types()
+                results[f"reads_per_second_{accounts}_accounts"] = reads / (time.perf_counter() - started)
+
+    with FakeLambdaCloud(latency=0.02) as fake:
+        fake.seed_instances(25)
+        with ClientPool({f"account-{index}": fake_client(fake) for index in range(4)}) as pool:
+            one_by_one = timed(
+                lambda: [client.instances.get_all_instances() for client in pool.clients.values()], int(20 * scale)
+            )
+            gathered = timed(pool.get_all_instances, int(20 * scale))
+    results["listing_4_accounts_sequential"] = percentiles(one_by_one)
+    results["listing_4_accounts_pool"] = percentiles(gathered)
+    return results
+
+
+def bench_replay(scale: float) -> Dict[str, Any]:
+    """
+    calls per second answering a mixed session of listings and lookups from the loopback fake and from a replayed
+    cassette of it, and the size of the cassette
+    """
+    calls = int(2000 * scale)
+    recorder = RecordingTransport()
+    with FakeLambdaCloud(seed=1) as fake:
+        instance_ids = fake.seed_instances(50)
+        client = fake_client(fake, transport=recorder)
+
+        def session():
+            client.instances.get_all_instances()
+            client.instances.get_instance(instance_ids[0])
+            client.ssh_keys.get_ssh_keys()
+
+        session()
+        started = time.perf_counter()
+        for _ in range(calls // 3):
+            session()
+        loopback = calls // 3 * 3 / (time.perf_counter() - started)
+        client.close()
+
+    # the fake is gone: every answer now comes from memory
+    client = LambdaCloudClient(
+        "benchmark-token",
+        base_url="http://offline.invalid/api",
+        rate_limiter=None,
+        single_flight=None,
+        transport=ReplayTransport(recorder.interactions[:3]),
+    )
+    started = time.perf_counter()
+    for _ in range(calls // 3):
+        session()
+    replayed = calls // 3 * 3 / (time.perf_counter() - started)
+    client.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.jsonl.gz")
+        recorder.interactions = recorder.interactions[:3]
+        recorder.save(path)
+        size = os.path.getsize(path)
+    return {"loopback_calls_per_second": loopback, "replay_calls_per_second": replayed, "cassette_bytes_gz": size}
+
+
+def bench_ssh_key_index(scale: float) -> Dict[str, Any]:
+    """
+    provisioning jobs making sure their ssh key exists, by listing the keys each time and through a shared
+    SshKeyIndex, then deleting the keys one by one and in one bulk delete
+    """
+    jobs = int(200 * scale)
+    with FakeLambdaCloud(seed=1, latency=0.005) as fake:
+        client = fake_client(fake)
+        public_keys = {
+            f"key-{number}": f"ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAI{number:031d} job" for number in range(20)
+        }
+        for name, public_key in public_keys.items():
+            client.ssh_keys.add_ssh_key(name, public_key)
+        names = [f"key-{number % len(public_keys)}" for number in range(jobs)]
+
+        def listed(name):
+            if name not in {record["name"] for record in client.ssh_keys.get_ssh_keys()["data"]}:
+                client.ssh_keys.add_ssh_key(name, public_keys[name])
+
+        calls = fake.calls["GET /v1/ssh-keys"]
+        started = time.perf_counter()
+        for name in names:
+            listed(name)
+        listing = time.perf_counter() - started
+        listing_calls = fake.calls["GET /v1/ssh-keys"] - calls
+
+        index = SshKeyIndex(client.ssh_keys)
+        calls = fake.calls["GET /v1/ssh-keys"]
+        started = time.perf_counter()
+        for name in names:
+            index.ensure_ssh_key(name, public_keys[name])
+        indexed = time.perf_counter() - started
+        indexed_calls = fake.calls["GET /v1/ssh-keys"] - calls
+
+        fake.latency = 0.02
+        started = time.perf_counter()
+        for name in list(public_keys)[:10]:
+            client.ssh_keys.delete_ssh_keys(index.get(name)["id"])
+        sequential_delete = time.perf_counter() - started
+        started = time.perf_counter()
+        index.delete(names=list(public_keys)[10:])
+        bulk_delete = time.perf_counter() - started
+        client.close()
+    return {
+        "listing_ensures_per_second": jobs / listing,
+        "listing_calls": listing_calls,
+        "indexed_ensures_per_second": jobs / indexed,
+        "indexed_calls": indexed_calls,
+        "sequential_delete_10_ms": sequential_delete * 1000,
+        "bulk_delete_10_ms": bulk_delete * 1000,
+    }
+
+
+BENCHMARKS = {
+    "overhead": bench_overhead,
+    "throughput": bench_throughput,
+    "tail_latency": bench_tail_latency,
+    "large_listing": bench_large_listing,
+    "coalescing": bench_coalescing,
+    "bulk_terminate": bench_bulk_terminate,
+    "warm_start": bench_warm_start,
+    "cold_start": bench_cold_start,
+    "selector": bench_selector,
+    "warm_pool": bench_warm_pool,
+    "capacity": bench_capacity,
+    "hedging": bench_hedging,
+    "client_pool": bench_client_pool,
+    "replay": bench_replay,
+    "ssh_key_index": bench_ssh_key_index,
+}
@@ -0,0 +1,61 @@
+import json
+import time
+from typing import Callable, Dict, List
+
+from requests.models import Response
+
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.rate_limit import RetryPolicy
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    :param samples: latencies in seconds
+    :return: p50, p90, p99, max and mean in milliseconds
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def timed(call: Callable[[], object], iterations: int) -> List[float]:
+    """
+    :param call: function to time
+    :param iterations: number of calls
+    :return: duration of each call in seconds
+    """
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def fake_client(fake, **options) -> LambdaCloudClient:
+    """
+    build a client against a FakeLambdaCloud. Client-side limiting and coalescing are off unless asked for, so the
+    numbers measure the client and not the pacing
+    """
+    options.setdefault("rate_limiter", None)
+    options.setdefault("single_flight", None)
+    options.setdefault("retry_policy", RetryPolicy(backoff=0.01, deadline=30))
+    return LambdaCloudClient("benchmark-token", base_url=fake.base_url, **options)
+
+
+def canned_response(body) -> Response:
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode("utf-8")
+    return response
@@ -0,0 +1,49 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_client import BENCHMARKS
+
+
+def package_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("lambdacloudwrapper")
+    except Exception:
+        pass
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Lambda Cloud clients against a local stand-in API")
+    parser.add_argument("--output", default="bench_output.json", help="where to write the JSON results")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of calls, e.g. 0.1 for a smoke run")
+    args = parser.parse_args(argv)
+
+    results = {
+        "version": package_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "scale": args.scale,
+        "benchmarks": {},
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"running {name}...", file=sys.stderr)
+        results["benchmarks"][name] = BENCHMARKS[name](args.scale)
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(json.dumps(results["benchmarks"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+
+from lambda_cloud.cli import main
+
+sys.exit(main())
@@ -1,4 +1,632 @@
+import logging
+import threading
+import time
+from json import dumps
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Generator, Iterator, Optional, Set, Tuple
+
+from lambda_cloud.cache import ResponseCache
+from lambda_cloud.coalesce import SingleFlight
+from lambda_cloud.metrics import RequestEvent, RequestHooks, endpoint_template
+from lambda_cloud.rate_limit import RateLimiter, RetryPolicy
+from lambda_cloud.resilience import CircuitBreaker, CircuitOpenError, HedgePolicy
+from lambda_cloud.streaming import DEFAULT_CHUNK_SIZE, JsonArrayStream
+from lambda_cloud.transport import Transport
+from utilities import process_request
+
+if TYPE_CHECKING:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    from requests import Response, Session
+
+# requests, asyncio and concurrent.futures are imported where they are first needed, so a process that never sends
+# a request (a CLI showing help, or one served from a persistent cache) starts without paying for them
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://cloud.lambdalabs.com/api"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30
+
+# placeholder for optional arguments whose default is built per client; None switches the feature off
+USE_DEFAULT = object()
+
+
+def build_session(pool_size: int = DEFAULT_POOL_SIZE) -> "Session":
+    """
+    build an HTTP session that pools connections and keeps them alive between calls
+    :param pool_size: maximum number of connections kept open to the API host
+    :return: a requests Session with a pooled adapter mounted for http and https
+    """
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def build_async_session(pool_size: int = DEFAULT_POOL_SIZE):
+    """
+    build an asyncio HTTP client that pools connections and keeps them alive between calls
+    :param pool_size: maximum number of connections kept open to the API host
+    :return: an httpx AsyncClient
+    """
+    try:
+        import httpx
+    except ImportError as error:
+        raise ImportError("the async clients require httpx: pip install 'lambdacloudwrapper[async]'") from error
+
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.AsyncClient(limits=limits)
+
+
+class SharedSession:
+    """
+    A connection pool built on first use and shared by the clients holding it.
+    """
+
+    def __init__(self, build: Callable[[int], Any], pool_size: int = DEFAULT_POOL_SIZE, session: Optional[Any] = None):
+        """
+        :param build: builds the pool from pool_size, e.g. build_session
+        :param pool_size: maximum number of connections kept open to the API host
+        :param session: pool to hand out instead of building one
+        """
+        self._build = build
+        self._pool_size = pool_size
+        self._session = session
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._session is not None
+
+    def get(self) -> Any:
+        """
+        :return: the pool, built by the first caller
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build(self._pool_size)
+        return self._session
+
+
+class ApiRequest:
+    """
+    A request the core wants sent. Drivers hand the response back to the core.
+    """
+
+    __slots__ = ("method", "url", "kwargs", "path")
+
+    def __init__(self, method: str, url: str, kwargs: Dict[str, Any], path: str = ""):
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.path = path
+
+    @property
+    def hedgeable(self) -> bool:
+        # a duplicate of a streamed read would leave a second body to drain
+        return self.method == "GET" and not self.kwargs.get("stream")
+
+
+class Sleep:
+    """
+    A pause the core wants before it carries on. Drivers decide how to wait.
+    """
+
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+
+class Refresh:
+    """
+    A GET the core wants sent again in the background, e.g. to revalidate a stale cache entry.
+    Drivers start it without waiting for it.
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: str):
+        self.path = path
+
+
 class Base:
-    def __init__(self, token):
-        self.base_url = "https://cloud.lambdalabs.com/api"
+    def __init__(
+        self,
+        token,
+        session: Optional[Any] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = USE_DEFAULT,
+        retry_policy: Optional[RetryPolicy] = USE_DEFAULT,
+        cache: Optional[ResponseCache] = None,
+        base_url: str = DEFAULT_BASE_URL,
+        hooks: Optional[RequestHooks] = None,
+        single_flight: Optional[SingleFlight] = USE_DEFAULT,
+        timeouts: Optional[Dict[str, float]] = None,
+        hedging: Optional[HedgePolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[Transport] = None,
+    ):
+        """
+        :param token: secret token gotten from the Lambda Cloud console
+        :param session: pooled session, or SharedSession, to share with other clients. A new one is built on first
+        use when omitted
+        :param pool_size: size of the connection pool when a new session is built
+        :param timeout: seconds to wait for the API before giving up on a request
+        :param rate_limiter: limiter to share with other clients using the same token. None disables limiting
+        :param retry_policy: decides which responses are retried and when. None disables retries
+        :param cache: response cache for read-mostly endpoints, shared with other clients. Off by default
+        :param base_url: root of the API, e.g. to point the client at a local stand-in
+        :param hooks: callbacks receiving a RequestEvent after every call, e.g. a MetricsCollector
+        :param single_flight: lets concurrent identical GETs share one request. Its callers receive the same result
+        object, like cached reads, so treat it as read-only. None sends each one separately
+        :param timeouts: seconds to wait per endpoint template, e.g. {"/v1/instances/{id}": 5}, overriding timeout
+        :param hedging: sends a duplicate of slow GETs and keeps the first answer. Off by default
+        :param circuit_breaker: fails fast, or serves the last good answer, while the API keeps failing. Off by default
+        :param transport: sees every request before it is sent, e.g. to record or replay a cassette
+        """
+        self.base_url = base_url
         self.headers = {"Authorization": f"Bearer {token}"}
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.hedging = hedging
+        self.circuit_breaker = circuit_breaker
+        self.transport = transport
+        self._hedge_executor = None  # type: Optional[ThreadPoolExecutor]
+        self._hedge_lock = threading.Lock()
+        self.rate_limiter = RateLimiter() if rate_limiter is USE_DEFAULT else rate_limiter
+        self.retry_policy = RetryPolicy() if retry_policy is USE_DEFAULT else retry_policy
+        self.cache = cache
+        self.hooks = hooks
+        self.single_flight = SingleFlight() if single_flight is USE_DEFAULT else single_flight
+        self._owns_session = session is None
+        if isinstance(session, SharedSession):
+            self._shared_session = session
+        else:
+            self._shared_session = SharedSession(self._build_session, pool_size, session)
+
+    @property
+    def session(self) -> Any:
+        return self._shared_session.get()
+
+    def _build_session(self, pool_size: int):
+        return build_session(pool_size)
+
+    def _flow(
+        self,
+        method: str,
+        path: str,
+        json: Optional[Any] = None,
+        stream: bool = False,
+        refresh: bool = False,
+    ) -> Generator[Any, Any, Any]:
+        """
+        The request/response logic shared by the sync and async clients. It yields ApiRequest, Sleep and
+        Refresh steps, receives responses for the first and returns the processed result.
+        With stream, a successful response is returned unread for the caller to consume.
+        With refresh, the cache is written but not read.
+        """
+        hooks = self.hooks
+        breaker = self.circuit_breaker
+        started = time.monotonic()
+        cache_key = (self.headers["Authorization"], self.base_url, path)
+        cacheable = (
+            not stream and self.cache is not None and method == "GET" and self.cache.ttl_for(path) is not None
+        )
+        if cacheable and not refresh:
+            found, value = self.cache.get(cache_key)
+            if found:
+                if hooks:
+                    hooks.emit(RequestEvent(method, endpoint_template(path), None, 0.0, cache_hit=True))
+                if self.cache.should_revalidate(cache_key):
+                    yield Refresh(path)
+                return value
+
+        trial = breaker.admit() if breaker is not None else 0
+        if trial is None:
+            found, value = breaker.last_good(cache_key) if method == "GET" and not stream else (False, None)
+            if found:
+                if hooks:
+                    hooks.emit(RequestEvent(method, endpoint_template(path), None, 0.0, cache_hit=True))
+                return value
+            error = CircuitOpenError(breaker.retry_in)
+            if hooks:
+                hooks.emit(RequestEvent(method, endpoint_template(path), None, 0.0, error=error))
+            raise error
+
+        timeout = self.timeouts.get(endpoint_template(path), self.timeout) if self.timeouts else self.timeout
+        kwargs = {"headers": self.headers, "timeout": timeout}
+        if json is not None:
+            kwargs["json"] = json
+        if stream:
+            kwargs["stream"] = True
+        api_request = ApiRequest(method, f"{self.base_url}{path}", kwargs, path)
+
+        results = None
+        retries = throttled = 0
+        # set while this request holds the breaker's half-open trial and has not told it how it went
+        unrecorded = bool(trial)
+        try:
+            while True:
+                if self.rate_limiter is not None:
+                    wait = self.rate_limiter.reserve(path)
+                    if wait > 0:
+                        yield Sleep(wait)
+                try:
+                    results = yield api_request
+                except Exception:
+                    if breaker is not None:
+                        unrecorded = False
+                        breaker.record_failure()
+                    raise
+                if results.status_code == 429:
+                    throttled += 1
+
+                if self.retry_policy is None:
+                    break
+                delay = self.retry_policy.next_delay(method, results, retries, time.monotonic() - started)
+                if delay is None:
+                    break
+                retries += 1
+                if stream:
+                    results.close()
+                if self.rate_limiter is not None and results.status_code == 429:
+                    # throttling applies to the whole token, so every caller backs off, not just this one
+                    self.rate_limiter.hold(delay)
+                else:
+                    yield Sleep(delay)
+
+            if breaker is not None:
+                unrecorded = False
+                if results.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if stream and 200 <= results.status_code <= 299:
+                value = results
+            else:
+                value = process_request(results)
+            if cacheable:
+                self.cache.set(cache_key, value)
+            if breaker is not None and method == "GET" and not stream:
+                breaker.remember(cache_key, value)
+        except Exception as error:
+            if hooks:
+                hooks.emit(self._event(method, path, json, started, results, retries, throttled, stream, error))
+            raise
+        finally:
+            # the driver closes the flow when its caller is cancelled or interrupted mid-request
+            if unrecorded:
+                breaker.release(trial)
+            if self.cache is not None:
+                # a write that failed or timed out may still have been applied, so it invalidates all the same
+                self.cache.invalidate_for(method, path, self.headers["Authorization"], self.base_url)
+        if hooks:
+            hooks.emit(self._event(method, path, json, started, results, retries, throttled, stream))
+        return value
+
+    @staticmethod
+    def _event(method, path, json, started, results, retries, throttled, stream, error=None) -> RequestEvent:
+        if results is None:
+            received = 0
+        elif stream and not results._content_consumed:
+            # reading the body here would defeat streaming, so trust the header
+            received = int(results.headers.get("Content-Length") or 0)
+        else:
+            received = len(results.content or b"")
+        return RequestEvent(
+            method,
+            endpoint_template(path),
+            results.status_code if results is not None else None,
+            time.monotonic() - started,
+            retries=retries,
+            throttled=throttled,
+            bytes_sent=len(dumps(json)) if json is not None else 0,
+            bytes_received=received,
+            error=error,
+        )
+
+    def _coalesce(self, method: str, kwargs: Dict[str, Any]) -> bool:
+        # only plain GETs are identical for every caller; parse is applied per caller on the shared result
+        return self.single_flight is not None and method == "GET" and not any(kwargs.values())
+
+    def _call(self, method: str, path: str, parse: Optional[Callable[[Any], Any]] = None, **kwargs) -> Any:
+        """
+        :param parse: converts the processed result for this call only; the cache keeps the plain result
+        """
+        if self._coalesce(method, kwargs):
+            value = self.single_flight.do(self._flight_key(path), lambda: self._drive(self._flow(method, path)))
+        else:
+            try:
+                value = self._drive(self._flow(method, path, **kwargs))
+            finally:
+                self._after_write(method)
+        return parse(value) if parse is not None else value
+
+    def _flight_key(self, path: str) -> Tuple[Any, ...]:
+        scope = (self.headers["Authorization"], self.base_url)
+        return scope + (self.single_flight.generation(scope), path)
+
+    def _after_write(self, method: str):
+        # a write may have applied even when it raised, so reads after it must not join a flight started before
+        if self.single_flight is not None and method != "GET":
+            self.single_flight.bump((self.headers["Authorization"], self.base_url))
+
+    def _drive(self, flow: Generator[Any, Any, Any]) -> Any:
+        try:
+            step = next(flow)
+            while True:
+                if isinstance(step, Sleep):
+                    time.sleep(step.seconds)
+                    step = flow.send(None)
+                elif isinstance(step, Refresh):
+                    threading.Thread(target=self._refresh, args=(step.path,), daemon=True).start()
+                    step = flow.send(None)
+                else:
+                    try:
+                        if self.hedging is not None and step.hedgeable:
+                            results = self._send_hedged(step)
+                        else:
+                            results = self._send(step)
+                    except Exception as error:
+                        step = flow.throw(error)
+                    else:
+                        step = flow.send(results)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            flow.close()
+
+    def _send(self, api_request: ApiRequest) -> "Response":
+        if self.transport is not None:
+            return self.transport.send(api_request, self._send_http)
+        return self._send_http(api_request)
+
+    def _send_http(self, api_request: ApiRequest) -> "Response":
+        return self.session.request(api_request.method, api_request.url, **api_request.kwargs)
+
+    def _may_hedge(self, api_request: ApiRequest) -> bool:
+        if self.rate_limiter is not None and not self.rate_limiter.try_acquire(api_request.path):
+            return False
+        return self.hedging.take()
+
+    def _timed_send(self, api_request: ApiRequest) -> "Response":
+        started = time.monotonic()
+        results = self._send(api_request)
+        self.hedging.record(api_request.path, time.monotonic() - started)
+        return results
+
+    def _send_hedged(self, api_request: ApiRequest) -> "Response":
+        """
+        send a read, and a duplicate of it once it runs past the hedge delay of its endpoint.
+        The first answer is returned; the slower request finishes in the background and is dropped
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        delay = self.hedging.delay(api_request.path)
+        if delay is None:
+            return self._timed_send(api_request)
+        if self._hedge_executor is None:
+            with self._hedge_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(thread_name_prefix="lambda-cloud-hedge")
+        first = self._hedge_executor.submit(self._timed_send, api_request)
+        pending = {first}
+        done, _ = wait(pending, timeout=delay)
+        if not done and self._may_hedge(api_request):
+            pending.add(self._hedge_executor.submit(self._timed_send, api_request))
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    if attempt is not first:
+                        self.hedging.won()
+                    return attempt.result()
+                error = attempt.exception()
+        raise error
+
+    def _refresh(self, path: str):
+        try:
+            self._drive(self._flow("GET", path, refresh=True))
+        except Exception:
+            logger.warning("background refresh of %s failed", path, exc_info=True)
+
+    def _stream(self, path: str, parse: Optional[Callable[[Any], Any]] = None) -> Iterator[Any]:
+        """
+        yield the items of a listing one by one as its body arrives. The request is sent on first iteration
+        :param path: path of a listing endpoint
+        :param parse: converts each item, e.g. into a model
+        """
+        results = self._call("GET", path, stream=True)
+        decoder = JsonArrayStream()
+        try:
+            for chunk in results.iter_content(DEFAULT_CHUNK_SIZE):
+                for item in decoder.feed(chunk):
+                    yield parse(item) if parse is not None else item
+            decoder.finish()
+        finally:
+            results.close()
+
+    def close(self):
+        """
+        close the connection pool, if this client created it
+        """
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+        if self._owns_session and self._shared_session.built:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncBase(Base):
+    """
+    Runs the same request/response core as Base on asyncio. Endpoint methods of async clients are coroutines.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refreshing = set()  # type: Set[asyncio.Future]
+
+    def _build_session(self, pool_size: int):
+        return build_async_session(pool_size)
+
+    async def _call(self, method: str, path: str, parse: Optional[Callable[[Any], Any]] = None, **kwargs) -> Any:
+        """
+        :param parse: converts the processed result for this call only; the cache keeps the plain result
+        """
+        if self._coalesce(method, kwargs):
+            value = await self.single_flight.do_async(
+                self._flight_key(path), lambda: self._drive(self._flow(method, path))
+            )
+        else:
+            try:
+                value = await self._drive(self._flow(method, path, **kwargs))
+            finally:
+                self._after_write(method)
+        return parse(value) if parse is not None else value
+
+    async def _drive(self, flow: Generator[Any, Any, Any]) -> Any:
+        import asyncio
+
+        try:
+            step = next(flow)
+            while True:
+                if isinstance(step, Sleep):
+                    await asyncio.sleep(step.seconds)
+                    step = flow.send(None)
+                elif isinstance(step, Refresh):
+                    task = asyncio.ensure_future(self._refresh(step.path))
+                    # the loop only keeps weak references to tasks
+                    self._refreshing.add(task)
+                    task.add_done_callback(self._refreshing.discard)
+                    step = flow.send(None)
+                else:
+                    try:
+                        if self.hedging is not None and step.hedgeable:
+                            results = await self._send_hedged(step)
+                        else:
+                            results = await self._send(step)
+                    except Exception as error:
+                        step = flow.throw(error)
+                    else:
+                        step = flow.send(results)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            # a cancelled caller never reaches the flow, so closing it is what runs its cleanup
+            flow.close()
+
+    async def _refresh(self, path: str):
+        try:
+            await self._drive(self._flow("GET", path, refresh=True))
+        except Exception:
+            logger.warning("background refresh of %s failed", path, exc_info=True)
+
+    async def _send(self, api_request: ApiRequest) -> "Response":
+        if self.transport is not None:
+            return await self.transport.send_async(api_request, self._send_http)
+        return await self._send_http(api_request)
+
+    async def _send_http(self, api_request: ApiRequest) -> "Response":
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+
+        kwargs = dict(api_request.kwargs)
+        stream = kwargs.pop("stream", False)
+        request = self.session.build_request(api_request.method, api_request.url, **kwargs)
+        raw = await self.session.send(request, stream=stream)
+        # hand the core a requests Response so both clients process and raise identically
+        results = Response()
+        results.status_code = raw.status_code
+        results.headers = CaseInsensitiveDict(raw.headers)
+        results.reason = raw.reason_phrase
+        results.url = str(raw.request.url)
+        if stream and 200 <= raw.status_code <= 299:
+            # left unread for _stream, which consumes and closes the httpx response
+            results.raw = raw
+        else:
+            if stream:
+                await raw.aread()
+                await raw.aclose()
+            results._content = raw.content
+            results._content_consumed = True
+        return results
+
+    async def _timed_send(self, api_request: ApiRequest) -> "Response":
+        started = time.monotonic()
+        results = await self._send(api_request)
+        self.hedging.record(api_request.path, time.monotonic() - started)
+        return results
+
+    async def _send_hedged(self, api_request: ApiRequest) -> "Response":
+        """
+        send a read, and a duplicate of it once it runs past the hedge delay of its endpoint.
+        The first answer is returned and the slower request is cancelled
+        """
+        import asyncio
+
+        delay = self.hedging.delay(api_request.path)
+        if delay is None:
+            return await self._timed_send(api_request)
+        first = asyncio.ensure_future(self._timed_send(api_request))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and self._may_hedge(api_request):
+                pending.add(asyncio.ensure_future(self._timed_send(api_request)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            self.hedging.won()
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+
+    async def _stream(self, path: str, parse: Optional[Callable[[Any], Any]] = None) -> AsyncIterator[Any]:
+        """
+        yield the items of a listing one by one as its body arrives. The request is sent on first iteration
+        :param path: path of a listing endpoint
+        :param parse: converts each item, e.g. into a model
+        """
+        results = await self._call("GET", path, stream=True)
+        decoder = JsonArrayStream()
+        try:
+            async for chunk in results.raw.aiter_bytes(DEFAULT_CHUNK_SIZE):
+                for item in decoder.feed(chunk):
+                    yield parse(item) if parse is not None else item
+            decoder.finish()
+        finally:
+            await results.raw.aclose()
+
+    async def close(self):
+        """
+        close the connection pool, if this client created it
+        """
+        if self._owns_session and self._shared_session.built:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
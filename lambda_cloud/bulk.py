@@ -0,0 +1,153 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List
+
+from requests import RequestException
+
+from lambda_cloud.instances import LambdaCloudInstance
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_ATTEMPTS = 3
+# statuses the API answers when some id of the batch is bad; others, e.g. 401 or 403, would fail every half too
+ID_ERROR_STATUSES = (400, 404)
+
+
+class BulkResult:
+    """
+    Outcome of a bulk operation for each instance.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.succeeded = {}  # type: Dict[str, Dict[str, Any]]
+        self.failed = {}  # type: Dict[str, Exception]
+        self.requests = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def __repr__(self):
+        return (
+            f"BulkResult({self.operation}, succeeded={len(self.succeeded)}, failed={len(self.failed)}, "
+            f"requests={self.requests})"
+        )
+
+
+class BulkOperations:
+    """
+    Terminates or restarts many instances by sending batches of ids concurrently. A batch that fails for a
+    transient reason is sent again; one rejected for a bad id is split in halves until the bad ids are isolated,
+    so a single bad id never fails the others. The client's rate limiter paces every request.
+    """
+
+    def __init__(
+        self,
+        client: LambdaCloudInstance,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """
+        :param client: client used to send the requests
+        :param batch_size: maximum number of ids per request
+        :param max_workers: maximum number of requests in flight
+        :param max_attempts: times a batch is sent before its ids are reported as failed after transient errors
+        """
+        if batch_size < 1 or max_workers < 1 or max_attempts < 1:
+            raise ValueError("batch_size, max_workers and max_attempts must be positive")
+        self.client = client
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+
+    def terminate(self, instance_ids: Iterable[str]) -> BulkResult:
+        """
+        terminate instances. Ids the API no longer knows count as terminated, so the call is safe to repeat
+        :param instance_ids: ids of the instances to terminate
+        :return: the terminated record of each instance, and the error of each one that failed
+        """
+        result = self._run("terminate", self.client.terminate_instance, "terminated_instances", instance_ids)
+        not_found = [
+            instance_id
+            for instance_id, error in result.failed.items()
+            if getattr(error, "response", None) is not None and error.response.status_code == 404
+        ]
+        if not_found:
+            listed = {record["id"] for record in self.client.get_all_instances()["data"]}
+            for instance_id in [instance_id for instance_id in not_found if instance_id not in listed]:
+                del result.failed[instance_id]
+                result.succeeded[instance_id] = {"id": instance_id, "status": "terminated"}
+        return result
+
+    def restart(self, instance_ids: Iterable[str]) -> BulkResult:
+        """
+        restart instances
+        :param instance_ids: ids of the instances to restart
+        :return: the restarted record of each instance, and the error of each one that failed
+        """
+        return self._run("restart", self.client.restart_instance, "restarted_instances", instance_ids)
+
+    def _run(
+        self,
+        operation: str,
+        send: Callable[[List[str]], Dict[str, Any]],
+        key: str,
+        instance_ids: Iterable[str],
+    ) -> BulkResult:
+        result = BulkResult(operation)
+        ids = list(dict.fromkeys(instance_ids))
+        batches = [ids[start : start + self.batch_size] for start in range(0, len(ids), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(send, batch): (batch, 1) for batch in batches}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, attempt = pending.pop(future)
+                    result.requests += 1
+                    try:
+                        records = future.result()["data"][key]
+                    except Exception as error:
+                        for retry in self._after_failure(batch, attempt, error, result):
+                            pending[executor.submit(send, retry[0])] = retry
+                        continue
+                    self._record(batch, records, result)
+        return result
+
+    def _after_failure(self, batch: List[str], attempt: int, error: Exception, result: BulkResult):
+        """
+        :return: the (batch, attempt) pairs to send next
+        """
+        # errors other than request errors, e.g. an open circuit breaker, would fail a retry and each half alike
+        if isinstance(error, RequestException):
+            status_code = error.response.status_code if error.response is not None else None
+            if _transient(error):
+                if attempt < self.max_attempts:
+                    return [(batch, attempt + 1)]
+            elif status_code in ID_ERROR_STATUSES and len(batch) > 1:
+                # the API rejects a whole batch for one bad id, so bisect to find it
+                middle = len(batch) // 2
+                return [(batch[:middle], attempt), (batch[middle:], attempt)]
+        for instance_id in batch:
+            result.failed[instance_id] = error
+        return []
+
+    @staticmethod
+    def _record(batch: List[str], records: List[Dict[str, Any]], result: BulkResult):
+        by_id = {record["id"]: record for record in records}
+        for instance_id in batch:
+            record = by_id.get(instance_id)
+            if record is not None:
+                result.succeeded[instance_id] = record
+            else:
+                result.failed[instance_id] = RuntimeError(f"instance {instance_id} missing from the response")
+
+
+def _transient(error: RequestException) -> bool:
+    """
+    :return: whether sending the same request again may succeed
+    """
+    response = error.response
+    if response is None:
+        return True
+    return response.status_code == 429 or response.status_code >= 500
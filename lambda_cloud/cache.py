@@ -0,0 +1,324 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from json import dumps
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from utilities import loads
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# (token, base URL, path) of a cached read
+CacheKey = Tuple[str, str, str]
+
+DEFAULT_TTLS = {
+    "/v1/instance-types": 30,
+    "/v1/ssh-keys": 300,
+    "/v1/file-systems": 300,
+}
+DEFAULT_MAX_SIZE = 256
+
+# the persistent cache also keeps the instance listing, which every short-lived process starts with
+DEFAULT_PERSISTENT_TTLS = dict(DEFAULT_TTLS, **{"/v1/instances": 10})
+DEFAULT_MAX_STALE = 300
+DEFAULT_BUSY_TIMEOUT = 5.0
+# seconds before a failed background refresh of the same entry is tried again
+REVALIDATE_INTERVAL = 10.0
+
+# cached path prefixes that go stale when a request is sent to a mutating path prefix
+INVALIDATIONS = {
+    "/v1/ssh-keys": ("/v1/ssh-keys",),
+    "/v1/instance-operations/launch": ("/v1/instances", "/v1/instance-types"),
+    "/v1/instance-operations/terminate": ("/v1/instances", "/v1/instance-types"),
+    "/v1/instance-operations/restart": ("/v1/instances",),
+}
+
+
+class ResponseCache:
+    """
+    A bounded, thread-safe TTL cache for GET responses with LRU eviction.
+    Cached results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        :param ttls: seconds each path stays fresh. Paths ending in "/" match everything below them,
+        e.g. "/v1/instances/" covers single-instance lookups. Paths without a TTL are not cached
+        :param max_size: maximum number of entries kept before the least recently used is evicted
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # type: OrderedDict[CacheKey, Tuple[float, Any]]
+        self._lock = threading.Lock()
+
+    def ttl_for(self, path: str) -> Optional[float]:
+        """
+        :param path: endpoint path, e.g. /v1/ssh-keys
+        :return: seconds a response for path stays fresh, or None when it is not cached
+        """
+        ttl = self.ttls.get(path)
+        if ttl is not None:
+            return ttl
+        prefixes = [prefix for prefix in self.ttls if prefix.endswith("/") and path.startswith(prefix)]
+        if prefixes:
+            return self.ttls[max(prefixes, key=len)]
+        return None
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """
+        :param key: (token, base URL, path)
+        :return: (found, value). Expired entries count as misses and are dropped
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def should_revalidate(self, key: CacheKey) -> bool:
+        """
+        :param key: (token, base URL, path) just served by get
+        :return: whether the client should refresh the entry in the background. Never, for this cache
+        """
+        return False
+
+    def set(self, key: CacheKey, value: Any):
+        """
+        :param key: (token, base URL, path)
+        :param value: processed response to keep
+        """
+        ttl = self.ttl_for(key[2])
+        if ttl is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, prefix: str = "", token: Optional[str] = None, base_url: Optional[str] = None):
+        """
+        drop cached entries
+        :param prefix: only drop paths starting with this prefix. Drops everything by default
+        :param token: only drop entries for this token
+        :param base_url: only drop entries for this API base URL
+        """
+        with self._lock:
+            for key in [
+                key
+                for key in self._entries
+                if key[2].startswith(prefix) and token in (None, key[0]) and base_url in (None, key[1])
+            ]:
+                del self._entries[key]
+
+    def invalidate_for(self, method: str, path: str, token: Optional[str] = None, base_url: Optional[str] = None):
+        """
+        drop the entries made stale by a request
+        :param method: HTTP method of the request
+        :param path: endpoint path of the request
+        :param token: token the request was sent with
+        :param base_url: API base URL the request was sent to
+        """
+        if method == "GET":
+            return
+        for mutated, stale_prefixes in INVALIDATIONS.items():
+            if path.startswith(mutated):
+                for prefix in stale_prefixes:
+                    self.invalidate(prefix, token, base_url)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: hit and miss counters and the current number of entries
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PersistentCache(ResponseCache):
+    """
+    A response cache stored in SQLite, so short-lived processes start with warm listings. Entries are keyed by a
+    hash of the token, never the token itself. Within its TTL an entry is served as is; for max_stale seconds
+    after that it is still served, and the client refreshes it in the background. Several processes and threads
+    can share one file: SQLite runs in WAL mode, so readers never wait for a writer.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        max_stale: float = DEFAULT_MAX_STALE,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        """
+        :param path: SQLite file to use. Defaults to lambda_cloud/cache.sqlite3 in the user cache directory
+        :param ttls: seconds each path stays fresh, as for ResponseCache. Covers the instance listing by default
+        :param max_stale: seconds past its TTL an entry is still served while it is refreshed. 0 disables
+        :param max_size: maximum number of entries kept before the least recently stored is evicted
+        """
+        super().__init__(DEFAULT_PERSISTENT_TTLS if ttls is None else ttls, max_size)
+        self.path = path or default_cache_path()
+        self.max_stale = max_stale
+        self.stale_hits = 0
+        self._revalidating = {}  # type: Dict[CacheKey, float]
+        self._connection = None  # type: Optional[sqlite3.Connection]
+        self._pid = None  # type: Optional[int]
+
+    def _connect(self) -> "sqlite3.Connection":
+        # connections must not cross a fork, so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            import sqlite3
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=DEFAULT_BUSY_TIMEOUT, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(responses)")}
+            if columns and "base_url" not in columns:
+                # written by a version that did not tell base URLs apart: a cache can simply start over
+                connection.execute("DROP TABLE responses")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "account TEXT NOT NULL, base_url TEXT NOT NULL, path TEXT NOT NULL, stored_at REAL NOT NULL, "
+                "body BLOB NOT NULL, PRIMARY KEY (account, base_url, path))"
+            )
+            connection.commit()
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """
+        :param key: (token, base URL, path)
+        :return: (found, value). Entries past their TTL and max_stale count as misses
+        """
+        ttl = self.ttl_for(key[2])
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT stored_at, body FROM responses WHERE account = ? AND base_url = ? AND path = ?",
+                (account_hash(key[0]), key[1], key[2]),
+            ).fetchone()
+            age = time.time() - row[0] if row is not None else None
+            if row is None or ttl is None or age > ttl + self.max_stale:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            if age > ttl:
+                self.stale_hits += 1
+        return True, loads(row[1])
+
+    def should_revalidate(self, key: CacheKey) -> bool:
+        """
+        :param key: (token, base URL, path) just served by get
+        :return: True, once per REVALIDATE_INTERVAL, when the entry is past its TTL and should be refreshed
+        """
+        ttl = self.ttl_for(key[2])
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT stored_at FROM responses WHERE account = ? AND base_url = ? AND path = ?",
+                (account_hash(key[0]), key[1], key[2]),
+            ).fetchone()
+            now = time.time()
+            if row is None or ttl is None or now - row[0] <= ttl:
+                return False
+            if now - self._revalidating.get(key, 0.0) < REVALIDATE_INTERVAL:
+                return False
+            self._revalidating[key] = now
+            return True
+
+    def set(self, key: CacheKey, value: Any):
+        """
+        :param key: (token, base URL, path)
+        :param value: processed response to keep
+        """
+        if self.ttl_for(key[2]) is None:
+            return
+        body = dumps(value, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._revalidating.pop(key, None)
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (account, base_url, path, stored_at, body) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (account_hash(key[0]), key[1], key[2], time.time(), body),
+                )
+                connection.execute(
+                    "DELETE FROM responses WHERE rowid IN "
+                    "(SELECT rowid FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,),
+                )
+
+    def invalidate(self, prefix: str = "", token: Optional[str] = None, base_url: Optional[str] = None):
+        """
+        drop cached entries, for every process using the file
+        :param prefix: only drop paths starting with this prefix. Drops everything by default
+        :param token: only drop entries for this token
+        :param base_url: only drop entries for this API base URL
+        """
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = "DELETE FROM responses WHERE path LIKE ? ESCAPE '\\'"
+        parameters = [pattern]
+        if token is not None:
+            query += " AND account = ?"
+            parameters.append(account_hash(token))
+        if base_url is not None:
+            query += " AND base_url = ?"
+            parameters.append(base_url)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(query, parameters)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: hit, stale hit and miss counters of this process and the number of entries in the file
+        """
+        with self._lock:
+            return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses, "size": self._count()}
+
+    def _count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+    def close(self):
+        """
+        close this process's connection to the file
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+def account_hash(token: str) -> str:
+    """
+    :param token: token or Authorization header of an account
+    :return: a stable identifier for the account that does not reveal the token
+    """
+    import hashlib
+
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def default_cache_path() -> str:
+    """
+    :return: lambda_cloud/cache.sqlite3 under XDG_CACHE_HOME, or ~/.cache when it is unset
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "lambda_cloud", "cache.sqlite3")
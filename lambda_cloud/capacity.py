@@ -0,0 +1,320 @@
+import bisect
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from lambda_cloud.fleet import INSUFFICIENT_CAPACITY
+from lambda_cloud.instances import LambdaCloudInstance
+from lambda_cloud.polling import AdaptiveInterval
+from lambda_cloud.resilience import CircuitOpenError
+from utilities import error_code
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 30.0
+# share of the client's general request rate the poll loop may use, leaving the rest to other calls
+DEFAULT_POLL_SHARE = 0.5
+
+Pair = Tuple[str, str]
+
+
+class Grab(NamedTuple):
+    """
+    Instances launched for a queued request once capacity appeared. Times are time.monotonic() readings.
+    """
+
+    instance_type_name: str
+    region_name: str
+    instance_ids: List[str]
+    detected_at: float
+    sent_at: float
+    launched_at: float
+
+    @property
+    def latency(self) -> float:
+        """
+        :return: seconds from seeing the capacity to sending the launch request
+        """
+        return self.sent_at - self.detected_at
+
+    @property
+    def round_trip(self) -> float:
+        """
+        :return: seconds from seeing the capacity to the launch being accepted
+        """
+        return self.launched_at - self.detected_at
+
+
+class LaunchRequest:
+    """
+    A launch waiting in a CapacityWatcher's queue for capacity.
+    """
+
+    def __init__(
+        self,
+        instance_type_name: str,
+        ssh_key_names: List[str],
+        regions: Optional[List[str]],
+        quantity: int,
+        priority: int,
+        name: Optional[str],
+        file_system_names: Optional[List[str]],
+    ):
+        self.instance_type_name = instance_type_name
+        self.ssh_key_names = ssh_key_names
+        self.regions = regions
+        self.quantity = quantity
+        self.priority = priority
+        self.name = name
+        self.file_system_names = file_system_names or []
+        self.submitted_at = time.monotonic()
+        self.grab = None  # type: Optional[Grab]
+        self.error = None  # type: Optional[Exception]
+        self.cancelled = False
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> Grab:
+        """
+        :param timeout: seconds to wait. By default, wait until the request is served, fails or is cancelled
+        :return: what was launched
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"no capacity for {self.instance_type_name} within {timeout} seconds")
+        if self.error is not None:
+            raise self.error
+        if self.grab is None:
+            raise RuntimeError("the launch request was cancelled")
+        return self.grab
+
+    def _finish(self, grab: Optional[Grab] = None, error: Optional[Exception] = None):
+        self.grab, self.error = grab, error
+        self._done.set()
+
+    def __repr__(self):
+        return f"LaunchRequest({self.instance_type_name}, regions={self.regions}, priority={self.priority})"
+
+
+class CapacityWatcher:
+    """
+    Polls the instance type catalog and launches queued requests the moment capacity shows up for them.
+    Polls bypass the response cache. Capacity that appears between two polls is stamped with the time its poll
+    returned, and launches are sent right away, highest priority first, one after the other so the launch rate
+    limit serves them in that order. A lost race puts the request back in the queue. While requests wait, polls run
+    at the minimum interval, never faster than poll_share of the client's rate limit allows; with an empty queue
+    the interval grows to the maximum.
+    """
+
+    def __init__(
+        self,
+        client: LambdaCloudInstance,
+        interval: AdaptiveInterval = None,
+        poll_share: float = DEFAULT_POLL_SHARE,
+    ):
+        """
+        :param client: client used to read the catalog and launch instances
+        :param interval: poll interval policy. The default polls every second while requests wait, every 30 at most
+        :param poll_share: largest share of the client's general rate limit the polls may use
+        """
+        if not 0 < poll_share <= 1:
+            raise ValueError("poll_share must be in (0, 1]")
+        self.client = client
+        interval = interval or AdaptiveInterval(DEFAULT_MIN_INTERVAL, DEFAULT_MAX_INTERVAL)
+        minimum, maximum = interval.minimum, interval.maximum
+        if client.rate_limiter is not None:
+            minimum = max(minimum, 1 / (client.rate_limiter.bucket.rate * poll_share))
+            maximum = max(maximum, minimum)
+        # a policy of its own, so neither the floor nor the backoff state leaks into an interval the caller shares
+        self.interval = AdaptiveInterval(minimum, maximum, interval.factor)
+        self.polls = 0
+        self.detections = 0
+        self.lost_races = 0
+        self.grabs = []  # type: List[Grab]
+        self._available = {}  # type: Dict[Pair, float]
+        self._queue = []  # type: List[Tuple[int, int, LaunchRequest]]
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(
+        self,
+        instance_type_name: str,
+        ssh_key_names: List[str],
+        regions: Optional[List[str]] = None,
+        quantity: int = 1,
+        priority: int = 0,
+        name: Optional[str] = None,
+        file_system_names: Optional[List[str]] = None,
+    ) -> LaunchRequest:
+        """
+        queue a launch to send as soon as the instance type has capacity in one of the regions
+        :param instance_type_name: name of the instance type
+        :param ssh_key_names: names of the SSH keys to allow access to the instances
+        :param regions: acceptable region names, most preferred first. Any region when omitted
+        :param quantity: number of instances to launch
+        :param priority: lower numbers are served first; equal priorities in submission order
+        :param name: user-provided name for the instances
+        :param file_system_names: names of the file systems to attach to the instances
+        :return: the queued request, to wait on or cancel
+        """
+        request = LaunchRequest(instance_type_name, ssh_key_names, regions, quantity, priority, name, file_system_names)
+        with self._lock:
+            bisect.insort(self._queue, (priority, next(self._sequence), request))
+        self._wake.set()
+        return request
+
+    def cancel(self, request: LaunchRequest):
+        """
+        take a request out of the queue. A launch already sent for it is not undone
+        """
+        with self._lock:
+            self._queue = [entry for entry in self._queue if entry[2] is not request]
+            request.cancelled = True
+        if not request.done:
+            request._finish()
+
+    def poll(self) -> List[Pair]:
+        """
+        read the catalog once, then launch every queued request that now has capacity
+        :return: the (instance type name, region name) pairs whose capacity appeared with this poll
+        """
+        catalog = self.client.get_instance_types(fresh=True)["data"]
+        now = time.monotonic()
+        current = {
+            (name, region["name"])
+            for name, entry in catalog.items()
+            for region in entry.get("regions_with_capacity_available") or ()
+        }  # type: Set[Pair]
+        with self._lock:
+            self.polls += 1
+            appeared = [pair for pair in current if pair not in self._available]
+            self._available = {pair: self._available.get(pair, now) for pair in current}
+            self.detections += len(appeared)
+        self._dispatch()
+        return appeared
+
+    def _dispatch(self):
+        with self._lock:
+            queued = list(self._queue)
+        for _, _, request in queued:
+            # after a lost race the request tries its next acceptable region right away
+            while not request.cancelled:
+                with self._lock:
+                    pair = self._pick(request)
+                    if pair is None:
+                        break
+                    detected_at = max(self._available[pair], request.submitted_at)
+                if not self._launch(request, pair, detected_at):
+                    break
+
+    def _pick(self, request: LaunchRequest) -> Optional[Pair]:
+        if request.regions is None:
+            pairs = sorted(pair for pair in self._available if pair[0] == request.instance_type_name)
+            return pairs[0] if pairs else None
+        for region_name in request.regions:
+            if (request.instance_type_name, region_name) in self._available:
+                return request.instance_type_name, region_name
+        return None
+
+    def _launch(self, request: LaunchRequest, pair: Pair, detected_at: float) -> bool:
+        """
+        :return: whether the launch lost the race for the capacity, so another region may be tried
+        """
+        sent_at = time.monotonic()
+        try:
+            instance_ids = self.client.launch_instance(
+                region_name=pair[1],
+                instance_type_name=pair[0],
+                ssh_key_names=request.ssh_key_names,
+                file_system_names=request.file_system_names,
+                quantity=request.quantity,
+                name=request.name,
+            )["data"]["instance_ids"]
+        except CircuitOpenError:
+            # nothing was sent: the request stays queued for a later poll
+            logger.warning("launching %s in %s was held back by the circuit breaker", pair[0], pair[1])
+            return False
+        except Exception as error:
+            # anything else, e.g. a rejected launch or invalid arguments, would fail again: the request fails
+            with self._lock:
+                if error_code(error) == INSUFFICIENT_CAPACITY:
+                    # someone else got there first: wait for the next poll to show capacity again
+                    self.lost_races += 1
+                    self._available.pop(pair, None)
+                    return True
+                self._queue = [entry for entry in self._queue if entry[2] is not request]
+            request._finish(error=error)
+            return False
+        grab = Grab(pair[0], pair[1], instance_ids, detected_at, sent_at, time.monotonic())
+        with self._lock:
+            self._queue = [entry for entry in self._queue if entry[2] is not request]
+            self.grabs.append(grab)
+        logger.info("launched %s in %s %.3fs after capacity appeared", pair[0], pair[1], grab.round_trip)
+        request._finish(grab)
+        return False
+
+    def start(self):
+        """
+        poll from a background thread until stop()
+        """
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="lambda-cloud-capacity", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        stop polling. Queued requests stay queued
+        """
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("polling capacity failed")
+            with self._lock:
+                waiting = bool(self._queue)
+            self._wake.wait(self.interval.next(waiting))
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: polls, capacity appearances seen, grabs, launches that lost the race, queued requests, and
+        detection-to-launch latency percentiles in seconds
+        """
+        with self._lock:
+            latencies = sorted(grab.round_trip for grab in self.grabs)
+            return {
+                "polls": self.polls,
+                "detections": self.detections,
+                "grabs": len(self.grabs),
+                "lost_races": self.lost_races,
+                "queued": len(self._queue),
+                "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                "latency_max": latencies[-1] if latencies else 0.0,
+            }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
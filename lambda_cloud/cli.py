@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Only the standard library is imported up front. The client, and with it requests, is imported by the commands
+# that send requests, so help, usage errors and output formatting start as fast as the interpreter does.
+
+TOKEN_ENV = "LAMBDA_CLOUD_TOKEN"
+BASE_URL_ENV = "LAMBDA_CLOUD_BASE_URL"
+OUTPUTS = ("table", "json")
+
+# (header, dotted path into the record) pairs shown by the table output
+INSTANCE_COLUMNS = (
+    ("ID", "id"),
+    ("NAME", "name"),
+    ("STATUS", "status"),
+    ("TYPE", "instance_type.name"),
+    ("REGION", "region.name"),
+    ("IP", "ip"),
+)
+INSTANCE_TYPE_COLUMNS = (
+    ("NAME", "name"),
+    ("PRICE/H", "price"),
+    ("VCPUS", "specs.vcpus"),
+    ("MEMORY GIB", "specs.memory_gib"),
+    ("REGIONS", "regions"),
+)
+OPERATION_COLUMNS = (("ID", "id"), ("STATUS", "status"))
+SSH_KEY_COLUMNS = (("ID", "id"), ("NAME", "name"))
+FILE_SYSTEM_COLUMNS = (
+    ("ID", "id"),
+    ("NAME", "name"),
+    ("REGION", "region.name"),
+    ("MOUNT POINT", "mount_point"),
+    ("IN USE", "is_in_use"),
+)
+
+Columns = Sequence[Tuple[str, str]]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="lambda-cloud", description="Manage Lambda Cloud instances from the shell")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV), help=f"API token. Defaults to ${TOKEN_ENV}")
+    parser.add_argument("--output", "-o", choices=OUTPUTS, default="table", help="output format")
+    parser.add_argument("--base-url", default=os.environ.get(BASE_URL_ENV), help="root of the API")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the API")
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="keep listings in the persistent cache, so repeated calls are answered from disk",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    listing = commands.add_parser("list", help="list instances")
+    listing.add_argument("--status", action="append", help="only show instances with this status")
+    listing.set_defaults(run=run_list)
+
+    types = commands.add_parser("instance-types", help="list instance types and where they have capacity")
+    types.add_argument("--available", action="store_true", help="only show types with capacity")
+    types.set_defaults(run=run_instance_types)
+
+    launch = commands.add_parser("launch", help="launch instances")
+    launch.add_argument("--region", required=True, help="short name of the region, e.g. us-tx-1")
+    launch.add_argument("--type", required=True, dest="instance_type", help="instance type, e.g. gpu_1x_a10")
+    launch.add_argument("--ssh-key", required=True, help="name of the ssh key allowed to log in")
+    launch.add_argument("--file-system", help="name of a file system to attach")
+    launch.add_argument("--quantity", type=int, default=1, help="number of instances")
+    launch.add_argument("--name", help="name of the instances")
+    launch.add_argument("--wait", action="store_true", help="wait until the instances are active")
+    launch.set_defaults(run=run_launch)
+
+    for name, help_text in (("terminate", "terminate instances"), ("restart", "restart instances")):
+        operation = commands.add_parser(name, help=help_text)
+        operation.add_argument("instance_ids", nargs="+", metavar="instance-id")
+        operation.set_defaults(run=run_bulk)
+
+    ssh_keys = commands.add_parser("ssh-keys", help="list, add, ensure or delete ssh keys")
+    ssh_keys.set_defaults(run=run_list_ssh_keys)
+    actions = ssh_keys.add_subparsers(dest="action", metavar="action")
+    actions.add_parser("list", help="list ssh keys").set_defaults(run=run_list_ssh_keys)
+    add = actions.add_parser("add", help="add an ssh key, generating a key pair unless a public key is given")
+    add.add_argument("name")
+    add.add_argument("--public-key", type=argparse.FileType("r"), help="file holding the public key, or - for stdin")
+    add.set_defaults(run=run_add_ssh_key)
+    ensure = actions.add_parser("ensure", help="add an ssh key unless one by that name holds the same public key")
+    ensure.add_argument("name")
+    ensure.add_argument("--public-key", type=argparse.FileType("r"), help="file holding the public key, or - for stdin")
+    ensure.add_argument("--replace", action="store_true", help="swap a key by that name holding another public key")
+    ensure.set_defaults(run=run_add_ssh_key)
+    delete = actions.add_parser("delete", help="delete ssh keys by id, name or SHA256 fingerprint")
+    delete.add_argument("ssh_keys", nargs="+", metavar="ssh-key")
+    delete.set_defaults(run=run_delete_ssh_keys)
+
+    commands.add_parser("file-systems", help="list file systems").set_defaults(run=run_file_systems)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    run the lambda-cloud command line
+    :param argv: arguments after the program name. Defaults to sys.argv
+    :return: exit status. 1 when the API rejected a request, 2 for usage errors
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error(f"an API token is required: pass --token or set ${TOKEN_ENV}")
+    try:
+        return args.run(args)
+    except KeyboardInterrupt:
+        return 130
+    except (OSError, ValueError) as error:
+        # requests raises OSError subclasses for HTTP and connection errors
+        print(f"lambda-cloud: {describe(error)}", file=sys.stderr)
+        return 1
+
+
+def connect(args: argparse.Namespace):
+    """
+    :return: a LambdaCloudClient configured from the global options
+    """
+    from lambda_cloud.client import LambdaCloudClient
+
+    options = {"timeout": args.timeout}  # type: Dict[str, Any]
+    if args.base_url:
+        options["base_url"] = args.base_url
+    if args.cache:
+        from lambda_cloud.cache import PersistentCache
+
+        # the process exits before a background refresh could finish, so stale entries are fetched again instead
+        options["cache"] = PersistentCache(max_stale=0)
+    return LambdaCloudClient(args.token, **options)
+
+
+def run_list(args: argparse.Namespace) -> int:
+    with connect(args) as client:
+        records = client.instances.get_all_instances()["data"]
+    if args.status:
+        records = [record for record in records if record.get("status") in args.status]
+    emit(records, INSTANCE_COLUMNS, args.output)
+    return 0
+
+
+def run_instance_types(args: argparse.Namespace) -> int:
+    with connect(args) as client:
+        catalog = client.instances.get_instance_types()["data"]
+    if args.available:
+        catalog = {name: entry for name, entry in catalog.items() if entry.get("regions_with_capacity_available")}
+    if args.output == "json":
+        emit(catalog, (), args.output)
+        return 0
+    rows = []
+    for entry in catalog.values():
+        instance_type = entry.get("instance_type") or {}
+        cents = instance_type.get("price_cents_per_hour")
+        regions = entry.get("regions_with_capacity_available") or []
+        rows.append(
+            dict(
+                instance_type,
+                price=f"${int(cents) / 100:.2f}" if cents is not None else None,
+                regions=[region.get("name") for region in regions],
+            )
+        )
+    emit(sorted(rows, key=lambda row: row.get("name") or ""), INSTANCE_TYPE_COLUMNS, args.output)
+    return 0
+
+
+def run_launch(args: argparse.Namespace) -> int:
+    with connect(args) as client:
+        instance_ids = client.instances.launch_instance(
+            region_name=args.region,
+            instance_type_name=args.instance_type,
+            ssh_key_names=[args.ssh_key],
+            file_system_names=[args.file_system] if args.file_system else [],
+            quantity=args.quantity,
+            name=args.name,
+        )["data"]["instance_ids"]
+        if not args.wait:
+            emit([{"id": instance_id} for instance_id in instance_ids], (("ID", "id"),), args.output)
+            return 0
+        reached = client.instances.wait_for_status(instance_ids, "active")
+    emit([reached[instance_id] for instance_id in instance_ids], INSTANCE_COLUMNS, args.output)
+    return 0
+
+
+def run_bulk(args: argparse.Namespace) -> int:
+    from lambda_cloud.bulk import BulkOperations
+
+    with connect(args) as client:
+        bulk = BulkOperations(client.instances)
+        result = bulk.terminate(args.instance_ids) if args.command == "terminate" else bulk.restart(args.instance_ids)
+    emit(list(result.succeeded.values()), OPERATION_COLUMNS, args.output)
+    for instance_id, error in result.failed.items():
+        print(f"lambda-cloud: {args.command} {instance_id}: {describe(error)}", file=sys.stderr)
+    return 0 if result.ok else 1
+
+
+def run_list_ssh_keys(args: argparse.Namespace) -> int:
+    with connect(args) as client:
+        records = client.ssh_keys.get_ssh_keys()["data"]
+    emit(records, SSH_KEY_COLUMNS, args.output)
+    return 0
+
+
+def run_add_ssh_key(args: argparse.Namespace) -> int:
+    public_key = None
+    if args.public_key is not None:
+        with args.public_key:
+            public_key = args.public_key.read().strip()
+    with connect(args) as client:
+        if args.action == "ensure":
+            from lambda_cloud.ssh_key_index import SshKeyIndex
+
+            record = SshKeyIndex(client.ssh_keys).ensure_ssh_key(args.name, public_key, replace=args.replace)
+        else:
+            record = client.ssh_keys.add_ssh_key(args.name, public_key)["data"]
+    emit([record], SSH_KEY_COLUMNS, args.output)
+    if args.output == "table" and record.get("private_key"):
+        # generated key pairs are only returned once, so show the private key to save
+        print()
+        print(record["private_key"].rstrip())
+    return 0
+
+
+def run_delete_ssh_keys(args: argparse.Namespace) -> int:
+    from lambda_cloud.ssh_key_index import SshKeyIndex
+
+    with connect(args) as client:
+        index = SshKeyIndex(client.ssh_keys)
+        names, fingerprints, ids = [], [], []  # type: Tuple[List[str], List[str], List[str]]
+        for key in args.ssh_keys:
+            if key.startswith("SHA256:"):
+                fingerprints.append(key)
+            elif index.get(key) is not None:
+                names.append(key)
+            else:
+                ids.append(key)
+        result = index.delete(names, fingerprints, ids)
+    emit(list(result.succeeded.values()), SSH_KEY_COLUMNS, args.output)
+    for key, error in result.failed.items():
+        print(f"lambda-cloud: delete ssh key {key}: {describe(error)}", file=sys.stderr)
+    return 0 if result.ok else 1
+
+
+def run_file_systems(args: argparse.Namespace) -> int:
+    with connect(args) as client:
+        records = client.file_systems.get_file_systems()["data"]
+    emit(records, FILE_SYSTEM_COLUMNS, args.output)
+    return 0
+
+
+def emit(data: Any, columns: Columns, output: str):
+    """
+    print records to stdout
+    :param data: records to print. JSON output prints it as is
+    :param columns: (header, dotted path) pairs shown by the table output
+    :param output: table or json
+    """
+    if output == "json":
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    for line in format_table(data, columns):
+        print(line)
+
+
+def format_table(records: Iterable[Dict[str, Any]], columns: Columns) -> List[str]:
+    """
+    :param records: records to lay out, one per row
+    :param columns: (header, dotted path) pairs, e.g. ("REGION", "region.name")
+    :return: the lines of a left-aligned table with a header row
+    """
+    rows = [[header for header, _ in columns]]
+    rows.extend([cell(lookup(record, path)) for _, path in columns] for record in records)
+    widths = [max(len(row[index]) for row in rows) for index in range(len(columns))]
+    return ["  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+
+
+def lookup(record: Dict[str, Any], path: str) -> Any:
+    value = record  # type: Any
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def cell(value: Any) -> str:
+    if value is None or value == []:
+        return "-"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return str(value)
+
+
+def describe(error: BaseException) -> str:
+    """
+    :return: the API error code and message for a rejected request, or the error itself otherwise
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            body = response.json()["error"]
+            return f"{response.status_code} {body['code']}: {body['message']}"
+        except (ValueError, KeyError, TypeError):
+            return f"{response.status_code} {response.reason or ''}".rstrip()
+    return str(error) or type(error).__name__
+
+
+if __name__ == "__main__":
+    sys.exit(main())
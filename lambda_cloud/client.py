@@ -0,0 +1,137 @@
+from typing import Any, Dict, Optional
+
+from lambda_cloud.base import (
+    DEFAULT_BASE_URL,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    USE_DEFAULT,
+    SharedSession,
+    build_async_session,
+    build_session,
+)
+from lambda_cloud.cache import ResponseCache
+from lambda_cloud.coalesce import SingleFlight
+from lambda_cloud.file_systems import AsyncLambdaCloudFileSystem, LambdaCloudFileSystem
+from lambda_cloud.instances import AsyncLambdaCloudInstance, LambdaCloudInstance
+from lambda_cloud.metrics import RequestHooks
+from lambda_cloud.rate_limit import RateLimiter, RetryPolicy
+from lambda_cloud.resilience import CircuitBreaker, HedgePolicy
+from lambda_cloud.ssh_keys import AsyncLambdaCloudSshKey, LambdaCloudSshKey
+from lambda_cloud.transport import Transport
+
+
+class LambdaCloudClient:
+    """
+    This class exposes instances, ssh keys and file systems over one shared connection pool.
+    """
+
+    _instance_class = LambdaCloudInstance
+    _ssh_key_class = LambdaCloudSshKey
+    _file_system_class = LambdaCloudFileSystem
+    _build_session = staticmethod(build_session)
+
+    def __init__(
+        self,
+        token,
+        session: Optional[Any] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = USE_DEFAULT,
+        retry_policy: Optional[RetryPolicy] = USE_DEFAULT,
+        cache: Optional[ResponseCache] = None,
+        base_url: str = DEFAULT_BASE_URL,
+        hooks: Optional[RequestHooks] = None,
+        single_flight: Optional[SingleFlight] = USE_DEFAULT,
+        timeouts: Optional[Dict[str, float]] = None,
+        hedging: Optional[HedgePolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[Transport] = None,
+    ):
+        """
+        :param token: secret token gotten from the Lambda Cloud console
+        :param session: pooled session to use. A new one is built on first use when omitted
+        :param pool_size: size of the connection pool when a new session is built
+        :param timeout: seconds to wait for the API before giving up on a request
+        :param rate_limiter: limiter shared by all resources. None disables limiting
+        :param retry_policy: decides which responses are retried and when. None disables retries
+        :param cache: response cache shared by all resources, so writes through one invalidate reads of another
+        :param base_url: root of the API, e.g. to point the client at a local stand-in
+        :param hooks: callbacks receiving a RequestEvent after every call, e.g. a MetricsCollector
+        :param single_flight: lets concurrent identical GETs share one request. Its callers receive the same result
+        object, like cached reads, so treat it as read-only. None sends each one separately
+        :param timeouts: seconds to wait per endpoint template, e.g. {"/v1/instances/{id}": 5}, overriding timeout
+        :param hedging: policy shared by all resources for sending a duplicate of slow GETs. Off by default
+        :param circuit_breaker: breaker shared by all resources, so failures seen by one hold back the others
+        :param transport: sees every request of every resource before it is sent, e.g. to record or replay a cassette
+        """
+        self._owns_session = session is None
+        self._shared_session = SharedSession(self._build_session, pool_size, session)
+        self.rate_limiter = RateLimiter() if rate_limiter is USE_DEFAULT else rate_limiter
+        self.retry_policy = RetryPolicy() if retry_policy is USE_DEFAULT else retry_policy
+        self.cache = cache
+        self.hooks = hooks
+        self.single_flight = SingleFlight() if single_flight is USE_DEFAULT else single_flight
+        self.hedging = hedging
+        self.circuit_breaker = circuit_breaker
+        self.transport = transport
+        options = {
+            "session": self._shared_session,
+            "timeout": timeout,
+            "rate_limiter": self.rate_limiter,
+            "retry_policy": self.retry_policy,
+            "cache": self.cache,
+            "base_url": base_url,
+            "hooks": self.hooks,
+            "single_flight": self.single_flight,
+            "timeouts": timeouts,
+            "hedging": self.hedging,
+            "circuit_breaker": self.circuit_breaker,
+            "transport": self.transport,
+        }
+        self.instances = self._instance_class(token, **options)
+        self.ssh_keys = self._ssh_key_class(token, **options)
+        self.file_systems = self._file_system_class(token, **options)
+
+    @property
+    def session(self) -> Any:
+        return self._shared_session.get()
+
+    def close(self):
+        """
+        close the shared connection pool, if this client created it
+        """
+        for resource in (self.instances, self.ssh_keys, self.file_systems):
+            # resources do not own the shared pool, so this only stops their hedging threads
+            resource.close()
+        if self._owns_session and self._shared_session.built:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncLambdaCloudClient(LambdaCloudClient):
+    """
+    This class exposes the async instances, ssh keys and file systems clients over one shared connection pool.
+    """
+
+    _instance_class = AsyncLambdaCloudInstance
+    _ssh_key_class = AsyncLambdaCloudSshKey
+    _file_system_class = AsyncLambdaCloudFileSystem
+    _build_session = staticmethod(build_async_session)
+
+    async def close(self):
+        """
+        close the shared connection pool, if this client created it
+        """
+        if self._owns_session and self._shared_session.built:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
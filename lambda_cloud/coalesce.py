@@ -0,0 +1,120 @@
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None  # type: Any
+        self.error = None  # type: BaseException
+
+
+class SingleFlight:
+    """
+    Lets concurrent identical reads share one in-flight request. The first caller for a key sends it, and callers
+    arriving before it completes wait for and receive the same result object, not a copy, or the same exception.
+    Callers must therefore treat the result as read-only. Nothing is kept once the request completes, so later
+    calls send a fresh one. Works for threads and for asyncio tasks.
+    Writes bump a generation per scope (e.g. token) that callers put in their keys, so a read issued after a write
+    never joins a flight that started before the write completed.
+    """
+
+    def __init__(self):
+        self._flights = {}  # type: Dict[Hashable, _Flight]
+        self._generations = {}  # type: Dict[Hashable, int]
+        self._tasks = {}  # type: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future]
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.shared = 0
+
+    def generation(self, scope: Hashable) -> int:
+        """
+        :param scope: what writes are counted for, e.g. token and base URL
+        :return: number of writes completed in the scope, to include in flight keys
+        """
+        with self._lock:
+            return self._generations.get(scope, 0)
+
+    def bump(self, scope: Hashable):
+        """
+        count a completed write, so later reads in the scope start a new flight
+        :param scope: what the write changed, e.g. token and base URL
+        """
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    def do(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """
+        :param key: identifies identical requests, e.g. token and path
+        :param call: sends the request and returns its result
+        :return: the result of the call in flight for the key, or of this call when none was
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.requests += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = call()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    async def do_async(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        :param key: identifies identical requests, e.g. token and path
+        :param call: coroutine function sending the request and returning its result
+        :return: the result of the call in flight for the key on this event loop, or of this call when none was
+        """
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        task_key = (loop, key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                # the request runs as its own task, so cancelling one caller does not cancel it for the others
+                task = self._tasks[task_key] = loop.create_task(call())
+                task.add_done_callback(lambda done: self._finish(task_key, done))
+                self.requests += 1
+            else:
+                self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, task_key: Tuple["asyncio.AbstractEventLoop", Hashable], task: "asyncio.Future"):
+        with self._lock:
+            self._tasks.pop(task_key, None)
+        if not task.cancelled():
+            # mark the exception retrieved even when every caller was cancelled
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: requests sent, calls served by another caller's request, and requests in flight now
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "shared": self.shared,
+                "in_flight": len(self._flights) + len(self._tasks),
+            }
@@ -1,8 +1,6 @@
-from lambda_cloud.base import Base
-from typing import List, Dict, Any
-from utilities import process_request
-
-from requests import request
+from lambda_cloud.base import AsyncBase, Base
+from lambda_cloud.models import ModelList, parse_file_systems
+from typing import List, Dict, Any, Union
 
 
 class LambdaCloudFileSystem(Base):
@@ -10,15 +8,16 @@ class LambdaCloudFileSystem(Base):
     This class is used to interact with Lambda Cloud file systems.
     """
 
-    def get_file_systems(self) -> Dict[str, List[Dict[str, Any]]]:
+    def get_file_systems(self, models: bool = False) -> Union[Dict[str, List[Dict[str, Any]]], ModelList]:
         """
         Retrieve the list of file systems
+        :param models: return a ModelList of FileSystem models instead of the response dict
         :return: Returns a list of all file systems associated with the user's account.
         """
-        url = f"{self.base_url}/v1/file-systems"
-        results = request(
-            "GET",
-            url,
-            headers=self.headers,
-        )
-        return process_request(results)
+        return self._call("GET", "/v1/file-systems", parse=parse_file_systems if models else None)
+
+
+class AsyncLambdaCloudFileSystem(AsyncBase, LambdaCloudFileSystem):
+    """
+    This class is used to interact with Lambda Cloud file systems from asyncio. Every method is awaitable.
+    """
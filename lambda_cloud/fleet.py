@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from lambda_cloud.instances import LambdaCloudInstance
+from lambda_cloud.models import gpus_per_instance
+from utilities import error_code
+
+INSUFFICIENT_CAPACITY = "instance-operations/launch/insufficient-capacity"
+DEFAULT_MAX_WORKERS = 8
+
+
+class FleetLaunch(NamedTuple):
+    """
+    Instances obtained by one launch request.
+    """
+
+    region_name: str
+    instance_type_name: str
+    instance_ids: List[str]
+    gpus: int
+
+
+class FleetFailure(NamedTuple):
+    """
+    A launch request that did not get instances.
+    """
+
+    region_name: str
+    instance_type_name: str
+    quantity: int
+    error: Exception
+    capacity: bool
+
+
+class FleetResult:
+    """
+    What a fleet launch obtained, and where.
+    """
+
+    def __init__(self, requested_gpus: int):
+        self.requested_gpus = requested_gpus
+        self.launches = []  # type: List[FleetLaunch]
+        self.failures = []  # type: List[FleetFailure]
+
+    @property
+    def gpus(self) -> int:
+        return sum(launch.gpus for launch in self.launches)
+
+    @property
+    def instance_ids(self) -> List[str]:
+        return [instance_id for launch in self.launches for instance_id in launch.instance_ids]
+
+    @property
+    def complete(self) -> bool:
+        return self.gpus >= self.requested_gpus
+
+    def by_region(self) -> Dict[str, List[str]]:
+        """
+        :return: launched instance ids keyed by region name
+        """
+        regions = {}  # type: Dict[str, List[str]]
+        for launch in self.launches:
+            regions.setdefault(launch.region_name, []).extend(launch.instance_ids)
+        return regions
+
+    def __repr__(self):
+        return f"FleetResult(gpus={self.gpus}/{self.requested_gpus}, launches={self.launches}, failures={self.failures})"
+
+
+class FleetLauncher:
+    """
+    Launches a number of GPUs over several instance types and regions at once. Each round sends one launch
+    request per region concurrently; a region that reports no capacity is dropped for that type and its share
+    moves to the next candidate in the following round.
+    """
+
+    def __init__(self, client: LambdaCloudInstance, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        :param client: client used to read the catalog and launch instances. Its rate limiter paces the requests
+        :param max_workers: maximum number of launch requests in flight
+        """
+        self.client = client
+        self.max_workers = max_workers
+
+    def candidates(self, instance_types: List[str], regions: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        list the (instance type, region) pairs with capacity right now, in order of preference
+        :param instance_types: acceptable instance type names, most preferred first
+        :param regions: acceptable region names, most preferred first. Any region when omitted
+        :return: (instance type name, region name) pairs
+        """
+        catalog = self.client.get_instance_types()["data"]
+        pairs = []
+        for instance_type_name in instance_types:
+            details = catalog.get(instance_type_name)
+            if details is None or not gpus_per_instance(instance_type_name):
+                continue
+            available = [region["name"] for region in details["regions_with_capacity_available"]]
+            if regions is not None:
+                available = [region_name for region_name in regions if region_name in available]
+            pairs.extend((instance_type_name, region_name) for region_name in available)
+        return pairs
+
+    def launch(
+        self,
+        gpus: int,
+        instance_types: List[str],
+        ssh_key_names: List[str],
+        regions: Optional[List[str]] = None,
+        file_system_names: Optional[List[str]] = None,
+        name: str = None,
+    ) -> FleetResult:
+        """
+        launch at least the given number of GPUs using any of the instance types in any of the regions
+        :param gpus: number of GPUs wanted
+        :param instance_types: acceptable instance type names, most preferred first
+        :param ssh_key_names: names of the SSH keys to allow access to the instances
+        :param regions: acceptable region names, most preferred first. Any region when omitted
+        :param file_system_names: names of the file systems to attach to the instances
+        :param name: user-provided name for the instances
+        :return: the instances obtained in each region, and the requests that failed
+        """
+        if gpus <= 0:
+            raise ValueError("gpus must be positive")
+
+        result = FleetResult(gpus)
+        candidates = self.candidates(instance_types, regions)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while candidates and not result.complete:
+                round_plan = self._plan_round(candidates, gpus - result.gpus)
+                futures = {
+                    executor.submit(
+                        self.client.launch_instance,
+                        region_name=region_name,
+                        instance_type_name=instance_type_name,
+                        ssh_key_names=ssh_key_names,
+                        file_system_names=file_system_names or [],
+                        quantity=quantity,
+                        name=name,
+                    ): (instance_type_name, region_name, quantity)
+                    for (instance_type_name, region_name), quantity in round_plan.items()
+                }
+                # every future is settled before the next round, so one failure never hides launches that succeeded
+                for future, (instance_type_name, region_name, quantity) in futures.items():
+                    try:
+                        instance_ids = future.result()["data"]["instance_ids"]
+                    except Exception as error:
+                        capacity = error_code(error) == INSUFFICIENT_CAPACITY
+                        result.failures.append(
+                            FleetFailure(region_name, instance_type_name, quantity, error, capacity)
+                        )
+                        candidates.remove((instance_type_name, region_name))
+                        continue
+                    if not instance_ids:
+                        # nothing launched and no error to go on, so do not ask this pair again
+                        candidates.remove((instance_type_name, region_name))
+                        continue
+                    result.launches.append(
+                        FleetLaunch(
+                            region_name,
+                            instance_type_name,
+                            instance_ids,
+                            len(instance_ids) * gpus_per_instance(instance_type_name),
+                        )
+                    )
+        return result
+
+    @staticmethod
+    def _plan_round(candidates: List[Tuple[str, str]], missing_gpus: int) -> Dict[Tuple[str, str], int]:
+        """
+        spread the missing GPUs over the preferred instance type of each region, one instance at a time
+        :return: quantity to launch per (instance type name, region name)
+        """
+        preferred = {}  # type: Dict[str, Tuple[str, str]]
+        for instance_type_name, region_name in candidates:
+            preferred.setdefault(region_name, (instance_type_name, region_name))
+
+        plan = {}  # type: Dict[Tuple[str, str], int]
+        planned_gpus = 0
+        while planned_gpus < missing_gpus:
+            for pair in preferred.values():
+                plan[pair] = plan.get(pair, 0) + 1
+                planned_gpus += gpus_per_instance(pair[0])
+                if planned_gpus >= missing_gpus:
+                    break
+        return plan
@@ -1,10 +1,9 @@
 import time
 
-from lambda_cloud.base import Base
-from typing import List, Dict, Any
-from utilities import process_request
-
-from requests import request
+from lambda_cloud.base import AsyncBase, Base
+from lambda_cloud.models import Instance, InstanceType, ModelList, parse_instance, parse_instance_types, parse_instances
+from lambda_cloud.polling import AdaptiveInterval, StatusWaiter
+from typing import Any, Dict, Iterator, List, Union
 
 
 class LambdaCloudInstance(Base):
@@ -12,46 +11,40 @@ class LambdaCloudInstance(Base):
     This class is used to interact with Lambda Cloud instances.
     """
 
-    def get_instance_types(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    def get_instance_types(
+        self, models: bool = False, fresh: bool = False
+    ) -> Union[Dict[str, Dict[str, Dict[str, Any]]], Dict[str, InstanceType]]:
         """
         get instance types available on Lambda GPU Cloud, including regions in which they are available.
+        :param models: return InstanceType models keyed by name instead of the response dict
+        :param fresh: ask the API even when a cached catalog is fresh, and cache the answer
         :return: Returns a detailed list of the instance types offered by Lambda GPU Cloud.
         The details include the regions, if any, in which each instance type is currently available
         """
-        url = f"{self.base_url}/v1/instance-types"
-        results = request(
-            "GET",
-            url,
-            headers=self.headers,
-        )
-        return process_request(results)
+        return self._call("GET", "/v1/instance-types", parse=parse_instance_types if models else None, refresh=fresh)
 
-    def get_all_instances(self) -> Dict[str, List[Dict[str, Any]]]:
+    def get_all_instances(
+        self, models: bool = False, stream: bool = False
+    ) -> Union[Dict[str, List[Dict[str, Any]]], ModelList, Iterator[Union[Dict[str, Any], Instance]]]:
         """
         get all instances associated with the user's account
+        :param models: return a ModelList of Instance models instead of the response dict
+        :param stream: return an iterator yielding instances one by one as the response arrives, without
+        building the full listing. Async clients return an async iterator. Streamed listings bypass the cache
         :return: Returns a list of all instances associated with the user's account.
         """
-        url = f"{self.base_url}/v1/instances"
-        results = request(
-            "GET",
-            url,
-            headers=self.headers,
-        )
-        return process_request(results)
+        if stream:
+            return self._stream("/v1/instances", parse=Instance if models else None)
+        return self._call("GET", "/v1/instances", parse=parse_instances if models else None)
 
-    def get_instance(self, instance_id: str) -> Dict[str, Dict[str, Any]]:
+    def get_instance(self, instance_id: str, models: bool = False) -> Union[Dict[str, Dict[str, Any]], Instance]:
         """
         get a specific instance by id
         :param instance_id: unique id of the instance
+        :param models: return an Instance model instead of the response dict
         :return:
         """
-        url = f"{self.base_url}/v1/instances/{instance_id}"
-        results = request(
-            "GET",
-            url,
-            headers=self.headers,
-        )
-        return process_request(results)
+        return self._call("GET", f"/v1/instances/{instance_id}", parse=parse_instance if models else None)
 
     def launch_instance(
         self,
@@ -93,23 +86,7 @@ class LambdaCloudInstance(Base):
         }
         if not name:
             instance_details.pop("name")
-        url = f"{self.base_url}/v1/instance-operations/launch"
-
-        rate_status_code = 429
-
-        while rate_status_code == 429:
-            results = request(
-                "POST",
-                url,
-                headers=self.headers,
-                json=instance_details,
-            )
-            rate_status_code = results.status_code
-            if rate_status_code == 429:
-                print("Too many requests. Waiting 60 seconds and trying again.")
-                time.sleep(60)
-
-        return process_request(results)
+        return self._call("POST", "/v1/instance-operations/launch", json=instance_details)
 
     def terminate_instance(self, instance_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
         """
@@ -117,16 +94,7 @@ class LambdaCloudInstance(Base):
         :param instance_ids: an array of instance ids to terminate
         :return: a list of the instances that were terminated
         """
-        url = f"{self.base_url}/v1/instance-operations/terminate"
-        results = request(
-            "POST",
-            url,
-            headers=self.headers,
-            json={
-                "instance_ids": instance_ids,
-            },
-        )
-        return process_request(results)
+        return self._call("POST", "/v1/instance-operations/terminate", json={"instance_ids": instance_ids})
 
     def restart_instance(self, instance_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
         """
@@ -134,13 +102,52 @@ class LambdaCloudInstance(Base):
         :param instance_ids: an array of instance ids to restart
         :return: an array detailing the instances that were restarted
         """
-        url = f"{self.base_url}/v1/instance-operations/restart"
-        results = request(
-            "POST",
-            url,
-            headers=self.headers,
-            json={
-                "instance_ids": instance_ids,
-            },
-        )
-        return process_request(results)
+        return self._call("POST", "/v1/instance-operations/restart", json={"instance_ids": instance_ids})
+
+    def wait_for_status(
+        self,
+        instance_ids: List[str],
+        status: str = "active",
+        timeout: float = 900,
+        interval: AdaptiveInterval = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        wait until every instance reaches a status, polling the whole batch with one listing call per cycle
+        :param instance_ids: ids of the instances to wait for
+        :param status: status to wait for, e.g. active or terminated
+        :param timeout: seconds to wait before raising TimeoutError
+        :param interval: poll interval policy. The default starts at 2 seconds and grows to 20 while nothing changes
+        :return: the latest record of each instance, keyed by id
+        """
+        waiter = StatusWaiter(instance_ids, status, timeout, interval)
+        while not waiter.update(self.get_all_instances()["data"]):
+            time.sleep(waiter.next_interval())
+        return waiter.reached
+
+
+class AsyncLambdaCloudInstance(AsyncBase, LambdaCloudInstance):
+    """
+    This class is used to interact with Lambda Cloud instances from asyncio. Every method is awaitable.
+    """
+
+    async def wait_for_status(
+        self,
+        instance_ids: List[str],
+        status: str = "active",
+        timeout: float = 900,
+        interval: AdaptiveInterval = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        wait until every instance reaches a status, polling the whole batch with one listing call per cycle
+        :param instance_ids: ids of the instances to wait for
+        :param status: status to wait for, e.g. active or terminated
+        :param timeout: seconds to wait before raising TimeoutError
+        :param interval: poll interval policy. The default starts at 2 seconds and grows to 20 while nothing changes
+        :return: the latest record of each instance, keyed by id
+        """
+        import asyncio
+
+        waiter = StatusWaiter(instance_ids, status, timeout, interval)
+        while not waiter.update((await self.get_all_instances())["data"]):
+            await asyncio.sleep(waiter.next_interval())
+        return waiter.reached
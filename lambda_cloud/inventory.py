@@ -0,0 +1,175 @@
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from lambda_cloud.instances import LambdaCloudInstance
+
+# how the value of each index is read from an instance record
+INDEX_KEYS = {
+    "name": lambda record: record.get("name"),
+    "region": lambda record: (record.get("region") or {}).get("name"),
+    "instance_type": lambda record: (record.get("instance_type") or {}).get("name"),
+    "status": lambda record: record.get("status"),
+}  # type: Dict[str, Callable[[Dict[str, Any]], Any]]
+
+
+class InventoryDiff:
+    """
+    What changed between two snapshots of the account's instances.
+    """
+
+    __slots__ = ("added", "removed", "changed")
+
+    def __init__(self):
+        self.added = []  # type: List[Dict[str, Any]]
+        self.removed = []  # type: List[Dict[str, Any]]
+        self.changed = []  # type: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"InventoryDiff(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})"
+
+
+class InstanceInventory:
+    """
+    An in-memory copy of the account's instances, indexed by id, name, region, instance type and status.
+    Each refresh costs one get_all_instances call and only touches the records that changed.
+    Records are shared with callers and must be treated as read-only.
+    """
+
+    def __init__(self, client: LambdaCloudInstance):
+        """
+        :param client: client used to list the instances
+        """
+        self.client = client
+        self._by_id = {}  # type: Dict[str, Dict[str, Any]]
+        self._indexes = {field: {} for field in INDEX_KEYS}  # type: Dict[str, Dict[Any, Set[str]]]
+        self._lock = threading.RLock()
+
+    def refresh(self) -> InventoryDiff:
+        """
+        fetch every instance and apply the difference to the inventory
+        :return: the records added, removed and changed since the last refresh
+        """
+        return self.apply(self.client.get_all_instances()["data"])
+
+    def apply(self, records: List[Dict[str, Any]]) -> InventoryDiff:
+        """
+        bring the inventory in line with a full listing of instances
+        :param records: instance records, as returned in the data of get_all_instances
+        :return: the records added, removed and changed
+        """
+        diff = InventoryDiff()
+        with self._lock:
+            seen = set()
+            for record in records:
+                instance_id = record["id"]
+                seen.add(instance_id)
+                old = self._by_id.get(instance_id)
+                if old is None:
+                    self._add(record)
+                    diff.added.append(record)
+                elif old != record:
+                    self._replace(old, record)
+                    diff.changed.append((old, record))
+            for instance_id in [instance_id for instance_id in self._by_id if instance_id not in seen]:
+                diff.removed.append(self._remove(instance_id))
+        return diff
+
+    def _add(self, record: Dict[str, Any]):
+        self._by_id[record["id"]] = record
+        for field, key in INDEX_KEYS.items():
+            self._indexes[field].setdefault(key(record), set()).add(record["id"])
+
+    def _replace(self, old: Dict[str, Any], new: Dict[str, Any]):
+        self._by_id[new["id"]] = new
+        for field, key in INDEX_KEYS.items():
+            old_value, new_value = key(old), key(new)
+            if old_value != new_value:
+                self._discard(field, old_value, old["id"])
+                self._indexes[field].setdefault(new_value, set()).add(new["id"])
+
+    def _remove(self, instance_id: str) -> Dict[str, Any]:
+        record = self._by_id.pop(instance_id)
+        for field, key in INDEX_KEYS.items():
+            self._discard(field, key(record), instance_id)
+        return record
+
+    def _discard(self, field: str, value: Any, instance_id: str):
+        ids = self._indexes[field].get(value)
+        if ids is not None:
+            ids.discard(instance_id)
+            if not ids:
+                del self._indexes[field][value]
+
+    def get(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        """
+        :param instance_id: unique id of the instance
+        :return: the instance record, or None when it is not in the inventory
+        """
+        return self._by_id.get(instance_id)
+
+    def find(self, **criteria) -> List[Dict[str, Any]]:
+        """
+        look up instances matching every criterion, e.g. find(region="us-tx-1", status="active")
+        :param criteria: values for any of name, region, instance_type and status
+        :return: matching instance records
+        """
+        unknown = set(criteria) - set(INDEX_KEYS)
+        if unknown:
+            raise ValueError(f"cannot look up instances by {', '.join(sorted(unknown))}")
+        with self._lock:
+            if not criteria:
+                return list(self._by_id.values())
+            id_sets = sorted(
+                (self._indexes[field].get(value, set()) for field, value in criteria.items()),
+                key=len,
+            )
+            ids = id_sets[0].intersection(*id_sets[1:])
+            return [self._by_id[instance_id] for instance_id in ids]
+
+    def by_name(self, name: str) -> List[Dict[str, Any]]:
+        """
+        :param name: name of the instance
+        :return: instance records with that name
+        """
+        return self.find(name=name)
+
+    def by_region(self, region_name: str) -> List[Dict[str, Any]]:
+        """
+        :param region_name: short name of a region
+        :return: instance records with that region
+        """
+        return self.find(region=region_name)
+
+    def by_instance_type(self, instance_type_name: str) -> List[Dict[str, Any]]:
+        """
+        :param instance_type_name: name of an instance type
+        :return: instance records with that instance type
+        """
+        return self.find(instance_type=instance_type_name)
+
+    def by_status(self, status: str) -> List[Dict[str, Any]]:
+        """
+        :param status: status of the instance, e.g. active
+        :return: instance records with that status
+        """
+        return self.find(status=status)
+
+    def counts(self, field: str) -> Dict[Any, int]:
+        """
+        :param field: one of name, region, instance_type and status
+        :return: number of instances per value of the field
+        """
+        with self._lock:
+            return {value: len(ids) for value, ids in self._indexes[field].items()}
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, instance_id):
+        return instance_id in self._by_id
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._by_id.values()))
@@ -0,0 +1,233 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# path prefixes whose last segment is an id
+_ID_PREFIXES = ("/v1/instances/", "/v1/ssh-keys/")
+
+
+def endpoint_template(path: str) -> str:
+    """
+    collapse ids in a path so calls can be grouped per endpoint
+    :param path: endpoint path, e.g. /v1/instances/0920582c7ff041399e34823a0be62549
+    :return: the path with ids replaced, e.g. /v1/instances/{id}
+    """
+    for prefix in _ID_PREFIXES:
+        if path.startswith(prefix) and len(path) > len(prefix):
+            return prefix + "{id}"
+    return path
+
+
+class RequestEvent:
+    """
+    What happened during one client call, including its retries.
+    """
+
+    __slots__ = (
+        "method",
+        "endpoint",
+        "status_code",
+        "duration",
+        "retries",
+        "throttled",
+        "bytes_sent",
+        "bytes_received",
+        "cache_hit",
+        "error",
+    )
+
+    def __init__(
+        self,
+        method: str,
+        endpoint: str,
+        status_code: Optional[int],
+        duration: float,
+        retries: int = 0,
+        throttled: int = 0,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        cache_hit: bool = False,
+        error: Optional[BaseException] = None,
+    ):
+        """
+        :param method: HTTP method
+        :param endpoint: endpoint template, e.g. /v1/instances/{id}
+        :param status_code: status of the last response, or None when served from cache
+        :param duration: seconds spent in the call, including rate limiting and retries
+        :param retries: requests sent after the first one
+        :param throttled: responses with status 429 received during the call
+        :param bytes_sent: size of the JSON body sent with each attempt
+        :param bytes_received: size of the last response body
+        :param cache_hit: whether the result came from the response cache
+        :param error: exception raised to the caller, if any
+        """
+        self.method = method
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.duration = duration
+        self.retries = retries
+        self.throttled = throttled
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.cache_hit = cache_hit
+        self.error = error
+
+    def __repr__(self):
+        return (
+            f"RequestEvent({self.method} {self.endpoint} status={self.status_code} "
+            f"duration={self.duration:.4f} retries={self.retries} cache_hit={self.cache_hit})"
+        )
+
+
+class RequestHooks:
+    """
+    Callbacks run after every client call. An empty registry is falsy, so clients skip all bookkeeping
+    when nothing is registered. A failing callback is logged and never breaks the call it observes.
+    """
+
+    def __init__(self, *callbacks: Callable[[RequestEvent], Any]):
+        self._callbacks = list(callbacks)  # type: List[Callable[[RequestEvent], Any]]
+
+    def add(self, callback: Callable[[RequestEvent], Any]) -> Callable[[RequestEvent], Any]:
+        """
+        :param callback: function receiving a RequestEvent
+        :return: the callback, so this can be used as a decorator
+        """
+        self._callbacks = self._callbacks + [callback]
+        return callback
+
+    def remove(self, callback: Callable[[RequestEvent], Any]):
+        self._callbacks = [registered for registered in self._callbacks if registered is not callback]
+
+    def emit(self, event: RequestEvent):
+        for callback in self._callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("request hook %r failed", callback)
+
+    def __bool__(self):
+        return bool(self._callbacks)
+
+    def __len__(self):
+        return len(self._callbacks)
+
+
+class MetricsCollector:
+    """
+    A request hook that aggregates counters and latency histograms per method and endpoint.
+    Export with snapshot() for a plain dict or to_prometheus() for the Prometheus text format.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, namespace: str = "lambda_cloud"):
+        """
+        :param buckets: upper bounds in seconds of the latency histogram buckets
+        :param namespace: prefix of the exported metric names
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self._requests = {}  # type: Dict[Tuple[str, str, str], int]
+        self._counters = {}  # type: Dict[Tuple[str, str, str], int]
+        self._histograms = {}  # type: Dict[Tuple[str, str], List[float]]
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent):
+        status = "cache" if event.cache_hit else ("error" if event.status_code is None else str(event.status_code))
+        series = (event.method, event.endpoint)
+        with self._lock:
+            key = series + (status,)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for name, value in (
+                ("retries", event.retries),
+                ("throttled", event.throttled),
+                ("bytes_sent", event.bytes_sent),
+                ("bytes_received", event.bytes_received),
+                ("cache_hits", int(event.cache_hit)),
+            ):
+                if value:
+                    counter = series + (name,)
+                    self._counters[counter] = self._counters.get(counter, 0) + value
+            if not event.cache_hit:
+                histogram = self._histograms.get(series)
+                if histogram is None:
+                    # per-bucket counts followed by the running sum and count
+                    histogram = self._histograms[series] = [0] * len(self.buckets) + [0.0, 0]
+                for index, bound in enumerate(self.buckets):
+                    if event.duration <= bound:
+                        histogram[index] += 1
+                        break
+                histogram[-2] += event.duration
+                histogram[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        :return: counters and cumulative histograms as nested plain data, keyed by "METHOD endpoint"
+        """
+        with self._lock:
+            requests = {}  # type: Dict[str, Dict[str, int]]
+            for (method, endpoint, status), count in self._requests.items():
+                requests.setdefault(f"{method} {endpoint}", {})[status] = count
+            counters = {}  # type: Dict[str, Dict[str, int]]
+            for (method, endpoint, name), value in self._counters.items():
+                counters.setdefault(f"{method} {endpoint}", {})[name] = value
+            latency = {}
+            for (method, endpoint), histogram in self._histograms.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets, histogram):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                buckets["+Inf"] = histogram[-1]
+                latency[f"{method} {endpoint}"] = {"buckets": buckets, "sum": histogram[-2], "count": histogram[-1]}
+        return {"requests": requests, "counters": counters, "latency_seconds": latency}
+
+    def to_prometheus(self) -> str:
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        prefix = self.namespace
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_requests_total Client calls by method, endpoint and final status.")
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for (method, endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_requests_total{{{_labels(method, endpoint)},status="{status}"}} {count}')
+
+            for name, help_text in (
+                ("retries", "Requests sent again after a retryable response."),
+                ("throttled", "Responses with status 429."),
+                ("bytes_sent", "Request body bytes sent."),
+                ("bytes_received", "Response body bytes received."),
+                ("cache_hits", "Calls served from the response cache."),
+            ):
+                lines.append(f"# HELP {prefix}_{name}_total {help_text}")
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                for (method, endpoint, counter), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{prefix}_{name}_total{{{_labels(method, endpoint)}}} {value}")
+
+            lines.append(f"# HELP {prefix}_request_duration_seconds Client call latency, including retries.")
+            lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+            for (method, endpoint), histogram in sorted(self._histograms.items()):
+                labels = _labels(method, endpoint)
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram):
+                    cumulative += count
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+                lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {histogram[-2]}")
+                lines.append(f"{prefix}_request_duration_seconds_count{{{labels}}} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _labels(method: str, endpoint: str) -> str:
+    return f'method="{method}",endpoint="{endpoint}"'
@@ -0,0 +1,356 @@
+import re
+import weakref
+from collections.abc import Sequence
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar, Union
+
+_GPU_COUNT = re.compile(r"_(\d+)x_")
+
+
+def gpus_per_instance(instance_type_name: str) -> int:
+    """
+    :param instance_type_name: name of an instance type, e.g. gpu_8x_a100
+    :return: number of GPUs in one instance of the type, or 0 when the name does not say
+    """
+    match = _GPU_COUNT.search(instance_type_name)
+    return int(match.group(1)) if match else 0
+
+
+class Model:
+    """
+    Base of the response models: slotted, immutable, and convertible back to the API's dict form.
+    """
+
+    __slots__ = ()
+    _fields = ()  # type: Tuple[str, ...]
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} objects are immutable")
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "Model":
+        """
+        :param raw: record as returned by the API
+        """
+        return cls(raw)
+
+    def _init(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: the record in the form the API returns it
+        """
+        return {name: _to_plain(getattr(self, name)) for name in self._fields}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._fields)
+
+    def __hash__(self):
+        return hash((type(self), getattr(self, self._fields[0])))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self._fields[:3])})"
+
+
+class Region(Model):
+    __slots__ = ("name", "description", "__weakref__")
+    _fields = ("name", "description")
+    _interned = weakref.WeakValueDictionary()  # type: weakref.WeakValueDictionary
+
+    def __init__(self, name: str, description: str = None):
+        self._init(name=name, description=description)
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "Region":
+        """
+        build a region, sharing one object per distinct region across all records
+        :param raw: region as returned by the API
+        """
+        key = (raw.get("name"), raw.get("description"))
+        region = cls._interned.get(key)
+        if region is None:
+            region = cls._interned[key] = cls(*key)
+        return region
+
+
+class InstanceType(Model):
+    __slots__ = (
+        "name",
+        "description",
+        "price_cents_per_hour",
+        "vcpus",
+        "memory_gib",
+        "storage_gib",
+        "_regions",
+        "__weakref__",
+    )
+    _fields = ("name", "description", "price_cents_per_hour", "vcpus", "memory_gib", "storage_gib")
+    _interned = weakref.WeakValueDictionary()  # type: weakref.WeakValueDictionary
+
+    def __init__(
+        self,
+        name: str,
+        description: str = None,
+        price_cents_per_hour: Union[int, str] = None,
+        vcpus: int = None,
+        memory_gib: int = None,
+        storage_gib: int = None,
+        regions_with_capacity_available: Union[Tuple[Region, ...], List[Dict[str, Any]]] = (),
+    ):
+        self._init(
+            name=name,
+            description=description,
+            price_cents_per_hour=price_cents_per_hour,
+            vcpus=vcpus,
+            memory_gib=memory_gib,
+            storage_gib=storage_gib,
+            _regions=regions_with_capacity_available,
+        )
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any], regions_with_capacity_available: List[Dict[str, Any]] = None):
+        """
+        :param raw: instance type as returned by the API
+        :param regions_with_capacity_available: availability from the instance type catalog, if any
+        """
+        specs = raw.get("specs") or {}
+        values = (
+            raw.get("name"),
+            raw.get("description"),
+            raw.get("price_cents_per_hour"),
+            specs.get("vcpus"),
+            specs.get("memory_gib"),
+            specs.get("storage_gib"),
+        )
+        if regions_with_capacity_available is not None:
+            return cls(*values, regions_with_capacity_available=regions_with_capacity_available)
+        # the instance type embedded in every instance record is shared by all instances of that type
+        instance_type = cls._interned.get(values)
+        if instance_type is None:
+            instance_type = cls._interned[values] = cls(*values)
+        return instance_type
+
+    @property
+    def regions_with_capacity_available(self) -> Tuple[Region, ...]:
+        regions = self._regions
+        if isinstance(regions, list):
+            regions = tuple(Region.from_dict(region) for region in regions)
+            object.__setattr__(self, "_regions", regions)
+        return regions
+
+    @property
+    def gpus(self) -> int:
+        return gpus_per_instance(self.name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "price_cents_per_hour": self.price_cents_per_hour,
+            "specs": {"vcpus": self.vcpus, "memory_gib": self.memory_gib, "storage_gib": self.storage_gib},
+        }
+
+
+class Instance(Model):
+    __slots__ = (
+        "id",
+        "name",
+        "ip",
+        "status",
+        "ssh_key_names",
+        "file_system_names",
+        "hostname",
+        "jupyter_token",
+        "jupyter_url",
+        "_region",
+        "_instance_type",
+    )
+    _fields = (
+        "id",
+        "name",
+        "ip",
+        "status",
+        "ssh_key_names",
+        "file_system_names",
+        "region",
+        "instance_type",
+        "hostname",
+        "jupyter_token",
+        "jupyter_url",
+    )
+
+    def __init__(self, raw: Dict[str, Any]):
+        """
+        :param raw: instance as returned by the API. Region and instance type are decoded on first access
+        """
+        self._init(
+            id=raw.get("id"),
+            name=raw.get("name"),
+            ip=raw.get("ip"),
+            status=raw.get("status"),
+            ssh_key_names=tuple(raw.get("ssh_key_names") or ()),
+            file_system_names=tuple(raw.get("file_system_names") or ()),
+            hostname=raw.get("hostname"),
+            jupyter_token=raw.get("jupyter_token"),
+            jupyter_url=raw.get("jupyter_url"),
+            _region=raw.get("region"),
+            _instance_type=raw.get("instance_type"),
+        )
+
+    @property
+    def region(self) -> Optional[Region]:
+        return _decode(self, "_region", Region.from_dict)
+
+    @property
+    def instance_type(self) -> Optional[InstanceType]:
+        return _decode(self, "_instance_type", InstanceType.from_dict)
+
+
+class SshKey(Model):
+    __slots__ = ("id", "name", "public_key", "private_key")
+    _fields = ("id", "name", "public_key", "private_key")
+
+    def __init__(self, raw: Dict[str, Any]):
+        """
+        :param raw: ssh key as returned by the API
+        """
+        self._init(
+            id=raw.get("id"),
+            name=raw.get("name"),
+            public_key=raw.get("public_key"),
+            private_key=raw.get("private_key"),
+        )
+
+
+class FileSystem(Model):
+    __slots__ = ("id", "name", "created", "mount_point", "is_in_use", "_created_by", "_region")
+    _fields = ("id", "name", "created", "created_by", "mount_point", "region", "is_in_use")
+
+    def __init__(self, raw: Dict[str, Any]):
+        """
+        :param raw: file system as returned by the API. Region and creator are decoded on first access
+        """
+        self._init(
+            id=raw.get("id"),
+            name=raw.get("name"),
+            created=raw.get("created"),
+            mount_point=raw.get("mount_point"),
+            is_in_use=raw.get("is_in_use"),
+            _created_by=raw.get("created_by"),
+            _region=raw.get("region"),
+        )
+
+    @property
+    def region(self) -> Optional[Region]:
+        return _decode(self, "_region", Region.from_dict)
+
+    @property
+    def created_by(self) -> Optional[MappingProxyType]:
+        return _decode(self, "_created_by", MappingProxyType)
+
+
+M = TypeVar("M", bound=Model)
+
+
+class ModelList(Sequence):
+    """
+    A read-only list of models for large listings. Records stay in their decoded JSON form until an item is
+    first accessed, and each item is converted at most once.
+    """
+
+    __slots__ = ("_items", "_model")
+
+    def __init__(self, records: List[Any], model: Type[M]):
+        """
+        :param records: records as returned in the data of a listing
+        :param model: model class to convert each record into
+        """
+        self._items = list(records)
+        self._model = model
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ModelList([self[position] for position in range(*index.indices(len(self)))], self._model)
+        item = self._items[index]
+        if isinstance(item, dict):
+            item = self._items[index] = self._model.from_dict(item)
+        return item
+
+    def __iter__(self) -> Iterator[M]:
+        for index in range(len(self._items)):
+            yield self[index]
+
+    def by_id(self) -> Dict[str, M]:
+        """
+        :return: every item keyed by id
+        """
+        return {item.id: item for item in self}
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """
+        :return: the records in the form the API returns them
+        """
+        return [item if isinstance(item, dict) else item.to_dict() for item in self._items]
+
+    def __eq__(self, other):
+        if isinstance(other, ModelList):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ModelList({self._model.__name__}, {len(self)} items)"
+
+
+def parse_instances(value: Dict[str, Any]) -> ModelList:
+    return ModelList(value["data"], Instance)
+
+
+def parse_instance(value: Dict[str, Any]) -> Instance:
+    return Instance(value["data"])
+
+
+def parse_instance_types(value: Dict[str, Any]) -> Dict[str, InstanceType]:
+    return {
+        name: InstanceType.from_dict(entry["instance_type"], entry.get("regions_with_capacity_available") or [])
+        for name, entry in value["data"].items()
+    }
+
+
+def parse_ssh_keys(value: Dict[str, Any]) -> ModelList:
+    return ModelList(value["data"], SshKey)
+
+
+def parse_ssh_key(value: Dict[str, Any]) -> SshKey:
+    return SshKey(value["data"])
+
+
+def parse_file_systems(value: Dict[str, Any]) -> ModelList:
+    return ModelList(value["data"], FileSystem)
+
+
+def _decode(model: Model, slot: str, decode: Callable[[Any], Any]) -> Any:
+    value = object.__getattribute__(model, slot)
+    if isinstance(value, dict):
+        value = decode(value)
+        object.__setattr__(model, slot, value)
+    return value
+
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    if isinstance(value, tuple):
+        return [_to_plain(item) for item in value]
+    return value
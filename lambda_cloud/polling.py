@@ -0,0 +1,112 @@
+import time
+from typing import Any, Dict, Iterable, List
+
+DEFAULT_MIN_INTERVAL = 2.0
+DEFAULT_MAX_INTERVAL = 20.0
+DEFAULT_BACKOFF_FACTOR = 1.5
+
+# statuses an instance never leaves once it has reached them
+FINAL_STATUSES = ("terminating", "terminated")
+
+
+class AdaptiveInterval:
+    """
+    A poll interval that starts short, grows while nothing changes and snaps back once something does.
+    """
+
+    def __init__(
+        self,
+        minimum: float = DEFAULT_MIN_INTERVAL,
+        maximum: float = DEFAULT_MAX_INTERVAL,
+        factor: float = DEFAULT_BACKOFF_FACTOR,
+    ):
+        """
+        :param minimum: seconds between polls right after a change
+        :param maximum: upper bound on the seconds between polls
+        :param factor: growth of the interval after each poll without changes
+        """
+        if minimum <= 0 or maximum < minimum or factor < 1:
+            raise ValueError("intervals must be positive, maximum >= minimum and factor >= 1")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.current = minimum
+
+    def next(self, changed: bool) -> float:
+        """
+        :param changed: whether the last poll saw a change
+        :return: seconds to wait before the next poll
+        """
+        if changed:
+            self.current = self.minimum
+        else:
+            self.current = min(self.maximum, self.current * self.factor)
+        return self.current
+
+
+class StatusWaiter:
+    """
+    Tracks a batch of instances until all of them reach a status. The caller feeds it one full listing per
+    poll and sleeps for the interval it returns, which keeps the sync and async waiters identical.
+    """
+
+    def __init__(
+        self,
+        instance_ids: Iterable[str],
+        status: str,
+        timeout: float,
+        interval: AdaptiveInterval = None,
+    ):
+        """
+        :param instance_ids: ids of the instances to wait for
+        :param status: status every instance must reach, e.g. active or terminated
+        :param timeout: seconds to wait before giving up
+        :param interval: poll interval policy. The default starts at 2 seconds and grows to 20. The waiter keeps its
+        own copy, so waits sharing a policy do not grow each other's interval
+        """
+        self.pending = set(instance_ids)
+        self.status = status
+        self.deadline = time.monotonic() + timeout
+        if interval is None:
+            self.interval = AdaptiveInterval()
+        else:
+            self.interval = AdaptiveInterval(interval.minimum, interval.maximum, interval.factor)
+        self.reached = {}  # type: Dict[str, Dict[str, Any]]
+        self._last_seen = {}  # type: Dict[str, Any]
+        self._changed = False
+
+    def update(self, records: List[Dict[str, Any]]) -> bool:
+        """
+        :param records: instance records, as returned in the data of get_all_instances
+        :return: True when every instance has reached the status
+        """
+        listed = {record["id"]: record for record in records}
+        self._changed = False
+        for instance_id in list(self.pending):
+            record = listed.get(instance_id)
+            current = record["status"] if record is not None else None
+            if current != self._last_seen.get(instance_id, current):
+                self._changed = True
+            self._last_seen[instance_id] = current
+
+            # terminated instances drop out of the listing, so absence counts as terminated
+            if current == self.status or (record is None and self.status == "terminated"):
+                self.pending.discard(instance_id)
+                if record is None:
+                    record = {"id": instance_id, "status": "terminated"}
+                self.reached[instance_id] = record
+            elif current in FINAL_STATUSES and self.status not in FINAL_STATUSES:
+                raise RuntimeError(f"instance {instance_id} is {current} and will never be {self.status}")
+        return not self.pending
+
+    def next_interval(self) -> float:
+        """
+        :return: seconds to sleep before the next poll
+        :raises TimeoutError: when the timeout has passed
+        """
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(
+                f"timed out waiting for {', '.join(sorted(self.pending))} to become {self.status}"
+            )
+        return min(self.interval.next(self._changed), remaining)
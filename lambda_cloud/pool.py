@@ -0,0 +1,315 @@
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from lambda_cloud.client import LambdaCloudClient
+
+# result keys of the instance operations, merged across accounts
+_OPERATION_KEYS = {"terminate": "terminated_instances", "restart": "restarted_instances"}
+
+
+class PoolError(Exception):
+    """
+    Raised when a write sent to several accounts failed in some of them. It carries what the other accounts
+    returned, so callers can tell what was done.
+    """
+
+    def __init__(self, operation: str, results: Any, failures: Dict[str, Exception]):
+        """
+        :param operation: the write, e.g. terminate or add ssh key
+        :param results: the return value of the write, from the accounts where it succeeded
+        :param failures: error per account where it failed
+        """
+        details = "; ".join(f"{account}: {error}" for account, error in failures.items())
+        super().__init__(f"{operation} failed in {len(failures)} account(s): {details}")
+        self.operation = operation
+        self.results = results
+        self.failures = failures
+
+
+class ClientPool:
+    """
+    Clients for several Lambda Cloud accounts, each with its own token, rate limiter and connection pool, so
+    traffic scales with the number of accounts instead of sharing one token's limit. Account-wide reads such as
+    the instance type catalog go to the accounts in turn. Listings are fetched from every account concurrently
+    and merged, and the pool remembers which account owns each instance and ssh key it has seen, so writes are
+    sent to the owner. Ids the pool has not seen yet are looked up with one round of listings.
+    """
+
+    def __init__(self, clients: Dict[str, LambdaCloudClient]):
+        """
+        :param clients: client per account name. Give each its own rate limiter; the defaults already are
+        """
+        if not clients:
+            raise ValueError("a client pool needs at least one account")
+        self.clients = dict(clients)
+        self._names = list(self.clients)
+        self._turn = itertools.count()
+        self._owners = {}  # type: Dict[str, str]
+        self._key_accounts = {}  # type: Dict[str, Set[str]]
+        self._key_names = {}  # type: Dict[str, str]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_tokens(cls, tokens: Union[Dict[str, str], List[str]], **options) -> "ClientPool":
+        """
+        :param tokens: token per account name, or a list of tokens named account-0, account-1, ...
+        :param options: passed to every LambdaCloudClient, e.g. timeout or cache. Each account builds its own
+        session and rate limiter, so neither may be given here
+        """
+        if "session" in options or "rate_limiter" in options:
+            raise ValueError("every account needs its own session and rate limiter")
+        if not isinstance(tokens, dict):
+            tokens = {f"account-{index}": token for index, token in enumerate(tokens)}
+        return cls({name: LambdaCloudClient(token, **options) for name, token in tokens.items()})
+
+    @property
+    def accounts(self) -> List[str]:
+        return list(self._names)
+
+    def reader(self) -> LambdaCloudClient:
+        """
+        :return: the next account's client in turn, for reads any account can answer
+        """
+        return self.clients[self._names[next(self._turn) % len(self._names)]]
+
+    def owner(self, resource_id: str) -> Optional[str]:
+        """
+        :param resource_id: id of an instance or ssh key
+        :return: name of the account owning it, or None when the pool has not seen it
+        """
+        with self._lock:
+            return self._owners.get(resource_id)
+
+    # reads
+
+    def get_instance_types(self, fresh: bool = False) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        :param fresh: ask the API even when a cached catalog is fresh
+        :return: the instance type catalog, read through the next account in turn
+        """
+        return self.reader().instances.get_instance_types(fresh=fresh)
+
+    def get_all_instances(self, by_account: bool = False) -> Dict[str, Any]:
+        """
+        :param by_account: key the records by account name instead of merging them
+        :return: {"data": [...]} with the instances of every account, or {account: [...]}
+        """
+        return self._gather(lambda client: client.instances.get_all_instances(), by_account, self._own_instances)
+
+    def get_ssh_keys(self, by_account: bool = False) -> Dict[str, Any]:
+        """
+        :param by_account: key the records by account name instead of merging them
+        :return: {"data": [...]} with the ssh keys of every account, or {account: [...]}
+        """
+        return self._gather(lambda client: client.ssh_keys.get_ssh_keys(), by_account, self._own_ssh_keys)
+
+    def get_file_systems(self, by_account: bool = False) -> Dict[str, Any]:
+        """
+        :param by_account: key the records by account name instead of merging them
+        :return: {"data": [...]} with the file systems of every account, or {account: [...]}
+        """
+        return self._gather(lambda client: client.file_systems.get_file_systems(), by_account)
+
+    def get_instance(self, instance_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        :param instance_id: unique id of the instance
+        :return: the instance, read through the account owning it
+        """
+        return self.clients[self._route([instance_id])[0][0]].instances.get_instance(instance_id)
+
+    def _gather(
+        self,
+        read: Callable[[LambdaCloudClient], Dict[str, Any]],
+        by_account: bool,
+        own: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        with ThreadPoolExecutor(max_workers=len(self._names)) as executor:
+            futures = {name: executor.submit(read, client) for name, client in self.clients.items()}
+            listings = {name: future.result()["data"] for name, future in futures.items()}
+        if own is not None:
+            for name, records in listings.items():
+                own(name, records)
+        if by_account:
+            return listings
+        return {"data": [record for records in listings.values() for record in records]}
+
+    def _own_instances(self, name: str, records: List[Dict[str, Any]]):
+        with self._lock:
+            for record in records:
+                self._owners[record["id"]] = name
+
+    def _own_ssh_keys(self, name: str, records: List[Dict[str, Any]]):
+        with self._lock:
+            for accounts in self._key_accounts.values():
+                accounts.discard(name)
+            for record in records:
+                self._owners[record["id"]] = name
+                self._key_names[record["id"]] = record["name"]
+                self._key_accounts.setdefault(record["name"], set()).add(name)
+
+    # writes
+
+    def launch_instance(
+        self,
+        region_name: str,
+        instance_type_name: str,
+        ssh_key_names: List[str],
+        file_system_names: Optional[List[str]] = None,
+        quantity: int = 1,
+        name: Optional[str] = None,
+        account: Optional[str] = None,
+    ) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        launch instances in one account
+        :param region_name: short name of a region
+        :param instance_type_name: name of an instance type
+        :param ssh_key_names: names of the SSH keys to allow access to the instances
+        :param file_system_names: names of the file systems to attach to the instances
+        :param quantity: number of instances to launch
+        :param name: user-provided name for the instances
+        :param account: account to launch in. By default, the accounts holding the ssh key take turns
+        :return: the ids of the launched instances, as returned by the account's API
+        """
+        if account is None:
+            account = self._account_with_key(ssh_key_names[0])
+        result = self.clients[account].instances.launch_instance(
+            region_name=region_name,
+            instance_type_name=instance_type_name,
+            ssh_key_names=ssh_key_names,
+            file_system_names=file_system_names or [],
+            quantity=quantity,
+            name=name,
+        )
+        with self._lock:
+            for instance_id in result["data"]["instance_ids"]:
+                self._owners[instance_id] = account
+        return result
+
+    def terminate_instance(self, instance_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """
+        terminate instances of any account, with one request per owning account sent concurrently
+        :param instance_ids: ids of the instances to terminate
+        :return: the terminated instances of every account
+        :raises PoolError: when some accounts failed, with the instances the others terminated
+        """
+        return self._operate("terminate", instance_ids)
+
+    def restart_instance(self, instance_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """
+        restart instances of any account, with one request per owning account sent concurrently
+        :param instance_ids: ids of the instances to restart
+        :return: the restarted instances of every account
+        :raises PoolError: when some accounts failed, with the instances the others restarted
+        """
+        return self._operate("restart", instance_ids)
+
+    def add_ssh_key(self, name: str, public_key: Optional[str] = None, account: Optional[str] = None):
+        """
+        :param name: name of the ssh key
+        :param public_key: public key to add. A key pair is generated when omitted
+        :param account: account to add the key to. Every account gets it when omitted
+        :return: the added key per account name
+        :raises PoolError: when some accounts failed, with the keys the others added
+        """
+        accounts = self._names if account is None else [account]
+        with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+            futures = {
+                target: executor.submit(self.clients[target].ssh_keys.add_ssh_key, name, public_key)
+                for target in accounts
+            }
+            results, failures = _settle(futures)
+        added = {target: result["data"] for target, result in results.items()}
+        with self._lock:
+            for target, record in added.items():
+                self._owners[record["id"]] = target
+                self._key_names[record["id"]] = name
+                self._key_accounts.setdefault(name, set()).add(target)
+        if failures:
+            raise PoolError(f"add ssh key {name}", added, failures)
+        return added
+
+    def delete_ssh_keys(self, ssh_key_id: str):
+        """
+        :param ssh_key_id: id of the ssh key, deleted from the account owning it
+        """
+        account = self._route([ssh_key_id], ssh_keys=True)[0][0]
+        result = self.clients[account].ssh_keys.delete_ssh_keys(ssh_key_id)
+        with self._lock:
+            self._owners.pop(ssh_key_id, None)
+            name = self._key_names.pop(ssh_key_id, None)
+            self._key_accounts.get(name, set()).discard(account)
+        return result
+
+    def _operate(self, operation: str, instance_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        groups = self._route(instance_ids)
+        key = _OPERATION_KEYS[operation]
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = {
+                account: executor.submit(getattr(self.clients[account].instances, f"{operation}_instance"), ids)
+                for account, ids in groups
+            }
+            results, failures = _settle(futures)
+        merged = {"data": {key: [record for result in results.values() for record in result["data"][key]]}}
+        if failures:
+            raise PoolError(operation, merged, failures)
+        return merged
+
+    def _route(self, resource_ids: List[str], ssh_keys: bool = False) -> List[Tuple[str, List[str]]]:
+        """
+        :return: (account name, ids) pairs grouping the ids by owner
+        """
+        with self._lock:
+            unknown = [resource_id for resource_id in resource_ids if resource_id not in self._owners]
+        if unknown:
+            if ssh_keys:
+                self.get_ssh_keys()
+            else:
+                self.get_all_instances()
+        groups = {}  # type: Dict[str, List[str]]
+        with self._lock:
+            for resource_id in resource_ids:
+                account = self._owners.get(resource_id)
+                if account is None:
+                    raise KeyError(f"no account in the pool owns {resource_id}")
+                groups.setdefault(account, []).append(resource_id)
+        return list(groups.items())
+
+    def _account_with_key(self, ssh_key_name: str) -> str:
+        with self._lock:
+            known = bool(self._key_accounts.get(ssh_key_name))
+        if not known:
+            self.get_ssh_keys()
+        with self._lock:
+            accounts = [name for name in self._names if name in self._key_accounts.get(ssh_key_name, ())]
+        if not accounts:
+            raise ValueError(f"no account in the pool has an ssh key named {ssh_key_name}")
+        return accounts[next(self._turn) % len(accounts)]
+
+    def close(self):
+        """
+        close the connection pool of every account
+        """
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _settle(futures: Dict[str, Future]) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    :return: the result of each account whose future succeeded, and the error of each one that failed
+    """
+    results = {}  # type: Dict[str, Any]
+    failures = {}  # type: Dict[str, Exception]
+    for account, future in futures.items():
+        try:
+            results[account] = future.result()
+        except Exception as error:
+            failures[account] = error
+    return results, failures
@@ -0,0 +1,217 @@
+import random
+import threading
+import time
+from contextlib import ExitStack
+from typing import Dict, Iterable, Optional, Tuple
+
+# The API documents a general limit of one request per second, and one launch request every 12 seconds.
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 1
+DEFAULT_PATH_LIMITS = {"/v1/instance-operations/launch": (1 / 12, 1)}
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Callers reserve a token and are told how long to wait for it,
+    so the waiting itself can be done with time.sleep or asyncio.sleep.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: tokens added per second
+        :param capacity: maximum number of tokens the bucket holds, i.e. the allowed burst
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        # callers hold the lock
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        take a token, going into debt if the bucket is empty
+        :return: seconds the caller must wait before using the token
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """
+        take a token only if one is available now
+        :return: whether a token was taken
+        """
+        return acquire_all((self,))
+
+    def wait_time(self) -> float:
+        """
+        :return: seconds until a token is available, 0 when one is now. Nothing is taken
+        """
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+
+def acquire_all(buckets: Iterable[TokenBucket]) -> bool:
+    """
+    take a token from every bucket only if each has one available now, so a refusal costs no bucket a token
+    :param buckets: buckets to take from, always in the same order to keep the locking deadlock free
+    :return: whether the tokens were taken
+    """
+    buckets = list(buckets)
+    with ExitStack() as locks:
+        for bucket in buckets:
+            locks.enter_context(bucket._lock)
+        for bucket in buckets:
+            bucket._refill()
+        if any(bucket._tokens < 1 for bucket in buckets):
+            return False
+        for bucket in buckets:
+            bucket._tokens -= 1
+        return True
+
+
+class RateLimiter:
+    """
+    A client-wide limiter: one general bucket plus optional stricter buckets for specific endpoints.
+    Share one instance between every client using the same token.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+        path_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        """
+        :param rate: requests per second allowed across all endpoints
+        :param burst: number of requests that may be sent back to back
+        :param path_limits: extra (rate, burst) limits keyed by endpoint path
+        """
+        self.bucket = TokenBucket(rate, burst)
+        if path_limits is None:
+            path_limits = DEFAULT_PATH_LIMITS
+        self.path_buckets = {path: TokenBucket(*limit) for path, limit in path_limits.items()}
+        self._held_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, path: str) -> float:
+        """
+        reserve a slot for a request to path
+        :param path: endpoint path, e.g. /v1/instances
+        :return: seconds the caller must wait before sending
+        """
+        wait = self.bucket.reserve()
+        path_bucket = self.path_buckets.get(path)
+        if path_bucket is not None:
+            wait = max(wait, path_bucket.reserve())
+        with self._lock:
+            held_for = self._held_until - time.monotonic()
+        return max(wait, held_for, 0.0)
+
+    def try_acquire(self, path: str) -> bool:
+        """
+        take a slot for an optional request to path only if one is free now, e.g. for a hedged read
+        :param path: endpoint path, e.g. /v1/instances
+        :return: whether the request may be sent
+        """
+        with self._lock:
+            if self._held_until > time.monotonic():
+                return False
+        path_bucket = self.path_buckets.get(path)
+        # the general bucket comes first, so every caller locks the buckets in the same order
+        return acquire_all((self.bucket, path_bucket) if path_bucket is not None else (self.bucket,))
+
+    def hold(self, seconds: float):
+        """
+        stop every caller from sending for the given time, e.g. after the API answered 429
+        :param seconds: how long to hold requests back
+        """
+        with self._lock:
+            self._held_until = max(self._held_until, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """
+    Decides whether a response is retried and how long to wait first. Retry-After is honoured when the
+    API sends it; otherwise the wait is exponential backoff with full jitter.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        deadline: float = 120.0,
+        retry_statuses: Tuple[int, ...] = (429,),
+        idempotent_retry_statuses: Tuple[int, ...] = (502, 503, 504),
+    ):
+        """
+        :param max_retries: retries allowed per call
+        :param backoff: base wait in seconds for the first retry
+        :param max_backoff: upper bound on a single backoff wait
+        :param deadline: seconds after the first attempt beyond which no retry is started
+        :param retry_statuses: statuses retried for every method
+        :param idempotent_retry_statuses: statuses retried for GET requests only
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.retry_statuses = retry_statuses
+        self.idempotent_retry_statuses = idempotent_retry_statuses
+
+    def next_delay(self, method: str, response, retries: int, elapsed: float) -> Optional[float]:
+        """
+        :param method: HTTP method of the request
+        :param response: response received
+        :param retries: retries already made for this call
+        :param elapsed: seconds since the first attempt
+        :return: seconds to wait before retrying, or None to give up and return the response
+        """
+        status_code = response.status_code
+        retryable = status_code in self.retry_statuses or (
+            method == "GET" and status_code in self.idempotent_retry_statuses
+        )
+        if not retryable or retries >= self.max_retries:
+            return None
+
+        delay = retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**retries))
+        if elapsed + delay > self.deadline:
+            return None
+        return delay
+
+
+def retry_after(response) -> Optional[float]:
+    """
+    read the Retry-After header of a response
+    :param response: response received from the API
+    :return: seconds to wait, or None when the header is missing or unreadable
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP dates are rare here, so the email package is only imported for them
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
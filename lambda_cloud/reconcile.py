@@ -0,0 +1,272 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from lambda_cloud.bulk import BulkOperations
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.polling import FINAL_STATUSES
+
+DEFAULT_MAX_WORKERS = 8
+
+# preference for which surplus instances go first: broken ones, then ones not yet usable
+TERMINATE_ORDER = {"unhealthy": 0, "booting": 1}
+
+GroupKey = Tuple[str, str]
+
+
+class DesiredState:
+    """
+    The fleet wanted: instance counts per (instance type, region) and the ssh keys that must exist.
+    """
+
+    def __init__(
+        self,
+        instances: Dict[GroupKey, int],
+        ssh_keys: Optional[Dict[str, Optional[str]]] = None,
+        name: Optional[str] = None,
+        launch_ssh_key: Optional[str] = None,
+        file_system_names: Optional[List[str]] = None,
+    ):
+        """
+        :param instances: number of instances wanted, keyed by (instance type name, region name)
+        :param ssh_keys: public key per ssh key name. None generates a key pair when the key is added
+        :param name: only instances with this name are managed, and launched instances get it. All instances of the
+        account are managed when omitted
+        :param launch_ssh_key: name of the ssh key given to launched instances. Defaults to the first of ssh_keys
+        :param file_system_names: names of the file systems to attach to launched instances
+        """
+        if any(count < 0 for count in instances.values()):
+            raise ValueError("instance counts must not be negative")
+        self.instances = dict(instances)
+        self.ssh_keys = dict(ssh_keys or {})
+        self.name = name
+        self.launch_ssh_key = launch_ssh_key or next(iter(self.ssh_keys), None)
+        self.file_system_names = file_system_names or []
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "DesiredState":
+        """
+        :param config: e.g. {"name": "training", "ssh_keys": {"macbook-pro": "ssh-ed25519 AAAA..."},
+        "instances": [{"instance_type": "gpu_1x_a10", "region": "us-tx-1", "count": 2}]}
+        """
+        instances = {}  # type: Dict[GroupKey, int]
+        for group in config.get("instances", ()):
+            key = (group["instance_type"], group["region"])
+            instances[key] = instances.get(key, 0) + group.get("count", 1)
+        return cls(
+            instances,
+            ssh_keys=config.get("ssh_keys"),
+            name=config.get("name"),
+            launch_ssh_key=config.get("launch_ssh_key"),
+            file_system_names=config.get("file_system_names"),
+        )
+
+
+class Launch(NamedTuple):
+    """
+    One launch request of a plan.
+    """
+
+    instance_type_name: str
+    region_name: str
+    quantity: int
+
+
+class Plan:
+    """
+    The fewest operations that bring the account to a desired state: ssh keys to add, one launch per
+    (instance type, region) and a single batch each of terminations and restarts.
+    """
+
+    def __init__(self, desired: DesiredState):
+        self.desired = desired
+        self.ssh_keys = []  # type: List[Tuple[str, Optional[str]]]
+        self.launches = []  # type: List[Launch]
+        self.terminate = []  # type: List[str]
+        self.restart = []  # type: List[str]
+
+    @property
+    def requests(self) -> int:
+        """
+        :return: number of API calls applying the plan takes when nothing fails
+        """
+        return len(self.ssh_keys) + len(self.launches) + bool(self.terminate) + bool(self.restart)
+
+    def __bool__(self):
+        return bool(self.requests)
+
+    def summary(self) -> List[str]:
+        """
+        :return: one line per operation, e.g. "+ launch 2 gpu_1x_a10 in us-tx-1"
+        """
+        lines = [f"+ ssh key {name}" for name, _ in self.ssh_keys]
+        lines.extend(f"+ launch {quantity} {type_name} in {region}" for type_name, region, quantity in self.launches)
+        lines.extend(f"~ restart {instance_id}" for instance_id in self.restart)
+        lines.extend(f"- terminate {instance_id}" for instance_id in self.terminate)
+        return lines
+
+    def __repr__(self):
+        return (
+            f"Plan(ssh_keys={len(self.ssh_keys)}, launches={self.launches}, terminate={len(self.terminate)}, "
+            f"restart={len(self.restart)})"
+        )
+
+
+class ApplyResult:
+    """
+    What applying a plan did. A dry run does nothing and only carries the plan.
+    """
+
+    def __init__(self, plan: Plan, dry_run: bool = False):
+        self.plan = plan
+        self.dry_run = dry_run
+        self.ssh_keys = {}  # type: Dict[str, Dict[str, Any]]
+        self.launched = {}  # type: Dict[GroupKey, List[str]]
+        self.terminated = {}  # type: Dict[str, Dict[str, Any]]
+        self.restarted = {}  # type: Dict[str, Dict[str, Any]]
+        self.errors = []  # type: List[Tuple[str, Exception]]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __repr__(self):
+        return (
+            f"ApplyResult(dry_run={self.dry_run}, ssh_keys={len(self.ssh_keys)}, "
+            f"launched={sum(map(len, self.launched.values()))}, terminated={len(self.terminated)}, "
+            f"restarted={len(self.restarted)}, errors={len(self.errors)})"
+        )
+
+
+class Reconciler:
+    """
+    Brings the account in line with a DesiredState. A plan is computed from one snapshot of the instance and
+    ssh key listings; applying it adds the missing ssh keys first, then sends the launches, the termination
+    batch and the restart batch concurrently. Unhealthy instances that are still wanted are restarted; surplus
+    instances are terminated, broken and booting ones first. Ssh keys missing from the desired state are left alone.
+    """
+
+    def __init__(self, client: LambdaCloudClient, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        :param client: client used to read the account and send the operations. Its rate limiter paces them
+        :param max_workers: maximum number of requests in flight while applying
+        """
+        self.client = client
+        self.max_workers = max_workers
+
+    def plan(self, desired: DesiredState) -> Plan:
+        """
+        :param desired: the fleet wanted
+        :return: the operations needed to reach it from the account's current state
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            instances = executor.submit(self.client.instances.get_all_instances)
+            ssh_keys = executor.submit(self.client.ssh_keys.get_ssh_keys)
+            return self.diff(desired, instances.result()["data"], ssh_keys.result()["data"])
+
+    @staticmethod
+    def diff(desired: DesiredState, instances: List[Dict[str, Any]], ssh_keys: List[Dict[str, Any]]) -> Plan:
+        """
+        :param desired: the fleet wanted
+        :param instances: instance records, as in the data of get_all_instances
+        :param ssh_keys: ssh key records, as in the data of get_ssh_keys
+        :return: the operations needed to reach the desired state from these listings
+        """
+        plan = Plan(desired)
+        existing_keys = {record["name"] for record in ssh_keys}
+        plan.ssh_keys = [(name, key) for name, key in desired.ssh_keys.items() if name not in existing_keys]
+
+        groups = {}  # type: Dict[GroupKey, List[Dict[str, Any]]]
+        for record in instances:
+            if desired.name is not None and record.get("name") != desired.name:
+                continue
+            if record.get("status") in FINAL_STATUSES:
+                continue
+            key = ((record.get("instance_type") or {}).get("name"), (record.get("region") or {}).get("name"))
+            groups.setdefault(key, []).append(record)
+
+        for key in sorted(set(groups) | set(desired.instances), key=lambda key: (str(key[0]), str(key[1]))):
+            records = sorted(groups.get(key, []), key=lambda record: TERMINATE_ORDER.get(record.get("status"), 2))
+            wanted = desired.instances.get(key, 0)
+            surplus = len(records) - wanted
+            if surplus > 0:
+                plan.terminate.extend(record["id"] for record in records[:surplus])
+                records = records[surplus:]
+            elif surplus < 0:
+                plan.launches.append(Launch(key[0], key[1], -surplus))
+            plan.restart.extend(record["id"] for record in records if record.get("status") == "unhealthy")
+
+        if plan.launches and not desired.launch_ssh_key:
+            raise ValueError("launching instances needs an ssh key: set ssh_keys or launch_ssh_key")
+        return plan
+
+    def apply(self, plan: Plan, dry_run: bool = False) -> ApplyResult:
+        """
+        :param plan: operations to send, as returned by plan
+        :param dry_run: send nothing and return the plan only
+        :return: the records of what was added, launched, terminated and restarted, and the errors
+        """
+        result = ApplyResult(plan, dry_run)
+        if dry_run or not plan:
+            return result
+        desired = plan.desired
+
+        key_error = None  # type: Optional[Exception]
+        for name, public_key in plan.ssh_keys:
+            try:
+                result.ssh_keys[name] = self.client.ssh_keys.add_ssh_key(name, public_key)["data"]
+            except Exception as error:
+                result.errors.append((f"add ssh key {name}", error))
+                if name == desired.launch_ssh_key:
+                    key_error = error
+        launches = plan.launches
+        if key_error is not None:
+            # launches would only fail the same way, but terminations and restarts do not need the key
+            for launch in launches:
+                result.errors.append((_launch_label(launch), key_error))
+            launches = []
+
+        bulk = BulkOperations(self.client.instances, batch_size=max(1, len(plan.terminate), len(plan.restart)))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            launches = {
+                executor.submit(
+                    self.client.instances.launch_instance,
+                    region_name=launch.region_name,
+                    instance_type_name=launch.instance_type_name,
+                    ssh_key_names=[desired.launch_ssh_key],
+                    file_system_names=desired.file_system_names,
+                    quantity=launch.quantity,
+                    name=desired.name,
+                ): launch
+                for launch in launches
+            }
+            terminated = executor.submit(bulk.terminate, plan.terminate) if plan.terminate else None
+            restarted = executor.submit(bulk.restart, plan.restart) if plan.restart else None
+
+            for future, launch in launches.items():
+                key = (launch.instance_type_name, launch.region_name)
+                try:
+                    result.launched[key] = future.result()["data"]["instance_ids"]
+                except Exception as error:
+                    result.errors.append((_launch_label(launch), error))
+            for future, records in ((terminated, result.terminated), (restarted, result.restarted)):
+                if future is None:
+                    continue
+                outcome = future.result()
+                records.update(outcome.succeeded)
+                result.errors.extend(
+                    (f"{outcome.operation} {instance_id}", error) for instance_id, error in outcome.failed.items()
+                )
+        return result
+
+    def reconcile(self, desired: DesiredState, dry_run: bool = False) -> ApplyResult:
+        """
+        plan and apply in one go
+        :param desired: the fleet wanted
+        :param dry_run: compute the plan without sending anything
+        :return: the result of applying, carrying the plan
+        """
+        return self.apply(self.plan(desired), dry_run)
+
+
+def _launch_label(launch: Launch) -> str:
+    return f"launch {launch.quantity} {launch.instance_type_name} in {launch.region_name}"
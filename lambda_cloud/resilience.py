@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+from lambda_cloud.metrics import endpoint_template
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_SAMPLES = 200
+# latencies an endpoint needs before its percentile is trusted; until then nothing is hedged
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_MIN_HEDGE_DELAY = 0.05
+# largest share of reads that may send a duplicate, so a slow API is not answered with twice the load
+DEFAULT_HEDGE_BUDGET = 0.1
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_LAST_GOOD_SIZE = 256
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of sending a request while a CircuitBreaker is open and has no earlier answer to serve.
+    """
+
+    def __init__(self, retry_in: float):
+        """
+        :param retry_in: seconds until the breaker lets a trial request through
+        """
+        super().__init__(f"the Lambda Cloud API is failing; requests are held back for {retry_in:.1f} more seconds")
+        self.retry_in = retry_in
+
+
+class HedgePolicy:
+    """
+    Decides when a read is sent a second time. Latencies are sampled per endpoint, and a GET still unanswered
+    after the chosen percentile of its endpoint's recent latencies gets a duplicate; whichever answer comes back
+    first is used. Hedges are capped at a share of the reads, and skipped when the rate limiter has no token free.
+    """
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        min_delay: float = DEFAULT_MIN_HEDGE_DELAY,
+        samples: int = DEFAULT_HEDGE_SAMPLES,
+        min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+        budget: float = DEFAULT_HEDGE_BUDGET,
+    ):
+        """
+        :param percentile: share of reads expected to finish before a duplicate is sent
+        :param min_delay: seconds to wait at least before sending a duplicate
+        :param samples: recent latencies kept per endpoint
+        :param min_samples: latencies an endpoint needs before its reads are hedged
+        :param budget: largest share of reads that may be hedged
+        """
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be in (0, 1)")
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.samples = samples
+        self.min_samples = min_samples
+        self.budget = budget
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = {}  # type: Dict[str, Deque[float]]
+        self._delays = {}  # type: Dict[str, float]
+        self._lock = threading.Lock()
+
+    def delay(self, path: str) -> Optional[float]:
+        """
+        count a read and tell how long it may run before a duplicate is sent
+        :param path: endpoint path of the read
+        :return: seconds to wait for the first answer, or None when the endpoint has too few samples yet
+        """
+        endpoint = endpoint_template(path)
+        with self._lock:
+            self.requests += 1
+            delay = self._delays.get(endpoint)
+            if delay is None:
+                latencies = self._latencies.get(endpoint)
+                if latencies is None or len(latencies) < self.min_samples:
+                    return None
+                ordered = sorted(latencies)
+                delay = max(self.min_delay, ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))])
+                self._delays[endpoint] = delay
+            return delay
+
+    def record(self, path: str, seconds: float):
+        """
+        :param path: endpoint path of an answered read
+        :param seconds: time the answer took
+        """
+        endpoint = endpoint_template(path)
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = deque(maxlen=self.samples)
+            latencies.append(seconds)
+            # the percentile is sorted again after a tenth of the window has been replaced
+            if len(latencies) % max(1, self.samples // 10) == 0:
+                self._delays.pop(endpoint, None)
+
+    def take(self) -> bool:
+        """
+        claim a hedge from the budget
+        :return: whether a duplicate may be sent
+        """
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def won(self):
+        """
+        count a hedge that answered before the original request
+        """
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: reads seen, duplicates sent and won, and the current hedge delay per endpoint in seconds
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "delays": dict(self._delays),
+            }
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests while the API keeps failing. After failure_threshold consecutive failures (connection
+    errors, timeouts and 5xx answers) the breaker opens and calls fail fast with CircuitOpenError, or get the last
+    good answer to the same GET when there is one. After reset_timeout one trial request is let through: a success
+    closes the breaker, a failure opens it again. A trial that ends without an answer, e.g. because its caller was
+    cancelled, is released, and one left unreleased expires after reset_timeout. Share one breaker between the
+    clients of one API.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        serve_stale: bool = True,
+        max_entries: int = DEFAULT_LAST_GOOD_SIZE,
+    ):
+        """
+        :param failure_threshold: consecutive failures that open the breaker
+        :param reset_timeout: seconds the breaker stays open before a trial request
+        :param serve_stale: answer reads from the last good response while open, instead of raising
+        :param max_entries: last good responses kept, least recently used evicted first
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.serve_stale = serve_stale
+        self.max_entries = max_entries
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self.served_stale = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        # number of the half-open trial in flight, 0 when there is none
+        self._trial = 0
+        self._trials = 0
+        self._trial_at = 0.0
+        self._last_good = OrderedDict()  # type: OrderedDict[Hashable, Any]
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        :return: closed, open or half-open
+        """
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    @property
+    def retry_in(self) -> float:
+        """
+        :return: seconds until a trial request is let through, 0 when requests are sent
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        :return: whether a request may be sent now. In half-open state only the first caller is let through
+        """
+        return self.admit() is not None
+
+    def admit(self) -> Optional[int]:
+        """
+        like allow, telling the caller whether it holds the half-open trial
+        :return: None when the request may not be sent now, the number of the trial when it is the half-open trial,
+        else 0
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return 0
+            now = time.monotonic()
+            trial_free = not self._trial or now - self._trial_at >= self.reset_timeout
+            if now - self._opened_at >= self.reset_timeout and trial_free:
+                self._state = HALF_OPEN
+                self._trials += 1
+                self._trial = self._trials
+                self._trial_at = now
+                return self._trial
+            self.rejected += 1
+            return None
+
+    def release(self, trial: int):
+        """
+        let another trial request through after one that ended without a success or failure to record
+        :param trial: number of the trial, as returned by admit. A trial that has since expired or been replaced
+        releases nothing
+        """
+        with self._lock:
+            if self._trial == trial:
+                self._trial = 0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._trial = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial = 0
+                self.opened += 1
+
+    def remember(self, key: Hashable, value: Any):
+        """
+        keep a good answer to serve while the breaker is open
+        :param key: identifies the read, e.g. token and path
+        :param value: the processed result
+        """
+        if not self.serve_stale:
+            return
+        with self._lock:
+            self._last_good[key] = value
+            self._last_good.move_to_end(key)
+            if len(self._last_good) > self.max_entries:
+                self._last_good.popitem(last=False)
+
+    def last_good(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        :param key: identifies the read, as given to remember
+        :return: (found, value) for the last good answer to the read
+        """
+        with self._lock:
+            if not self.serve_stale or key not in self._last_good:
+                return False, None
+            self.served_stale += 1
+            self._last_good.move_to_end(key)
+            return True, self._last_good[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: state, consecutive failures, times opened, requests held back and reads served stale
+        """
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "served_stale": self.served_stale,
+            }
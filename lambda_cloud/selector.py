@@ -0,0 +1,184 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from lambda_cloud.instances import LambdaCloudInstance
+from lambda_cloud.models import gpus_per_instance
+
+
+class Candidate(NamedTuple):
+    """
+    An instance type with capacity in a region, as ranked by a selector.
+    """
+
+    instance_type_name: str
+    region_name: str
+    price_cents_per_hour: int
+    gpus: int
+    vcpus: int
+    memory_gib: int
+    storage_gib: int
+
+    @property
+    def launch_kwargs(self) -> Dict[str, str]:
+        """
+        :return: region_name and instance_type_name, to pass to launch_instance with the ssh keys
+        """
+        return {"region_name": self.region_name, "instance_type_name": self.instance_type_name}
+
+
+class CatalogIndex:
+    """
+    The instance type catalog compiled into parallel columns, one entry per type, sorted by price. Availability
+    is kept as a bit mask of regions per type, so a query is a scan over a few integers per type.
+    """
+
+    def __init__(self, catalog: Dict[str, Dict[str, Any]]):
+        """
+        :param catalog: the data of a get_instance_types response
+        """
+        self.catalog = catalog
+        self.regions = []  # type: List[str]
+        self._region_bits = {}  # type: Dict[str, int]
+        rows = []
+        for name, entry in catalog.items():
+            instance_type = entry.get("instance_type") or {}
+            specs = instance_type.get("specs") or {}
+            mask = 0
+            for region in entry.get("regions_with_capacity_available") or ():
+                mask |= self._region_bit(region["name"])
+            rows.append(
+                (
+                    int(instance_type.get("price_cents_per_hour") or 0),
+                    name,
+                    gpus_per_instance(name),
+                    specs.get("vcpus") or 0,
+                    specs.get("memory_gib") or 0,
+                    specs.get("storage_gib") or 0,
+                    f"{name} {instance_type.get('description') or ''}".lower(),
+                    mask,
+                )
+            )
+        rows.sort(key=lambda row: (row[0], row[1]))
+        columns = list(zip(*rows)) or [()] * 8
+        self.prices, self.names, self.gpus, self.vcpus, self.memory_gib, self.storage_gib = columns[:6]
+        self._descriptions, self._availability = columns[6], columns[7]
+        # positions ordered by price per GPU, for types that have GPUs
+        with_gpus = [index for index, gpus in enumerate(self.gpus) if gpus]
+        self._per_gpu_order = sorted(with_gpus, key=lambda index: self.prices[index] / self.gpus[index])
+
+    def _region_bit(self, region_name: str) -> int:
+        bit = self._region_bits.get(region_name)
+        if bit is None:
+            bit = self._region_bits[region_name] = 1 << len(self.regions)
+            self.regions.append(region_name)
+        return bit
+
+    def select(
+        self,
+        min_gpus: int = 0,
+        min_memory_gib: int = 0,
+        min_vcpus: int = 0,
+        min_storage_gib: int = 0,
+        regions: Optional[Sequence[str]] = None,
+        gpu: Optional[str] = None,
+        max_price_cents: Optional[int] = None,
+        per_gpu: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Candidate]:
+        """
+        rank the instance types that fit a query and have capacity, cheapest first
+        :param min_gpus: minimum number of GPUs per instance
+        :param min_memory_gib: minimum memory per instance
+        :param min_vcpus: minimum number of vCPUs per instance
+        :param min_storage_gib: minimum storage per instance
+        :param regions: acceptable region names, most preferred first. Any region when omitted
+        :param gpu: text the type name or description must contain, e.g. A100
+        :param max_price_cents: highest acceptable price per hour, in cents
+        :param per_gpu: rank by price per GPU instead of price per instance
+        :param limit: maximum number of candidates returned
+        :return: one candidate per (instance type, region), ranked by price then by region preference
+        """
+        if regions is None:
+            wanted, mask = self.regions, (1 << len(self.regions)) - 1
+        else:
+            wanted, mask = regions, 0
+            for region_name in regions:
+                mask |= self._region_bits.get(region_name, 0)
+        needle = gpu.lower() if gpu else None
+        order = self._per_gpu_order if per_gpu else range(len(self.names))
+
+        candidates = []  # type: List[Candidate]
+        for index in order:
+            price = self.prices[index]
+            if max_price_cents is not None and price > max_price_cents:
+                if per_gpu:
+                    continue
+                break
+            available = self._availability[index] & mask
+            if (
+                not available
+                or self.gpus[index] < min_gpus
+                or self.memory_gib[index] < min_memory_gib
+                or self.vcpus[index] < min_vcpus
+                or self.storage_gib[index] < min_storage_gib
+                or (needle is not None and needle not in self._descriptions[index])
+            ):
+                continue
+            for region_name in wanted:
+                if available & self._region_bits.get(region_name, 0):
+                    candidates.append(
+                        Candidate(
+                            self.names[index],
+                            region_name,
+                            price,
+                            self.gpus[index],
+                            self.vcpus[index],
+                            self.memory_gib[index],
+                            self.storage_gib[index],
+                        )
+                    )
+                    if limit is not None and len(candidates) >= limit:
+                        return candidates
+        return candidates
+
+    def __len__(self):
+        return len(self.names)
+
+
+class InstanceSelector:
+    """
+    Picks instance types from the live catalog. The catalog is read through the client on every query and only
+    compiled again when the client returns a different catalog, so with a response cache on the client, queries
+    between refreshes run against the compiled index without a request.
+    """
+
+    def __init__(self, client: LambdaCloudInstance):
+        """
+        :param client: client used to read the catalog. Give it a ResponseCache to answer queries from memory
+        """
+        self.client = client
+        self._index = None  # type: Optional[CatalogIndex]
+
+    def index(self) -> CatalogIndex:
+        """
+        :return: the compiled index of the current catalog
+        """
+        catalog = self.client.get_instance_types()["data"]
+        index = self._index
+        if index is None or index.catalog is not catalog:
+            index = self._index = CatalogIndex(catalog)
+        return index
+
+    def select(self, **query) -> List[Candidate]:
+        """
+        :param query: filters and ranking, as for CatalogIndex.select
+        :return: ranked candidates with capacity now
+        """
+        return self.index().select(**query)
+
+    def cheapest(self, **query) -> Optional[Candidate]:
+        """
+        :param query: filters and ranking, as for CatalogIndex.select
+        :return: the cheapest candidate with capacity now, or None when nothing fits
+        """
+        candidates = self.index().select(limit=1, **query)
+        return candidates[0] if candidates else None
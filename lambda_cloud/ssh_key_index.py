@@ -0,0 +1,250 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from requests import HTTPError
+
+from lambda_cloud.bulk import BulkResult
+from lambda_cloud.ssh_keys import LambdaCloudSshKey
+
+# seconds the index is trusted before a lookup lists the keys again, as for the ssh key listing in ResponseCache
+DEFAULT_MAX_AGE = 300.0
+DEFAULT_MAX_WORKERS = 8
+
+
+def fingerprint(public_key: str) -> str:
+    """
+    compute the SHA256 fingerprint of a public key, as shown by ssh-keygen -l
+    :param public_key: OpenSSH public key line, e.g. ssh-ed25519 AAAA... user@host
+    :return: the fingerprint, e.g. SHA256:mVPwvezndPv/ARoIadVY98vAC0g+P/5633yTC4d/wXE
+    """
+    import base64
+    import binascii
+    import hashlib
+
+    parts = public_key.split()
+    if len(parts) < 2:
+        raise ValueError("a public key has a key type and base64 data")
+    try:
+        blob = base64.b64decode(parts[1], validate=True)
+    except binascii.Error as error:
+        raise ValueError("the public key data is not valid base64") from error
+    return "SHA256:" + base64.b64encode(hashlib.sha256(blob).digest()).decode("ascii").rstrip("=")
+
+
+class SshKeyIndex:
+    """
+    A local index of the account's ssh keys by id, name and SHA256 fingerprint, so provisioning code can check
+    for and resolve keys without listing them on every job. A refresh costs one listing call and only
+    fingerprints keys that are new or changed. Writes made through the index update it in place; lookups list the
+    keys again once the index is older than max_age, or after invalidate(). Private keys are never kept.
+    """
+
+    def __init__(
+        self,
+        client: LambdaCloudSshKey,
+        max_age: float = DEFAULT_MAX_AGE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        """
+        :param client: client used to list, add and delete the keys
+        :param max_age: seconds after a refresh before lookups refresh again. Keys added or deleted by other
+        processes show up within this time
+        :param max_workers: maximum number of delete requests in flight
+        """
+        self.client = client
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.refreshes = 0
+        self._by_id = {}  # type: Dict[str, Dict[str, Any]]
+        self._by_name = {}  # type: Dict[str, str]
+        self._by_fingerprint = {}  # type: Dict[str, List[str]]
+        self._fingerprints = {}  # type: Dict[str, Tuple[Optional[str], Optional[str]]]
+        self._refreshed_at = None  # type: Optional[float]
+        self._lock = threading.RLock()
+
+    @property
+    def fresh(self) -> bool:
+        refreshed_at = self._refreshed_at
+        return refreshed_at is not None and time.monotonic() - refreshed_at < self.max_age
+
+    def invalidate(self):
+        """
+        make the next lookup list the keys again, e.g. after changing them through another client
+        """
+        self._refreshed_at = None
+
+    def refresh(self) -> bool:
+        """
+        list the keys and apply the difference to the index
+        :return: whether any key was added, removed or changed
+        """
+        records = self.client.get_ssh_keys()["data"]
+        with self._lock:
+            changed = False
+            seen = set()
+            for record in records:
+                seen.add(record["id"])
+                if self._by_id.get(record["id"]) != record:
+                    # the fingerprint is kept, so a key changed in name only is not hashed again
+                    self._remove(record["id"], forget=False)
+                    self._add(record)
+                    changed = True
+            for ssh_key_id in [ssh_key_id for ssh_key_id in self._by_id if ssh_key_id not in seen]:
+                self._remove(ssh_key_id)
+                changed = True
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+        return changed
+
+    def _add(self, record: Dict[str, Any]):
+        record = {field: value for field, value in record.items() if field != "private_key"}
+        ssh_key_id = record["id"]
+        self._by_id[ssh_key_id] = record
+        self._by_name[record["name"]] = ssh_key_id
+        public_key = record.get("public_key")
+        cached = self._fingerprints.get(ssh_key_id)
+        if cached is not None and cached[0] == public_key:
+            key_fingerprint = cached[1]
+        else:
+            try:
+                key_fingerprint = fingerprint(public_key) if public_key else None
+            except ValueError:
+                key_fingerprint = None
+            self._fingerprints[ssh_key_id] = (public_key, key_fingerprint)
+        if key_fingerprint is not None:
+            self._by_fingerprint.setdefault(key_fingerprint, []).append(ssh_key_id)
+
+    def _remove(self, ssh_key_id: str, forget: bool = True):
+        record = self._by_id.pop(ssh_key_id, None)
+        if record is None:
+            return
+        if self._by_name.get(record["name"]) == ssh_key_id:
+            del self._by_name[record["name"]]
+        if forget:
+            key_fingerprint = self._fingerprints.pop(ssh_key_id, (None, None))[1]
+        else:
+            key_fingerprint = self._fingerprints.get(ssh_key_id, (None, None))[1]
+        ids = self._by_fingerprint.get(key_fingerprint)
+        if ids is not None:
+            ids.remove(ssh_key_id)
+            if not ids:
+                del self._by_fingerprint[key_fingerprint]
+
+    def _ensure_fresh(self):
+        if not self.fresh:
+            self.refresh()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        :param name: name of the ssh key
+        :return: the key record, or None when the account has no key by that name
+        """
+        self._ensure_fresh()
+        with self._lock:
+            ssh_key_id = self._by_name.get(name)
+            return self._by_id[ssh_key_id] if ssh_key_id is not None else None
+
+    def find(self, key_fingerprint: str) -> List[Dict[str, Any]]:
+        """
+        :param key_fingerprint: SHA256 fingerprint, e.g. SHA256:mVPw..., or a public key to fingerprint
+        :return: the key records holding that public key, under any name
+        """
+        if not key_fingerprint.startswith("SHA256:"):
+            key_fingerprint = fingerprint(key_fingerprint)
+        self._ensure_fresh()
+        with self._lock:
+            return [self._by_id[ssh_key_id] for ssh_key_id in self._by_fingerprint.get(key_fingerprint, ())]
+
+    def ensure_ssh_key(self, name: str, public_key: Optional[str] = None, replace: bool = False) -> Dict[str, Any]:
+        """
+        make sure the account has an ssh key by this name, adding it only when missing. With a fresh index, a key
+        that already exists is resolved without any request
+        :param name: name of the ssh key
+        :param public_key: public key the key must hold. A key pair is generated when omitted and the key is missing
+        :param replace: delete and add again a key by this name holding another public key, instead of raising
+        :return: the key record. A generated key pair's record carries the private key, only this once
+        """
+        key_fingerprint = fingerprint(public_key) if public_key else None
+        existing = self.get(name)
+        if existing is None:
+            try:
+                return self._add_key(name, public_key)
+            except HTTPError:
+                # added elsewhere since the last refresh: look again before giving up
+                self.refresh()
+                existing = self.get(name)
+                if existing is None:
+                    raise
+        if key_fingerprint is None or self._fingerprint_of(existing["id"]) == key_fingerprint:
+            return existing
+        if not replace:
+            raise ValueError(f"the ssh key {name} holds another public key; pass replace=True to swap it")
+        self.client.delete_ssh_keys(existing["id"])
+        with self._lock:
+            self._remove(existing["id"])
+        return self._add_key(name, public_key)
+
+    def _add_key(self, name: str, public_key: Optional[str]) -> Dict[str, Any]:
+        record = self.client.add_ssh_key(name, public_key)["data"]
+        with self._lock:
+            self._add(record)
+        return record
+
+    def _fingerprint_of(self, ssh_key_id: str) -> Optional[str]:
+        with self._lock:
+            return self._fingerprints.get(ssh_key_id, (None, None))[1]
+
+    def delete(
+        self, names: Iterable[str] = (), fingerprints: Iterable[str] = (), ids: Iterable[str] = ()
+    ) -> BulkResult:
+        """
+        delete keys by name, fingerprint or id, sending the requests concurrently
+        :param names: names of the keys to delete
+        :param fingerprints: SHA256 fingerprints of the keys to delete, under every name holding them
+        :param ids: ids of the keys to delete
+        :return: the deleted records keyed by id, and the errors keyed by id, or by the name or fingerprint that
+        matched no key
+        """
+        self._ensure_fresh()
+        result = BulkResult("delete")
+        targets = {}  # type: Dict[str, Dict[str, Any]]
+        with self._lock:
+            for name in names:
+                ssh_key_id = self._by_name.get(name)
+                if ssh_key_id is None:
+                    result.failed[name] = KeyError(f"no ssh key named {name}")
+                else:
+                    targets[ssh_key_id] = self._by_id[ssh_key_id]
+            for key_fingerprint in fingerprints:
+                matched = self._by_fingerprint.get(key_fingerprint, ())
+                if not matched:
+                    result.failed[key_fingerprint] = KeyError(f"no ssh key with fingerprint {key_fingerprint}")
+                for ssh_key_id in matched:
+                    targets[ssh_key_id] = self._by_id[ssh_key_id]
+            for ssh_key_id in ids:
+                targets[ssh_key_id] = self._by_id.get(ssh_key_id) or {"id": ssh_key_id}
+        if not targets:
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets))) as executor:
+            futures = {ssh_key_id: executor.submit(self.client.delete_ssh_keys, ssh_key_id) for ssh_key_id in targets}
+            for ssh_key_id, future in futures.items():
+                result.requests += 1
+                try:
+                    future.result()
+                except Exception as error:
+                    result.failed[ssh_key_id] = error
+                else:
+                    result.succeeded[ssh_key_id] = targets[ssh_key_id]
+        with self._lock:
+            for ssh_key_id in result.succeeded:
+                self._remove(ssh_key_id)
+        return result
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, name: str):
+        return self.get(name) is not None
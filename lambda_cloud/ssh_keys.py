@@ -1,8 +1,6 @@
-from lambda_cloud.base import Base
-from typing import List, Dict, Optional
-from utilities import process_request
-
-from requests import request
+from lambda_cloud.base import AsyncBase, Base
+from lambda_cloud.models import ModelList, SshKey, parse_ssh_key, parse_ssh_keys
+from typing import List, Dict, Optional, Union
 
 
 class LambdaCloudSshKey(Base):
@@ -10,16 +8,18 @@ class LambdaCloudSshKey(Base):
     This class is used to interact with Lambda Cloud ssh keys.
     """
 
-    def add_ssh_key(self, name: str, public_key: str = None) -> Dict[str, Dict[str, str]]:
+    def add_ssh_key(
+        self, name: str, public_key: str = None, models: bool = False
+    ) -> Union[Dict[str, Dict[str, str]], SshKey]:
         """
         add an ssh key.
         To use an existing key pair, input the public_key.
         To generate a new key pair, omit the public_key. Save the private_key from the response somewhere secure
         :param name: name of the ssh key
         :param public_key: Public key for the SSH key
+        :param models: return an SshKey model instead of the response dict
         :return: details of the ssh key
         """
-        url = f"{self.base_url}/v1/ssh-keys"
         payload = {
             "name": name,
             "public_key": public_key,
@@ -28,13 +28,7 @@ class LambdaCloudSshKey(Base):
         if not public_key:
             payload.pop("public_key")
 
-        results = request(
-            "POST",
-            url,
-            headers=self.headers,
-            json=payload,
-        )
-        return process_request(results)
+        return self._call("POST", "/v1/ssh-keys", json=payload, parse=parse_ssh_key if models else None)
 
     def delete_ssh_keys(self, ssh_key_id) -> Optional:
         """
@@ -42,23 +36,18 @@ class LambdaCloudSshKey(Base):
         :param ssh_key_id:
         :return:
         """
-        url = f"{self.base_url}/v1/ssh-keys/{ssh_key_id}"
-        results = request(
-            "DELETE",
-            url,
-            headers=self.headers,
-        )
-        return process_request(results)
+        return self._call("DELETE", f"/v1/ssh-keys/{ssh_key_id}")
 
-    def get_ssh_keys(self) -> Dict[str, List[Dict[str, str]]]:
+    def get_ssh_keys(self, models: bool = False) -> Union[Dict[str, List[Dict[str, str]]], ModelList]:
         """
         get all ssh keys associated with the user's account
+        :param models: return a ModelList of SshKey models instead of the response dict
         :return: Returns a list of all ssh keys associated with the user's account.
         """
-        url = f"{self.base_url}/v1/ssh-keys"
-        results = request(
-            "GET",
-            url,
-            headers=self.headers,
-        )
-        return process_request(results)
+        return self._call("GET", "/v1/ssh-keys", parse=parse_ssh_keys if models else None)
+
+
+class AsyncLambdaCloudSshKey(AsyncBase, LambdaCloudSshKey):
+    """
+    This class is used to interact with Lambda Cloud ssh keys from asyncio. Every method is awaitable.
+    """
@@ -0,0 +1,79 @@
+import codecs
+import json
+import re
+from typing import Any, List
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_SEPARATORS = re.compile(r"[\s,]*")
+_WHITESPACE = re.compile(r"\s*")
+
+
+class JsonArrayStream:
+    """
+    Decodes the items of the array under one key of a JSON object, e.g. the data of a listing, as chunks of the
+    body arrive. Only the item being decoded and the unread tail of the body are held in memory.
+    """
+
+    def __init__(self, key: str = "data"):
+        """
+        :param key: top-level key holding the array
+        """
+        self._marker = f'"{key}"'
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """
+        :param chunk: next bytes of the body
+        :return: the items completed by this chunk, in order
+        """
+        buffer = self._buffer + self._text.decode(chunk)
+        position = 0
+        if not self._in_array:
+            position = self._find_array(buffer)
+            if position is None:
+                self._buffer = buffer
+                return []
+            self._in_array = True
+
+        items = []
+        while not self.done:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position >= len(buffer):
+                break
+            if buffer[position] == "]":
+                self.done = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, position)
+            except ValueError:
+                # the item continues in the next chunk
+                break
+            items.append(item)
+            position = end
+        self._buffer = "" if self.done else buffer[position:]
+        return items
+
+    def finish(self):
+        """
+        check that the body held the whole array
+        """
+        if not self.done:
+            raise ValueError(f"response ended before the end of the {self._marker} array")
+
+    def _find_array(self, buffer: str):
+        start = buffer.find(self._marker)
+        if start < 0:
+            return None
+        position = _WHITESPACE.match(buffer, start + len(self._marker)).end()
+        if position < len(buffer) and buffer[position] == ":":
+            position = _WHITESPACE.match(buffer, position + 1).end()
+        if position >= len(buffer):
+            return None
+        if buffer[position] != "[":
+            raise ValueError(f"expected an array under {self._marker}")
+        return position + 1
@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import deque
+from json import dumps
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from utilities import loads
+
+if TYPE_CHECKING:
+    from requests import Response
+
+    from lambda_cloud.base import ApiRequest
+
+# response headers worth keeping in a cassette; the rest describe the recording server, not the API's answer
+RECORDED_HEADERS = ("Content-Type", "Retry-After")
+
+Send = Callable[["ApiRequest"], "Response"]
+AsyncSend = Callable[["ApiRequest"], Awaitable["Response"]]
+Interaction = Dict[str, Any]
+
+
+class Transport:
+    """
+    Sits between a client and the network. A transport receives each request together with the function that
+    would send it over the client's connection pool, and returns a requests Response, whether it calls that
+    function or not. The base class just sends.
+    """
+
+    def send(self, api_request: "ApiRequest", forward: Send) -> "Response":
+        """
+        :param api_request: request the client wants sent
+        :param forward: sends the request over the client's connection pool
+        :return: the response to hand to the client
+        """
+        return forward(api_request)
+
+    async def send_async(self, api_request: "ApiRequest", forward: AsyncSend) -> "Response":
+        """
+        :param api_request: request the client wants sent
+        :param forward: coroutine function sending the request over the client's connection pool
+        :return: the response to hand to the client
+        """
+        return await forward(api_request)
+
+
+class RecordingTransport(Transport):
+    """
+    Sends every request and records it with its response into a cassette: one compact JSON line per
+    interaction, holding the method, the path below the base URL, the JSON body sent, the status, the response
+    body, a few headers and the time the answer took. Tokens are never written. Paths ending in .gz are
+    compressed. Call save(), or use the transport as a context manager, to write the file.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        :param path: cassette file to write. Without one, interactions are only kept in memory
+        """
+        self.path = path
+        self.interactions = []  # type: List[Interaction]
+        self._lock = threading.Lock()
+
+    def send(self, api_request: "ApiRequest", forward: Send) -> "Response":
+        started = time.monotonic()
+        results = forward(api_request)
+        self._record(api_request, results, results.content, time.monotonic() - started)
+        return results
+
+    async def send_async(self, api_request: "ApiRequest", forward: AsyncSend) -> "Response":
+        started = time.monotonic()
+        results = await forward(api_request)
+        if results.raw is not None:
+            # a streamed body is read here so it can be recorded, then handed on from memory
+            content = await results.raw.aread()
+            await results.raw.aclose()
+            results.raw = _Body(content)
+        else:
+            content = results.content
+        self._record(api_request, results, content, time.monotonic() - started)
+        return results
+
+    def _record(self, api_request: "ApiRequest", results: "Response", content: bytes, seconds: float):
+        interaction = {
+            "method": api_request.method,
+            "path": api_request.path,
+            "status": results.status_code,
+            "seconds": round(seconds, 4),
+        }  # type: Interaction
+        if "json" in api_request.kwargs:
+            interaction["request"] = api_request.kwargs["json"]
+        headers = {name: results.headers[name] for name in RECORDED_HEADERS if name in results.headers}
+        if headers:
+            interaction["headers"] = headers
+        try:
+            interaction["body"] = loads(content) if content else None
+        except ValueError:
+            interaction["text"] = content.decode("utf-8", "replace")
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def save(self, path: Optional[str] = None):
+        """
+        write the recorded interactions
+        :param path: cassette file to write instead of the one given at construction
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("no cassette path to save to")
+        with self._lock:
+            lines = [dumps(interaction, separators=(",", ":")) for interaction in self.interactions]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if path.endswith(".gz"):
+            import gzip
+
+            data = gzip.compress(data)
+        with open(path, "wb") as cassette:
+            cassette.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.save()
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests from a cassette without touching the network. Requests are matched on method, path and
+    JSON body. Identical requests get their recorded answers in order, and the last one again once they run out,
+    so polling loops replay too. With timing, each answer is delayed by the time it took when recorded.
+    """
+
+    def __init__(
+        self,
+        cassette: Union[str, Iterable[Interaction]],
+        timing: bool = False,
+        speed: float = 1.0,
+        repeat: bool = True,
+    ):
+        """
+        :param cassette: cassette file written by a RecordingTransport, or its interactions
+        :param timing: wait as long as the recorded answer took before returning it
+        :param speed: divides the recorded waits, e.g. 10 to replay ten times faster
+        :param repeat: serve the last answer again once the recorded ones for a request run out
+        """
+        interactions = load_cassette(cassette) if isinstance(cassette, str) else list(cassette)
+        self.timing = timing
+        self.speed = speed
+        self.repeat = repeat
+        self.served = 0
+        self._answers = {}  # type: Dict[Tuple[str, str, str], Deque[Tuple[int, Dict[str, str], bytes, float]]]
+        for interaction in interactions:
+            if "body" in interaction:
+                content = dumps(interaction["body"]).encode("utf-8") if interaction["body"] is not None else b""
+            else:
+                content = interaction.get("text", "").encode("utf-8")
+            key = _match_key(interaction["method"], interaction["path"], interaction.get("request"))
+            headers = interaction.get("headers") or {}
+            answer = (interaction["status"], headers, content, interaction.get("seconds", 0.0))
+            self._answers.setdefault(key, deque()).append(answer)
+        self._lock = threading.Lock()
+
+    def _answer(self, api_request: "ApiRequest") -> Tuple["Response", float]:
+        key = _match_key(api_request.method, api_request.path, api_request.kwargs.get("json"))
+        with self._lock:
+            answers = self._answers.get(key)
+            if not answers:
+                raise KeyError(f"the cassette has no answer for {api_request.method} {api_request.path}")
+            answer = answers.popleft() if len(answers) > 1 or not self.repeat else answers[0]
+            self.served += 1
+        status_code, headers, content, seconds = answer
+        return _response(api_request.url, status_code, headers, content), seconds / self.speed
+
+    def send(self, api_request: "ApiRequest", forward: Send) -> "Response":
+        results, delay = self._answer(api_request)
+        if self.timing and delay > 0:
+            time.sleep(delay)
+        return results
+
+    async def send_async(self, api_request: "ApiRequest", forward: AsyncSend) -> "Response":
+        import asyncio
+
+        results, delay = self._answer(api_request)
+        if self.timing and delay > 0:
+            await asyncio.sleep(delay)
+        if api_request.kwargs.get("stream") and 200 <= results.status_code <= 299:
+            results.raw = _Body(results.content)
+        return results
+
+
+class _Body:
+    """
+    A response body held in memory, read like the httpx response of an async streamed request.
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def aiter_bytes(self, chunk_size: int):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    async def aread(self) -> bytes:
+        return self.content
+
+    async def aclose(self):
+        pass
+
+
+def load_cassette(path: str) -> List[Interaction]:
+    """
+    :param path: cassette file written by a RecordingTransport
+    :return: the recorded interactions, in order
+    """
+    with open(path, "rb") as cassette:
+        data = cassette.read()
+    if path.endswith(".gz"):
+        import gzip
+
+        data = gzip.decompress(data)
+    return [loads(line) for line in data.splitlines() if line.strip()]
+
+
+def _match_key(method: str, path: str, body: Any) -> Tuple[str, str, str]:
+    return method, path, dumps(body, sort_keys=True) if body is not None else ""
+
+
+def _response(url: str, status_code: int, headers: Dict[str, str], content: bytes) -> "Response":
+    from http import HTTPStatus
+
+    from requests import Response
+    from requests.structures import CaseInsensitiveDict
+
+    results = Response()
+    results.status_code = status_code
+    try:
+        results.reason = HTTPStatus(status_code).phrase
+    except ValueError:
+        pass
+    results.headers = CaseInsensitiveDict(headers)
+    results.url = url
+    results._content = content
+    results._content_consumed = True
+    return results
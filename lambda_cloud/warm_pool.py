@@ -0,0 +1,346 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from requests import RequestException
+
+from lambda_cloud.bulk import BulkOperations
+from lambda_cloud.instances import LambdaCloudInstance
+from lambda_cloud.polling import AdaptiveInterval
+from lambda_cloud.resilience import CircuitOpenError
+from utilities import error_code
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600.0
+DEFAULT_NAME = "warm-pool"
+DEFAULT_WAIT_SAMPLES = 1000
+# seconds a launched instance may be missing from listings before the pool gives up on it
+LISTING_GRACE = 60.0
+
+# statuses of launched instances that will never become usable
+BROKEN_STATUSES = ("unhealthy", "terminating", "terminated")
+GONE_STATUSES = ("terminating", "terminated")
+# error code of a terminate naming an instance the API does not know, i.e. one that is already gone
+OBJECT_DOES_NOT_EXIST = "global/object-does-not-exist"
+
+PoolKey = Tuple[str, str]
+
+
+class _Slot:
+    __slots__ = ("target", "desired", "ready", "pending", "hits", "misses")
+
+    def __init__(self, target: int):
+        self.target = target
+        # the size refills aim for. Expiry shrinks it, so an idle pool is not refilled; demand restores it
+        self.desired = target
+        self.ready = OrderedDict()  # type: OrderedDict[str, Tuple[float, Dict[str, Any]]]
+        self.pending = {}  # type: Dict[str, float]
+        self.hits = 0
+        self.misses = 0
+
+
+class WarmPool:
+    """
+    Keeps pre-launched, active instances per (instance type, region) so acquiring one takes no boot time.
+    A maintenance cycle costs one listing call: it promotes booted instances, terminates idle ones past the TTL
+    or idle cost ceiling, and launches what is missing with one request per pool. A slot freed by expiry is not
+    refilled until the pool is asked for an instance again, so pools shrink while nobody needs them.
+    Instances the pool gives up on stay tracked until their termination succeeds; failed terminations are sent
+    again on the next cycle. Call maintain yourself, or start() to run it from a background thread.
+    """
+
+    def __init__(
+        self,
+        client: LambdaCloudInstance,
+        sizes: Dict[PoolKey, int],
+        ssh_key_names: List[str],
+        ttl: float = DEFAULT_TTL,
+        max_idle_cents: Optional[float] = None,
+        file_system_names: Optional[List[str]] = None,
+        name: str = DEFAULT_NAME,
+        interval: AdaptiveInterval = None,
+    ):
+        """
+        :param client: client used to list, launch and terminate instances
+        :param sizes: number of ready instances to keep, keyed by (instance type name, region name)
+        :param ssh_key_names: names of the SSH keys to allow access to the instances
+        :param ttl: seconds an instance may sit ready before it is terminated
+        :param max_idle_cents: terminate a ready instance once its idle time has cost this much. No ceiling by default
+        :param file_system_names: names of the file systems to attach to the instances
+        :param name: name given to the instances the pool launches
+        :param interval: policy for the background cycle and for waiting on a miss. Starts at 2 seconds by default
+        """
+        if any(size < 0 for size in sizes.values()):
+            raise ValueError("pool sizes must not be negative")
+        self.client = client
+        self.ssh_key_names = ssh_key_names
+        self.ttl = ttl
+        self.max_idle_cents = max_idle_cents
+        self.file_system_names = file_system_names or []
+        self.name = name
+        self.interval = interval or AdaptiveInterval()
+        self.launched = 0
+        self.expired = 0
+        self.launch_failures = 0
+        self.terminate_failures = 0
+        self._to_terminate = set()  # type: Set[str]
+        self._slots = {key: _Slot(size) for key, size in sizes.items()}  # type: Dict[PoolKey, _Slot]
+        self._waits = deque(maxlen=DEFAULT_WAIT_SAMPLES)  # type: Deque[float]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def acquire(self, instance_type_name: str, region_name: str, timeout: float = 900) -> Dict[str, Any]:
+        """
+        take an active instance out of the pool, or launch one and wait for it when the pool is empty.
+        The instance then belongs to the caller, who terminates it when done
+        :param instance_type_name: name of the instance type
+        :param region_name: name of the region
+        :param timeout: seconds to wait for an instance launched on a miss. It is terminated when the wait fails
+        :return: the instance record
+        """
+        started = time.monotonic()
+        key = (instance_type_name, region_name)
+        with self._lock:
+            # keys without a pool are tracked too, so their demand shows in stats
+            slot = self._slots.setdefault(key, _Slot(0))
+            slot.desired = slot.target
+            if slot.ready:
+                _, (_, record) = slot.ready.popitem(last=False)
+                slot.hits += 1
+                self._waits.append(time.monotonic() - started)
+                self._wake.set()
+                return record
+            slot.misses += 1
+        self._wake.set()
+        (instance_id,) = self.client.launch_instance(
+            region_name=region_name,
+            instance_type_name=instance_type_name,
+            ssh_key_names=self.ssh_key_names,
+            file_system_names=self.file_system_names,
+            quantity=1,
+            name=self.name,
+        )["data"]["instance_ids"]
+        try:
+            record = self.client.wait_for_status([instance_id], "active", timeout, self.interval)[instance_id]
+        except Exception:
+            # the caller never gets the instance, so it is terminated rather than left running and billed
+            self._terminate([instance_id])
+            raise
+        with self._lock:
+            self._waits.append(time.monotonic() - started)
+        return record
+
+    def maintain(self):
+        """
+        run one maintenance cycle: promote booted instances, expire idle ones and launch what is missing
+        """
+        records = {record["id"]: record for record in self.client.get_all_instances()["data"]}
+        prices = self._prices() if self.max_idle_cents is not None else {}
+        now = time.monotonic()
+        stale = []  # type: List[str]
+        launches = []  # type: List[Tuple[PoolKey, int]]
+        with self._lock:
+            for key, slot in self._slots.items():
+                for instance_id, launched_at in list(slot.pending.items()):
+                    record = records.get(instance_id)
+                    status = record.get("status") if record is not None else None
+                    if status == "active":
+                        del slot.pending[instance_id]
+                        slot.ready[instance_id] = (now, record)
+                    elif status in BROKEN_STATUSES or (record is None and now - launched_at > LISTING_GRACE):
+                        del slot.pending[instance_id]
+                        if status not in GONE_STATUSES:
+                            # unhealthy, or never listed: it may still be billed, so it is terminated to be sure
+                            stale.append(instance_id)
+                for instance_id, (ready_since, _) in list(slot.ready.items()):
+                    record = records.get(instance_id)
+                    if record is None or record.get("status") != "active":
+                        # terminated or broken behind the pool's back
+                        del slot.ready[instance_id]
+                        if record is not None and record.get("status") == "unhealthy":
+                            stale.append(instance_id)
+                    elif self._expired(now - ready_since, prices.get(key[0])):
+                        del slot.ready[instance_id]
+                        stale.append(instance_id)
+                        slot.desired = max(0, slot.desired - 1)
+                        self.expired += 1
+                    else:
+                        slot.ready[instance_id] = (ready_since, record)
+                missing = slot.desired - len(slot.ready) - len(slot.pending)
+                if missing > 0:
+                    launches.append((key, missing))
+            for instance_id in list(self._to_terminate):
+                if records.get(instance_id, {}).get("status") in GONE_STATUSES:
+                    self._to_terminate.discard(instance_id)
+        _, failed = self._terminate(stale)
+        if failed:
+            logger.warning("terminating %d instances failed; they are sent again on the next cycle", len(failed))
+        for key, quantity in launches:
+            self._launch(key, quantity)
+
+    def _terminate(self, instance_ids: List[str]) -> Tuple[List[str], Dict[str, Exception]]:
+        """
+        terminate the given instances and those whose termination failed before. Ids are forgotten only once
+        the API confirms the termination, or reports the instance gone
+        :return: ids of the terminated instances, and the errors of those kept for the next attempt
+        """
+        with self._lock:
+            self._to_terminate.update(instance_ids)
+            pending = list(self._to_terminate)
+        if not pending:
+            return [], {}
+        result = BulkOperations(self.client).terminate(pending)
+        failed = {}  # type: Dict[str, Exception]
+        with self._lock:
+            for instance_id in pending:
+                error = result.failed.get(instance_id)
+                if error is None or error_code(error) == OBJECT_DOES_NOT_EXIST:
+                    self._to_terminate.discard(instance_id)
+                else:
+                    failed[instance_id] = error
+            self.terminate_failures += len(failed)
+        return list(result.succeeded), failed
+
+    def _expired(self, idle: float, price_cents_per_hour: Optional[float]) -> bool:
+        if idle > self.ttl:
+            return True
+        return (
+            self.max_idle_cents is not None
+            and price_cents_per_hour is not None
+            and idle / 3600 * price_cents_per_hour > self.max_idle_cents
+        )
+
+    def _prices(self) -> Dict[str, float]:
+        catalog = self.client.get_instance_types()["data"]
+        return {
+            name: float(entry["instance_type"]["price_cents_per_hour"])
+            for name, entry in catalog.items()
+            if entry.get("instance_type", {}).get("price_cents_per_hour") is not None
+        }
+
+    def _launch(self, key: PoolKey, quantity: int):
+        try:
+            instance_ids = self.client.launch_instance(
+                region_name=key[1],
+                instance_type_name=key[0],
+                ssh_key_names=self.ssh_key_names,
+                file_system_names=self.file_system_names,
+                quantity=quantity,
+                name=self.name,
+            )["data"]["instance_ids"]
+        except (RequestException, CircuitOpenError):
+            logger.warning("refilling the %s pool in %s failed", key[0], key[1], exc_info=True)
+            with self._lock:
+                self.launch_failures += 1
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.launched += len(instance_ids)
+            for instance_id in instance_ids:
+                self._slots[key].pending[instance_id] = now
+
+    def drain(self) -> List[str]:
+        """
+        terminate every instance the pool holds, ready or booting. Instances whose termination fails stay
+        tracked, and the next drain or maintenance cycle sends it again
+        :return: ids of the terminated instances
+        """
+        with self._lock:
+            instance_ids = []  # type: List[str]
+            for slot in self._slots.values():
+                instance_ids.extend(slot.ready)
+                instance_ids.extend(slot.pending)
+                slot.ready.clear()
+                slot.pending.clear()
+        terminated, failed = self._terminate(instance_ids)
+        if failed:
+            raise next(iter(failed.values()))
+        return terminated
+
+    def start(self):
+        """
+        run maintenance cycles from a background thread until stop()
+        """
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="lambda-cloud-warm-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        stop the background thread. Instances in the pool keep running until drain()
+        """
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("warm pool maintenance failed")
+            with self._lock:
+                booting = any(slot.pending for slot in self._slots.values())
+            self._wake.wait(self.interval.next(booting))
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: hits, misses and hit rate, wait percentiles in seconds, launch and expiry counters, and the same
+        per pool keyed by "instance type/region", to size the pools against demand
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+            pools = {
+                f"{key[0]}/{key[1]}": {
+                    "hits": slot.hits,
+                    "misses": slot.misses,
+                    "target": slot.target,
+                    "desired": slot.desired,
+                    "ready": len(slot.ready),
+                    "pending": len(slot.pending),
+                }
+                for key, slot in self._slots.items()
+            }
+            hits = sum(pool["hits"] for pool in pools.values())
+            misses = sum(pool["misses"] for pool in pools.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "wait_p50": _percentile(waits, 0.50),
+                "wait_p95": _percentile(waits, 0.95),
+                "wait_max": waits[-1] if waits else 0.0,
+                "launched": self.launched,
+                "expired": self.expired,
+                "launch_failures": self.launch_failures,
+                "terminate_failures": self.terminate_failures,
+                "to_terminate": len(self._to_terminate),
+                "pools": pools,
+            }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        self.drain()
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
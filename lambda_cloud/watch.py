@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from lambda_cloud.base import AsyncBase
+from lambda_cloud.instances import LambdaCloudInstance
+from lambda_cloud.inventory import InstanceInventory, InventoryDiff
+from lambda_cloud.polling import AdaptiveInterval
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+STATUS_CHANGED = "status_changed"
+IP_ASSIGNED = "ip_assigned"
+GONE = "gone"
+
+# put on subscriber queues when the watcher stops
+_STOPPED = object()
+
+
+class InstanceEvent:
+    """
+    A transition of one instance between two polls.
+    """
+
+    __slots__ = ("kind", "instance", "previous")
+
+    def __init__(self, kind: str, instance: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+        """
+        :param kind: one of created, status_changed, ip_assigned and gone
+        :param instance: latest record of the instance; for gone, the last record seen
+        :param previous: record from the poll before, for status_changed and ip_assigned
+        """
+        self.kind = kind
+        self.instance = instance
+        self.previous = previous
+
+    @property
+    def instance_id(self) -> str:
+        return self.instance["id"]
+
+    @property
+    def status(self) -> Optional[str]:
+        return "terminated" if self.kind == GONE else self.instance.get("status")
+
+    @property
+    def previous_status(self) -> Optional[str]:
+        if self.kind == GONE:
+            return self.instance.get("status")
+        return self.previous.get("status") if self.previous is not None else None
+
+    def __repr__(self):
+        return f"InstanceEvent({self.kind} {self.instance_id} {self.previous_status} -> {self.status})"
+
+
+def events_from_diff(diff: InventoryDiff) -> List[InstanceEvent]:
+    """
+    :param diff: difference between two listings, as returned by InstanceInventory.apply
+    :return: the transitions it holds, in the order created, changed, gone
+    """
+    events = [InstanceEvent(CREATED, record) for record in diff.added]
+    for old, new in diff.changed:
+        if old.get("status") != new.get("status"):
+            events.append(InstanceEvent(STATUS_CHANGED, new, old))
+        if new.get("ip") and not old.get("ip"):
+            events.append(InstanceEvent(IP_ASSIGNED, new, old))
+    events.extend(InstanceEvent(GONE, record) for record in diff.removed)
+    return events
+
+
+class InstanceWatcher:
+    """
+    One poll loop over the account's instances that publishes InstanceEvents to any number of subscribers:
+    callbacks, sync iterators and async iterators. Each poll costs one get_all_instances call, and the interval
+    grows while nothing changes. A sync client polls from a background thread, an async client from a task.
+    """
+
+    def __init__(
+        self,
+        client: LambdaCloudInstance,
+        interval: AdaptiveInterval = None,
+        emit_existing: bool = False,
+    ):
+        """
+        :param client: sync or async client used to list the instances
+        :param interval: poll interval policy. The default starts at 2 seconds and grows to 20 while nothing changes
+        :param emit_existing: publish a created event for every instance seen on the first poll. By default the
+        first poll only sets the baseline
+        """
+        self.client = client
+        self.interval = interval or AdaptiveInterval()
+        self.inventory = InstanceInventory(client)
+        self._primed = emit_existing
+        self._callbacks = []  # type: List[Callable[[InstanceEvent], Any]]
+        self._queues = []  # type: List[Callable[[Any], Any]]
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._task = None  # type: Optional[asyncio.Task]
+
+    @property
+    def running(self) -> bool:
+        return (self._thread is not None and self._thread.is_alive()) or (
+            self._task is not None and not self._task.done()
+        )
+
+    def subscribe(self, callback: Callable[[InstanceEvent], Any]) -> Callable[[InstanceEvent], Any]:
+        """
+        :param callback: function receiving every InstanceEvent, called from the poll loop
+        :return: the callback, so this can be used as a decorator
+        """
+        with self._lock:
+            self._callbacks = self._callbacks + [callback]
+        return callback
+
+    def unsubscribe(self, callback: Callable[[InstanceEvent], Any]):
+        with self._lock:
+            self._callbacks = [registered for registered in self._callbacks if registered is not callback]
+
+    def poll(self) -> List[InstanceEvent]:
+        """
+        list the instances once with a sync client and publish what changed
+        :return: the events published
+        """
+        return self._publish(self.inventory.apply(self.client.get_all_instances()["data"]))
+
+    async def poll_async(self) -> List[InstanceEvent]:
+        """
+        list the instances once with an async client and publish what changed
+        :return: the events published
+        """
+        return self._publish(self.inventory.apply((await self.client.get_all_instances())["data"]))
+
+    def _publish(self, diff: InventoryDiff) -> List[InstanceEvent]:
+        if not self._primed:
+            self._primed = True
+            return []
+        events = events_from_diff(diff)
+        for event in events:
+            for callback in self._callbacks:
+                try:
+                    callback(event)
+                except Exception:
+                    logger.exception("instance event subscriber %r failed", callback)
+            for put in self._queues:
+                put(event)
+        return events
+
+    def start(self):
+        """
+        start the poll loop if it is not running. With an async client, call this from the event loop
+        """
+        if self.running:
+            return
+        self._stopping.clear()
+        if isinstance(self.client, AsyncBase):
+            self._task = asyncio.get_event_loop().create_task(self._run_async())
+        else:
+            self._thread = threading.Thread(target=self._run, name="lambda-cloud-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        stop the poll loop and end every open iterator
+        """
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        for put in self._queues:
+            put(_STOPPED)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                changed = bool(self.poll())
+            except Exception:
+                logger.exception("polling instances failed")
+                changed = False
+            self._stopping.wait(self.interval.next(changed))
+
+    async def _run_async(self):
+        while not self._stopping.is_set():
+            try:
+                changed = bool(await self.poll_async())
+            except Exception:
+                logger.exception("polling instances failed")
+                changed = False
+            await asyncio.sleep(self.interval.next(changed))
+
+    def events(self, timeout: float = None) -> Iterator[InstanceEvent]:
+        """
+        subscribe to events and iterate over them as they are published, starting the poll loop if needed.
+        The subscription starts with this call, so no event is missed before the first next()
+        :param timeout: stop after this many seconds without an event. By default, iterate until stop()
+        """
+        events = queue.Queue()  # type: queue.Queue
+        put = events.put
+        self._add_queue(put)
+        self.start()
+        return self._drain(events, put, timeout)
+
+    def _drain(self, events: queue.Queue, put: Callable[[Any], Any], timeout: Optional[float]):
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=timeout)
+                except queue.Empty:
+                    return
+                if event is _STOPPED:
+                    return
+                yield event
+        finally:
+            self._remove_queue(put)
+
+    def events_async(self, timeout: float = None) -> AsyncIterator[InstanceEvent]:
+        """
+        subscribe to events and iterate over them from asyncio, starting the poll loop if needed.
+        Call from the event loop; the subscription starts with this call
+        :param timeout: stop after this many seconds without an event. By default, iterate until stop()
+        """
+        loop = asyncio.get_event_loop()
+        events = asyncio.Queue()  # type: asyncio.Queue
+
+        def put(event):
+            # the poll loop may run in another thread
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+            except RuntimeError:
+                pass
+
+        self._add_queue(put)
+        self.start()
+        return self._drain_async(events, put, timeout)
+
+    async def _drain_async(self, events: asyncio.Queue, put: Callable[[Any], Any], timeout: Optional[float]):
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    return
+                if event is _STOPPED:
+                    return
+                yield event
+        finally:
+            self._remove_queue(put)
+
+    def _add_queue(self, put: Callable[[Any], Any]):
+        with self._lock:
+            self._queues = self._queues + [put]
+
+    def _remove_queue(self, put: Callable[[Any], Any]):
+        with self._lock:
+            self._queues = [registered for registered in self._queues if registered is not put]
+
+    def __iter__(self) -> Iterator[InstanceEvent]:
+        return self.events()
+
+    def __aiter__(self) -> AsyncIterator[InstanceEvent]:
+        return self.events_async()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
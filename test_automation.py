@@ -1,5 +1,4 @@
 import sys
-import time
 
 from lambda_cloud.instances import LambdaCloudInstance
 from lambda_cloud.ssh_keys import LambdaCloudSshKey
@@ -68,15 +67,16 @@ def create_objects(token):
 
     # restart instance
     print("waiting for instances to be ready before restarting")
-    time.sleep(60)
+    lambda_instances.wait_for_status(instance_ids=new_instances, status="active")
     print("restarting the new instances created")
     lambda_instances.restart_instance(instance_ids=new_instances)
     print("instances restarted")
 
     # terminate instance
-    print("waiting for 60 secs before terminating instances")
-    time.sleep(60)
+    print("waiting for instances to be ready before terminating")
+    lambda_instances.wait_for_status(instance_ids=new_instances, status="active")
     lambda_instances.terminate_instance(instance_ids=new_instances)
+    lambda_instances.wait_for_status(instance_ids=new_instances, status="terminated")
     print("new instances terminated")
 
     # delete ssh key
@@ -0,0 +1,40 @@
+import pytest
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.testing import FakeLambdaCloud
+
+
+# Shared fixtures for the tests running against FakeLambdaCloud. A test module adjusts them by overriding
+# fake_options or client_options, and a single test with indirect parametrization, e.g.
+# @pytest.mark.parametrize("fake", [{"boot_seconds": 0.1}], indirect=True)
+@pytest.fixture
+def fake_options():
+    """
+    :return: options passed to FakeLambdaCloud on top of seed=1
+    """
+    return {}
+
+
+@pytest.fixture
+def client_options():
+    """
+    :return: options passed to LambdaCloudClient on top of rate_limiter=None
+    """
+    return {}
+
+
+@pytest.fixture
+def fake(request, fake_options):
+    options = {"seed": 1}
+    options.update(fake_options)
+    options.update(getattr(request, "param", {}))
+    with FakeLambdaCloud(**options) as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(request, fake, client_options):
+    options = {"rate_limiter": None}
+    options.update(client_options)
+    options.update(getattr(request, "param", {}))
+    with LambdaCloudClient("api_key", base_url=fake.base_url, **options) as client:
+        yield client
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+from requests import HTTPError
+
+httpx = pytest.importorskip("httpx")
+
+from lambda_cloud.client import AsyncLambdaCloudClient  # noqa: E402
+from lambda_cloud.instances import AsyncLambdaCloudInstance  # noqa: E402
+from lambda_cloud.polling import AdaptiveInterval  # noqa: E402
+from lambda_cloud.rate_limit import RetryPolicy  # noqa: E402
+
+
+def mock_session(responses, calls):
+    """
+    build an AsyncClient that answers from a list of (status, body) pairs and records each request
+    """
+    responses = list(responses)
+
+    def handler(request):
+        calls.append(request)
+        status_code, body = responses.pop(0)
+        return httpx.Response(status_code, json=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+# Test the async clients
+class TestAsyncLambdaCloud:
+    def test_get_all_instances(self):
+        calls = []
+        instances_response = {"data": [{"id": "0920582c7ff041399e34823a0be62549", "status": "active"}]}
+        session = mock_session([(200, instances_response)], calls)
+
+        async def run():
+            async with AsyncLambdaCloudInstance("api_key", session=session) as lambda_cloud_instance:
+                return await lambda_cloud_instance.get_all_instances()
+
+        result = asyncio.run(run())
+
+        assert result == instances_response
+        assert calls[0].method == "GET"
+        assert str(calls[0].url) == "https://cloud.lambdalabs.com/api/v1/instances"
+        assert calls[0].headers["Authorization"] == "Bearer api_key"
+
+    def test_launch_instance_posts_same_payload_as_sync(self):
+        calls = []
+        instance = {
+            "region_name": "us-tx-1",
+            "instance_type_name": "gpu_1x_a100",
+            "ssh_key_names": ["macbook-pro"],
+            "file_system_names": [],
+            "quantity": 1,
+        }
+        launch_response = {"data": {"instance_ids": ["0920582c7ff041399e34823a0be62549"]}}
+        session = mock_session([(429, {}), (200, launch_response)], calls)
+
+        async def run():
+            lambda_cloud_instance = AsyncLambdaCloudInstance(
+                "api_key", session=session, rate_limiter=None, retry_policy=RetryPolicy(backoff=0)
+            )
+            return await lambda_cloud_instance.launch_instance(**instance)
+
+        result = asyncio.run(run())
+
+        assert result == launch_response
+        assert len(calls) == 2
+        assert json.loads(calls[1].content) == instance
+
+    def test_errors_raise_like_sync(self):
+        session = mock_session([(404, {"error": {"code": "global/object-does-not-exist"}})], [])
+
+        async def run():
+            lambda_cloud_instance = AsyncLambdaCloudInstance("api_key", session=session)
+            return await lambda_cloud_instance.get_instance("missing")
+
+        with pytest.raises(HTTPError):
+            asyncio.run(run())
+
+    def test_client_shares_one_session(self):
+        calls = []
+        session = mock_session([(200, {"data": []})] * 3, calls)
+
+        async def run():
+            async with AsyncLambdaCloudClient("api_key", session=session, rate_limiter=None) as client:
+                assert client.instances.session is client.ssh_keys.session is client.file_systems.session
+                return await asyncio.gather(
+                    client.instances.get_instance_types(),
+                    client.ssh_keys.get_ssh_keys(),
+                    client.file_systems.get_file_systems(),
+                )
+
+        results = asyncio.run(run())
+
+        assert results == [{"data": []}] * 3
+        assert sorted(call.url.path for call in calls) == [
+            "/api/v1/file-systems",
+            "/api/v1/instance-types",
+            "/api/v1/ssh-keys",
+        ]
+
+    def test_wait_for_status(self):
+        calls = []
+        session = mock_session(
+            [
+                (200, {"data": [{"id": "a", "status": "active"}]}),
+                (200, {"data": []}),
+            ],
+            calls,
+        )
+
+        async def run():
+            lambda_cloud_instance = AsyncLambdaCloudInstance("api_key", session=session, rate_limiter=None)
+            interval = AdaptiveInterval(minimum=0.01, maximum=0.01)
+            return await lambda_cloud_instance.wait_for_status(["a"], status="terminated", interval=interval)
+
+        result = asyncio.run(run())
+
+        assert result == {"a": {"id": "a", "status": "terminated"}}
+        assert len(calls) == 2
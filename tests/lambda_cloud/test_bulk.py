@@ -0,0 +1,104 @@
+import pytest
+from requests import HTTPError
+from lambda_cloud.bulk import BulkOperations
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.rate_limit import RetryPolicy
+
+
+@pytest.fixture
+def client_options():
+    return {"retry_policy": None}
+
+
+# Test the BulkOperations class
+class TestBulkOperations:
+    def test_terminate_in_batches(self, fake, client):
+        instance_ids = fake.seed_instances(120)
+
+        result = BulkOperations(client.instances, batch_size=25).terminate(instance_ids + instance_ids[:5])
+
+        assert result.ok
+        assert set(result.succeeded) == set(instance_ids)
+        assert result.requests == fake.calls["POST /v1/instance-operations/terminate"] == 5
+        assert {record["status"] for record in result.succeeded.values()} == {"terminating"}
+
+    def test_bad_ids_are_isolated(self, fake, client):
+        instance_ids = fake.seed_instances(16)
+        fake.set_instance_status(instance_ids[3], "terminating")
+
+        result = BulkOperations(client.instances, batch_size=8).restart(instance_ids)
+
+        assert list(result.failed) == [instance_ids[3]]
+        assert isinstance(result.failed[instance_ids[3]], HTTPError)
+        assert set(result.succeeded) == set(instance_ids) - {instance_ids[3]}
+        # one batch of 8 bisected down to the bad id: 8 -> 4 -> 2 -> 1
+        assert result.requests == 2 + 2 + 2 + 2
+
+    def test_only_failed_batches_are_retried(self, fake, client):
+        instance_ids = fake.seed_instances(40)
+        fake.fail_next(503, count=2, path="/v1/instance-operations/terminate")
+
+        result = BulkOperations(client.instances, batch_size=10, max_workers=1).terminate(instance_ids)
+
+        assert result.ok
+        assert result.requests == fake.calls["POST /v1/instance-operations/terminate"] == 6
+
+    def test_transient_failures_give_up_after_max_attempts(self, fake, client):
+        instance_ids = fake.seed_instances(4)
+        fake.fail_next(503, count=10, path="/v1/instance-operations/restart")
+
+        result = BulkOperations(client.instances, batch_size=4, max_attempts=2).restart(instance_ids)
+
+        assert set(result.failed) == set(instance_ids)
+        assert result.requests == 2
+
+    def test_auth_errors_fail_the_batch_without_bisecting(self, fake, client):
+        instance_ids = fake.seed_instances(8)
+        fake.fail_next(401, count=2, path="/v1/instance-operations/terminate")
+
+        result = BulkOperations(client.instances, batch_size=4).terminate(instance_ids)
+
+        assert set(result.failed) == set(instance_ids)
+        assert {error.response.status_code for error in result.failed.values()} == {401}
+        assert result.requests == fake.calls["POST /v1/instance-operations/terminate"] == 2
+
+    def test_unexpected_errors_fail_their_batch_only(self, fake, client):
+        instance_ids = fake.seed_instances(4)
+        restart = client.instances.restart_instance
+
+        def restart_or_fail(batch):
+            if instance_ids[0] in batch:
+                raise KeyError("restarted_instances")
+            return restart(batch)
+
+        client.instances.restart_instance = restart_or_fail
+
+        result = BulkOperations(client.instances, batch_size=2).restart(instance_ids)
+
+        assert set(result.failed) == set(instance_ids[:2])
+        assert isinstance(result.failed[instance_ids[0]], KeyError)
+        assert set(result.succeeded) == set(instance_ids[2:])
+        assert result.requests == 2
+
+    def test_terminate_is_safe_to_repeat(self, fake, client):
+        instance_ids = fake.seed_instances(6)
+        bulk = BulkOperations(client.instances, batch_size=3)
+        bulk.terminate(instance_ids[:3])
+        # terminated instances leave the listing
+        client.instances.get_all_instances()
+
+        result = bulk.terminate(instance_ids)
+
+        assert result.ok
+        assert result.succeeded[instance_ids[0]] == {"id": instance_ids[0], "status": "terminated"}
+        assert result.succeeded[instance_ids[5]]["status"] == "terminating"
+
+    def test_client_retries_still_apply(self, fake):
+        instance_ids = fake.seed_instances(3)
+        fake.fail_next(429, path="/v1/instance-operations/terminate", retry_after=0)
+        retry_policy = RetryPolicy(backoff=0.01)
+        with LambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=None, retry_policy=retry_policy) as client:
+            result = BulkOperations(client.instances).terminate(instance_ids)
+
+        assert result.ok
+        assert result.requests == 1
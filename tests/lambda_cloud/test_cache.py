@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import pytest
+from requests.exceptions import Timeout
+from requests.models import Response
+from unittest.mock import patch
+from lambda_cloud.cache import PersistentCache, ResponseCache
+from lambda_cloud.client import LambdaCloudClient
+
+BASE_URL = "https://cloud.lambdalabs.com/api"
+
+
+def make_response(body):
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+# Mock the request function
+@pytest.fixture(autouse=True)
+def mock_request():
+    with patch("requests.Session.request") as mock:
+        mock.side_effect = lambda method, url, **kwargs: make_response({"data": [url]})
+        yield mock
+
+
+# Test the ResponseCache class
+class TestResponseCache:
+    def test_ttl_and_counters(self):
+        cache = ResponseCache(ttls={"/v1/ssh-keys": 60})
+        cache.set(("token", BASE_URL, "/v1/ssh-keys"), {"data": []})
+        cache.set(("token", BASE_URL, "/v1/instances"), {"data": []})
+
+        assert cache.get(("token", BASE_URL, "/v1/ssh-keys")) == (True, {"data": []})
+        assert cache.get(("token", BASE_URL, "/v1/instances")) == (False, None)
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    def test_expired_entries_miss(self):
+        cache = ResponseCache(ttls={"/v1/ssh-keys": 60})
+        with patch("lambda_cloud.cache.time.monotonic", return_value=0):
+            cache.set(("token", BASE_URL, "/v1/ssh-keys"), {"data": []})
+        with patch("lambda_cloud.cache.time.monotonic", return_value=61):
+            assert cache.get(("token", BASE_URL, "/v1/ssh-keys")) == (False, None)
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(ttls={"/v1/instances/": 60}, max_size=2)
+        cache.set(("token", BASE_URL, "/v1/instances/a"), "a")
+        cache.set(("token", BASE_URL, "/v1/instances/b"), "b")
+        cache.get(("token", BASE_URL, "/v1/instances/a"))
+        cache.set(("token", BASE_URL, "/v1/instances/c"), "c")
+
+        assert cache.get(("token", BASE_URL, "/v1/instances/a")) == (True, "a")
+        assert cache.get(("token", BASE_URL, "/v1/instances/b")) == (False, None)
+
+    def test_invalidate_for_mutations(self):
+        cache = ResponseCache(ttls={"/v1/ssh-keys": 60, "/v1/instances": 60, "/v1/instances/": 60})
+        for path in ("/v1/ssh-keys", "/v1/instances", "/v1/instances/a"):
+            cache.set(("token", BASE_URL, path), path)
+
+        cache.invalidate_for("DELETE", "/v1/ssh-keys/key-id")
+        assert cache.get(("token", BASE_URL, "/v1/ssh-keys"))[0] is False
+        assert cache.get(("token", BASE_URL, "/v1/instances"))[0] is True
+
+        cache.invalidate_for("POST", "/v1/instance-operations/restart")
+        assert len(cache) == 0
+
+
+class TestClientCache:
+    def test_reads_served_from_cache(self, mock_request):
+        client = LambdaCloudClient("api_key", rate_limiter=None, cache=ResponseCache())
+        first = client.instances.get_instance_types()
+        second = client.instances.get_instance_types()
+        client.instances.get_all_instances()
+        client.instances.get_all_instances()
+
+        assert first == second
+        assert mock_request.call_count == 3
+        assert client.cache.stats()["hits"] == 1
+
+    def test_writes_invalidate_listing(self, mock_request):
+        client = LambdaCloudClient("api_key", rate_limiter=None, cache=ResponseCache())
+        client.ssh_keys.get_ssh_keys()
+        client.ssh_keys.add_ssh_key("new-key", "ssh-ed25519 AAAA")
+        client.ssh_keys.get_ssh_keys()
+
+        assert [call[0][0] for call in mock_request.call_args_list] == ["GET", "POST", "GET"]
+
+    def test_tokens_do_not_share_entries(self, mock_request):
+        cache = ResponseCache()
+        LambdaCloudClient("token_a", rate_limiter=None, cache=cache).file_systems.get_file_systems()
+        LambdaCloudClient("token_b", rate_limiter=None, cache=cache).file_systems.get_file_systems()
+
+        assert mock_request.call_count == 2
+
+    def test_failed_writes_invalidate_listing(self, mock_request):
+        client = LambdaCloudClient("api_key", rate_limiter=None, retry_policy=None, cache=ResponseCache())
+        respond = mock_request.side_effect
+
+        def time_out_writes(method, url, **kwargs):
+            if method == "POST":
+                # the request may still have reached the API and been applied
+                raise Timeout("read timed out")
+            return respond(method, url, **kwargs)
+
+        mock_request.side_effect = time_out_writes
+        client.ssh_keys.get_ssh_keys()
+        with pytest.raises(Timeout):
+            client.ssh_keys.add_ssh_key("new-key", "ssh-ed25519 AAAA")
+        client.ssh_keys.get_ssh_keys()
+
+        assert [call[0][0] for call in mock_request.call_args_list] == ["GET", "POST", "GET"]
+
+    def test_base_urls_do_not_share_entries(self, mock_request):
+        cache = ResponseCache()
+        for base_url in (BASE_URL, "https://staging.example.com/api"):
+            LambdaCloudClient("api_key", base_url=base_url, rate_limiter=None, cache=cache).ssh_keys.get_ssh_keys()
+
+        assert mock_request.call_count == 2
+
+
+class TestPersistentCache:
+    def test_warm_start_across_processes(self, tmp_path, mock_request):
+        path = str(tmp_path / "cache.sqlite3")
+        first = LambdaCloudClient("secret-token", rate_limiter=None, cache=PersistentCache(path))
+        first.instances.get_instance_types()
+        first.instances.get_all_instances()
+
+        # a new process opens the same file with nothing in memory
+        second = LambdaCloudClient("secret-token", rate_limiter=None, cache=PersistentCache(path))
+        listing = second.instances.get_all_instances()
+
+        assert mock_request.call_count == 2
+        assert listing == {"data": ["https://cloud.lambdalabs.com/api/v1/instances"]}
+        assert b"secret-token" not in (tmp_path / "cache.sqlite3").read_bytes()
+
+    def test_files_without_base_urls_start_over(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        with closing(sqlite3.connect(path)) as connection, connection:
+            connection.execute(
+                "CREATE TABLE responses (account TEXT NOT NULL, path TEXT NOT NULL, stored_at REAL NOT NULL, "
+                "body BLOB NOT NULL, PRIMARY KEY (account, path))"
+            )
+            connection.execute("INSERT INTO responses VALUES ('account', '/v1/ssh-keys', 0, '{}')")
+        cache = PersistentCache(path)
+
+        cache.set(("token", BASE_URL, "/v1/ssh-keys"), {"data": []})
+
+        assert len(cache) == 1
+        assert cache.get(("token", BASE_URL, "/v1/ssh-keys")) == (True, {"data": []})
+
+    def test_tokens_are_kept_apart(self, tmp_path):
+        cache = PersistentCache(str(tmp_path / "cache.sqlite3"))
+        cache.set(("Bearer first", BASE_URL, "/v1/ssh-keys"), {"data": ["first"]})
+        cache.set(("Bearer second", BASE_URL, "/v1/ssh-keys"), {"data": ["second"]})
+        cache.invalidate("/v1/ssh-keys", "Bearer first")
+
+        assert cache.get(("Bearer first", BASE_URL, "/v1/ssh-keys")) == (False, None)
+        assert cache.get(("Bearer second", BASE_URL, "/v1/ssh-keys")) == (True, {"data": ["second"]})
+
+    def test_stale_entries_are_served_and_refreshed(self, tmp_path, mock_request):
+        cache = PersistentCache(str(tmp_path / "cache.sqlite3"), ttls={"/v1/ssh-keys": 60}, max_stale=60)
+        client = LambdaCloudClient("api_key", rate_limiter=None, cache=cache)
+        key = ("Bearer api_key", BASE_URL, "/v1/ssh-keys")
+        with patch("lambda_cloud.cache.time.time", return_value=1000):
+            cache.set(key, {"data": ["old"]})
+        respond = mock_request.side_effect
+        mock_request.side_effect = lambda *args, **kwargs: time.sleep(0.1) or respond(*args, **kwargs)
+
+        with patch("lambda_cloud.cache.time.time", return_value=1090):
+            assert client.ssh_keys.get_ssh_keys() == {"data": ["old"]}
+            # one refresh per stale entry, however many callers see it
+            assert client.ssh_keys.get_ssh_keys() == {"data": ["old"]}
+        deadline = time.monotonic() + 2
+        while mock_request.call_count == 0 or cache.get(key)[1] == {"data": ["old"]}:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        assert mock_request.call_count == 1
+        assert client.ssh_keys.get_ssh_keys() == {"data": ["https://cloud.lambdalabs.com/api/v1/ssh-keys"]}
+        assert cache.stats()["stale_hits"] == 2
+
+    def test_too_stale_entries_miss(self, tmp_path):
+        cache = PersistentCache(str(tmp_path / "cache.sqlite3"), ttls={"/v1/ssh-keys": 60}, max_stale=60)
+        with patch("lambda_cloud.cache.time.time", return_value=1000):
+            cache.set(("token", BASE_URL, "/v1/ssh-keys"), {"data": []})
+        with patch("lambda_cloud.cache.time.time", return_value=1121):
+            assert cache.get(("token", BASE_URL, "/v1/ssh-keys")) == (False, None)
+
+    def test_writes_invalidate_for_every_process(self, tmp_path, mock_request):
+        path = str(tmp_path / "cache.sqlite3")
+        reader = LambdaCloudClient("api_key", rate_limiter=None, cache=PersistentCache(path))
+        writer = LambdaCloudClient("api_key", rate_limiter=None, cache=PersistentCache(path))
+        reader.ssh_keys.get_ssh_keys()
+        writer.ssh_keys.add_ssh_key("new-key", "ssh-ed25519 AAAA")
+        reader.ssh_keys.get_ssh_keys()
+
+        assert mock_request.call_count == 3
+
+    def test_concurrent_writers(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        caches = [PersistentCache(path) for _ in range(4)]
+
+        def write(index):
+            for count in range(25):
+                caches[index].set((f"token-{index}", BASE_URL, "/v1/instances"), {"data": [count]})
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(write, range(4)))
+
+        for index in range(4):
+            assert caches[0].get((f"token-{index}", BASE_URL, "/v1/instances")) == (True, {"data": [24]})
+        assert len(caches[0]) == 4
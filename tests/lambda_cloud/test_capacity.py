@@ -0,0 +1,126 @@
+import pytest
+from requests import HTTPError
+from lambda_cloud.cache import ResponseCache
+from lambda_cloud.capacity import CapacityWatcher
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.polling import AdaptiveInterval
+from lambda_cloud.rate_limit import RateLimiter
+
+NO_CAPACITY = {
+    "gpu_1x_a10": {"us-tx-1": 0, "us-east-1": 0},
+    "gpu_8x_h100_sxm5": {"us-tx-1": 0, "us-east-1": 0},
+}
+
+
+@pytest.fixture
+def fake_options():
+    return {"capacity": NO_CAPACITY}
+
+
+@pytest.fixture
+def client_options():
+    return {"cache": ResponseCache()}
+
+
+@pytest.fixture
+def client(client):
+    client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+    return client
+
+
+def fast_interval():
+    return AdaptiveInterval(minimum=0.01, maximum=0.05)
+
+
+# Test the CapacityWatcher class
+class TestCapacityWatcher:
+    def test_launches_when_capacity_appears(self, fake, client):
+        watcher = CapacityWatcher(client.instances)
+        request = watcher.submit("gpu_1x_a10", ["macbook-pro"], regions=["us-east-1", "us-tx-1"])
+
+        assert watcher.poll() == []
+        fake.capacity["gpu_1x_a10"]["us-tx-1"] = 1
+        assert watcher.poll() == [("gpu_1x_a10", "us-tx-1")]
+
+        grab = request.wait(timeout=0)
+        assert (grab.region_name, len(grab.instance_ids)) == ("us-tx-1", 1)
+        assert 0 <= grab.latency <= grab.round_trip
+        assert watcher.stats()["grabs"] == 1
+        assert watcher.stats()["queued"] == 0
+
+    def test_priority_order_and_lost_races(self, fake, client):
+        watcher = CapacityWatcher(client.instances)
+        low = watcher.submit("gpu_8x_h100_sxm5", ["macbook-pro"], priority=5)
+        high = watcher.submit("gpu_8x_h100_sxm5", ["macbook-pro"], priority=1)
+        fake.capacity["gpu_8x_h100_sxm5"]["us-east-1"] = 1
+
+        watcher.poll()
+
+        assert high.done and high.grab.region_name == "us-east-1"
+        assert not low.done
+        # the catalog still listed capacity when the second launch went out, and the API said no
+        assert watcher.stats()["lost_races"] == 1
+        fake.capacity["gpu_8x_h100_sxm5"]["us-tx-1"] = 1
+        watcher.poll()
+        assert low.wait(timeout=0).region_name == "us-tx-1"
+
+    def test_polls_bypass_the_cache(self, fake, client):
+        watcher = CapacityWatcher(client.instances)
+
+        for _ in range(3):
+            watcher.poll()
+
+        assert fake.calls["GET /v1/instance-types"] == 3
+        assert watcher.stats()["polls"] == 3
+
+    def test_rejected_launch_fails_the_request(self, fake, client):
+        watcher = CapacityWatcher(client.instances)
+        request = watcher.submit("gpu_1x_a10", ["no-such-key"])
+        fake.capacity["gpu_1x_a10"]["us-east-1"] = 1
+
+        watcher.poll()
+
+        with pytest.raises(HTTPError):
+            request.wait(timeout=0)
+
+    def test_invalid_launch_fails_the_request(self, fake, client):
+        watcher = CapacityWatcher(client.instances)
+        request = watcher.submit("gpu_1x_a10", "macbook-pro")
+        fake.capacity["gpu_1x_a10"]["us-east-1"] = 1
+
+        watcher.poll()
+
+        with pytest.raises(ValueError):
+            request.wait(timeout=0)
+        assert watcher.stats()["queued"] == 0
+
+    def test_cancel(self, client):
+        watcher = CapacityWatcher(client.instances)
+        request = watcher.submit("gpu_1x_a10", ["macbook-pro"])
+
+        watcher.cancel(request)
+
+        assert watcher.stats()["queued"] == 0
+        with pytest.raises(RuntimeError):
+            request.wait(timeout=0)
+
+    def test_background_polling(self, fake, client):
+        with CapacityWatcher(client.instances, interval=fast_interval()) as watcher:
+            request = watcher.submit("gpu_1x_a10", ["macbook-pro"])
+            with pytest.raises(TimeoutError):
+                request.wait(timeout=0.05)
+            fake.capacity["gpu_1x_a10"]["us-east-1"] = 1
+            grab = request.wait(timeout=2)
+
+        assert not watcher.running
+        assert grab.round_trip < 1
+
+    def test_polls_stay_within_the_rate_limit(self, fake):
+        with LambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=RateLimiter(rate=4)) as client:
+            interval = fast_interval()
+            watcher = CapacityWatcher(client.instances, interval=interval, poll_share=0.5)
+
+        assert watcher.interval.minimum == 0.5
+        # the caller's interval is left as it was
+        assert (interval.minimum, interval.maximum) == (0.01, 0.05)
+        assert watcher.interval is not interval
@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from lambda_cloud.cli import format_table, main
+
+
+@pytest.fixture
+def run(fake, monkeypatch, capsys, tmp_path):
+    monkeypatch.setenv("LAMBDA_CLOUD_TOKEN", "api_key")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    def run(*argv):
+        status = main(["--base-url", fake.base_url, *argv])
+        captured = capsys.readouterr()
+        return status, captured.out, captured.err
+
+    return run
+
+
+def python(code, env):
+    return subprocess.run(
+        [sys.executable, "-c", code], env=dict(os.environ, **env), capture_output=True, text=True, check=True
+    ).stdout
+
+
+# Test the lambda-cloud command line
+class TestCli:
+    def test_list_table(self, fake, run):
+        instance_ids = fake.seed_instances(2)
+
+        status, out, _ = run("list")
+
+        lines = out.splitlines()
+        assert status == 0
+        assert lines[0].split() == ["ID", "NAME", "STATUS", "TYPE", "REGION", "IP"]
+        assert [line.split()[0] for line in lines[1:]] == instance_ids
+
+    def test_list_json_with_status_filter(self, fake, run):
+        instance_ids = fake.seed_instances(3)
+        fake.set_instance_status(instance_ids[1], "unhealthy")
+
+        status, out, _ = run("--output", "json", "list", "--status", "unhealthy")
+
+        assert status == 0
+        assert [record["id"] for record in json.loads(out)] == [instance_ids[1]]
+
+    def test_launch_and_terminate(self, fake, run):
+        run("ssh-keys", "add", "macbook-pro")
+
+        launch = ["launch", "--region", "us-tx-1", "--type", "gpu_1x_a10", "--ssh-key", "macbook-pro", "--quantity", "2"]
+        status, out, _ = run("-o", "json", *launch)
+        instance_ids = [record["id"] for record in json.loads(out)]
+        assert status == 0
+        assert len(instance_ids) == 2
+
+        status, out, _ = run("terminate", *instance_ids)
+        assert status == 0
+        assert {line.split()[1] for line in out.splitlines()[1:]} == {"terminating"}
+
+    def test_failed_ids_are_reported(self, fake, run):
+        instance_ids = fake.seed_instances(2)
+        fake.set_instance_status(instance_ids[0], "terminating")
+
+        status, out, err = run("restart", *instance_ids)
+
+        assert status == 1
+        assert instance_ids[1] in out
+        assert f"restart {instance_ids[0]}: 404 global/object-does-not-exist" in err
+
+    def test_ssh_keys_ensure_and_delete_by_name(self, fake, run):
+        assert run("ssh-keys", "ensure", "laptop")[0] == 0
+        assert run("ssh-keys", "ensure", "laptop")[0] == 0
+        assert fake.calls["POST /v1/ssh-keys"] == 1
+
+        status, out, err = run("ssh-keys", "delete", "laptop", "desktop")
+
+        assert status == 1
+        assert out.splitlines()[1].split()[1] == "laptop"
+        assert "delete ssh key desktop: 404 global/object-does-not-exist" in err
+        assert not fake.ssh_keys
+
+    def test_missing_token_is_a_usage_error(self, monkeypatch, capsys):
+        monkeypatch.delenv("LAMBDA_CLOUD_TOKEN", raising=False)
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(["list"])
+
+        assert exit_info.value.code == 2
+        assert "API token is required" in capsys.readouterr().err
+
+    def test_format_table(self):
+        records = [{"id": "a", "region": {"name": "us-tx-1"}, "tags": ["x", "y"]}, {"id": "bb", "region": None}]
+
+        lines = format_table(records, (("ID", "id"), ("REGION", "region.name"), ("TAGS", "tags")))
+
+        assert lines == ["ID  REGION   TAGS", "a   us-tx-1  x,y", "bb  -        -"]
+
+    def test_startup_skips_heavy_imports(self):
+        loaded = python(
+            "import sys, lambda_cloud.cli, lambda_cloud.client; "
+            "print([name for name in ('requests', 'asyncio', 'sqlite3') if name in sys.modules])",
+            {},
+        )
+
+        assert loaded.strip() == "[]"
+
+    def test_warm_cache_is_served_without_requests(self, fake, tmp_path):
+        fake.seed_instances(2)
+        env = {"LAMBDA_CLOUD_TOKEN": "api_key", "XDG_CACHE_HOME": str(tmp_path)}
+        code = (
+            "import sys; from lambda_cloud.cli import main; "
+            f"main(['--base-url', '{fake.base_url}', '--cache', '--output', 'json', 'list']); "
+            "print('requests' in sys.modules)"
+        )
+
+        first, second = python(code, env), python(code, env)
+
+        assert first.splitlines()[-1] == "True"
+        assert second.splitlines()[-1] == "False"
+        assert first.splitlines()[:-1] == second.splitlines()[:-1]
+        assert fake.calls["GET /v1/instances"] == 1
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from requests.models import Response
+from unittest.mock import patch
+from lambda_cloud.base import build_session
+from lambda_cloud.client import LambdaCloudClient
+
+
+# Mock the request function
+@pytest.fixture(autouse=True)
+def mock_request():
+    with patch("requests.Session.request") as mock:
+        mock_response = Response()
+        mock_response.status_code = 200
+        mock_response._content = json.dumps({"data": []}).encode("utf-8")
+        mock.return_value = mock_response
+        yield mock
+
+
+# Test the LambdaCloudClient class
+class TestLambdaCloudClient:
+    def test_resources_share_one_session(self):
+        client = LambdaCloudClient("api_key")
+
+        assert client.instances.session is client.session
+        assert client.ssh_keys.session is client.session
+        assert client.file_systems.session is client.session
+        assert client.instances.rate_limiter is client.ssh_keys.rate_limiter is client.file_systems.rate_limiter
+
+    def test_calls_go_through_shared_session(self, mock_request):
+        client = LambdaCloudClient("api_key", timeout=5, rate_limiter=None)
+        client.instances.get_all_instances()
+        client.ssh_keys.get_ssh_keys()
+        client.file_systems.get_file_systems()
+
+        assert mock_request.call_count == 3
+        mock_request.assert_called_with(
+            "GET",
+            "https://cloud.lambdalabs.com/api/v1/file-systems",
+            headers={"Authorization": "Bearer api_key"},
+            timeout=5,
+        )
+
+    def test_pool_size(self):
+        session = build_session(pool_size=32)
+
+        assert session.get_adapter("https://cloud.lambdalabs.com")._pool_maxsize == 32
+
+    def test_close_leaves_external_session_open(self):
+        session = build_session()
+        with patch.object(session, "close") as mock_close:
+            with LambdaCloudClient("api_key", session=session):
+                pass
+            mock_close.assert_not_called()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from requests import ConnectionError
+from requests.models import Response
+from unittest.mock import patch
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.coalesce import SingleFlight
+from lambda_cloud.models import ModelList
+
+
+def make_response(body):
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+# Mock the request function
+@pytest.fixture(autouse=True)
+def mock_request():
+    with patch("requests.Session.request") as mock:
+        yield mock
+
+
+def slow(result, delay=0.1):
+    def respond(*args, **kwargs):
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return make_response(result)
+
+    return respond
+
+
+def run_concurrently(call, count=8):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return list(executor.map(lambda _: call(), range(count)))
+
+
+# Test the SingleFlight class and request coalescing in the clients
+class TestSingleFlight:
+    def test_concurrent_gets_share_one_request(self, mock_request):
+        mock_request.side_effect = slow({"data": [{"id": "a"}]})
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+
+        results = run_concurrently(client.instances.get_all_instances)
+
+        assert mock_request.call_count == 1
+        assert all(result == {"data": [{"id": "a"}]} for result in results)
+        assert client.single_flight.stats() == {"requests": 1, "shared": 7, "in_flight": 0}
+
+    def test_shared_results_are_the_same_object(self, mock_request):
+        mock_request.side_effect = slow({"data": [{"id": "a"}]})
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+
+        results = run_concurrently(client.instances.get_all_instances, 4)
+
+        # not copied for each caller, so callers must not modify it
+        assert mock_request.call_count == 1
+        assert all(result is results[0] for result in results)
+
+    def test_sequential_gets_are_not_shared(self, mock_request):
+        mock_request.return_value = make_response({"data": []})
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+
+        client.instances.get_all_instances()
+        client.instances.get_all_instances()
+
+        assert mock_request.call_count == 2
+
+    def test_errors_reach_every_caller(self, mock_request):
+        mock_request.side_effect = slow(ConnectionError("refused"))
+        client = LambdaCloudClient("api_key", rate_limiter=None, retry_policy=None)
+        errors = []
+
+        def call():
+            try:
+                client.ssh_keys.get_ssh_keys()
+            except ConnectionError as error:
+                errors.append(error)
+
+        run_concurrently(call, 4)
+
+        assert mock_request.call_count == 1
+        assert len(errors) == 4
+
+    def test_parse_is_per_caller(self, mock_request):
+        mock_request.side_effect = slow({"data": [{"id": "a"}]})
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+        barrier = threading.Barrier(2)
+
+        def call(models):
+            barrier.wait()
+            return client.instances.get_all_instances(models=models)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            plain, models = executor.map(call, (False, True))
+
+        assert mock_request.call_count == 1
+        assert plain == {"data": [{"id": "a"}]}
+        assert isinstance(models, ModelList)
+
+    def test_tokens_and_writes_are_not_shared(self, mock_request):
+        mock_request.side_effect = slow({"data": {}})
+        single_flight = SingleFlight()
+        first = LambdaCloudClient("first", rate_limiter=None, single_flight=single_flight)
+        second = LambdaCloudClient("second", rate_limiter=None, single_flight=single_flight)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda client: client.instances.get_instance_types(), (first, second)))
+            list(executor.map(lambda _: first.instances.restart_instance(["a"]), range(2)))
+
+        assert mock_request.call_count == 4
+
+    def test_reads_after_a_write_start_a_new_flight(self, mock_request):
+        listed = threading.Event()
+        release = threading.Event()
+        listings = iter([{"data": []}, {"data": [{"id": "key"}]}])
+
+        def respond(method, url, **kwargs):
+            if method == "POST":
+                return make_response({"data": {"id": "key"}})
+            body = next(listings)
+            if not listed.is_set():
+                listed.set()
+                # the first listing is answered only after the write and the second read are done
+                release.wait(5)
+            return make_response(body)
+
+        mock_request.side_effect = respond
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            before = executor.submit(client.ssh_keys.get_ssh_keys)
+            listed.wait(5)
+            client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+            after = client.ssh_keys.get_ssh_keys()
+            release.set()
+
+        assert after == {"data": [{"id": "key"}]}
+        assert before.result() == {"data": []}
+        assert client.single_flight.stats()["shared"] == 0
+
+    def test_disabled(self, mock_request):
+        mock_request.side_effect = slow({"data": []})
+        client = LambdaCloudClient("api_key", rate_limiter=None, single_flight=None)
+
+        run_concurrently(client.file_systems.get_file_systems, 3)
+
+        assert mock_request.call_count == 3
+
+    def test_async(self):
+        httpx = pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"data": []})
+
+        async def run():
+            session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with AsyncLambdaCloudClient("api_key", session=session, rate_limiter=None) as client:
+                tasks = [asyncio.ensure_future(client.instances.get_all_instances()) for _ in range(5)]
+                await asyncio.sleep(0)
+                # a cancelled caller leaves the shared request running for the others
+                tasks[0].cancel()
+                results = await asyncio.gather(*tasks[1:])
+                await session.aclose()
+                return results
+
+        results = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert results == [{"data": []}] * 4
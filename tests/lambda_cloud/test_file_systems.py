@@ -9,7 +9,7 @@ from lambda_cloud.file_systems import LambdaCloudFileSystem
 # Mock the request function
 @pytest.fixture(autouse=True)
 def mock_request():
-    with patch("lambda_cloud.file_systems.request") as mock:
+    with patch("requests.Session.request") as mock:
         yield mock
 
 
@@ -46,5 +46,6 @@ class TestLambdaCloudFileSystem:
             "GET",
             "https://cloud.lambdalabs.com/api/v1/file-systems",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
         )
         assert result == instances_response
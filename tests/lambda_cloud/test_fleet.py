@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from requests import HTTPError
+from requests.models import Response
+from unittest.mock import MagicMock
+from lambda_cloud.fleet import FleetLauncher, gpus_per_instance
+
+
+def capacity_error():
+    response = Response()
+    response.status_code = 400
+    response._content = json.dumps(
+        {"error": {"code": "instance-operations/launch/insufficient-capacity", "message": "Not enough capacity"}}
+    ).encode("utf-8")
+    return HTTPError(response=response)
+
+
+def catalog(**types):
+    return {
+        "data": {
+            name: {
+                "instance_type": {"name": name},
+                "regions_with_capacity_available": [{"name": region} for region in regions],
+            }
+            for name, regions in types.items()
+        }
+    }
+
+
+@pytest.fixture
+def mock_client():
+    client = MagicMock()
+    counter = iter(range(1000))
+
+    def launch_instance(region_name, instance_type_name, quantity, **kwargs):
+        return {"data": {"instance_ids": [f"{region_name}-{next(counter)}" for _ in range(quantity)]}}
+
+    client.launch_instance.side_effect = launch_instance
+    return client
+
+
+# Test the FleetLauncher class
+class TestFleetLauncher:
+    def test_gpus_per_instance(self):
+        assert gpus_per_instance("gpu_8x_a100_80gb_sxm4") == 8
+        assert gpus_per_instance("gpu_1x_a10") == 1
+        assert gpus_per_instance("cpu_only") == 0
+
+    def test_spreads_launches_across_regions(self, mock_client):
+        mock_client.get_instance_types.return_value = catalog(gpu_1x_a100=["us-tx-1", "us-az-1"])
+
+        result = FleetLauncher(mock_client).launch(3, ["gpu_1x_a100"], ["macbook-pro"])
+
+        assert result.complete
+        assert result.gpus == 3
+        assert {region: len(ids) for region, ids in result.by_region().items()} == {"us-tx-1": 2, "us-az-1": 1}
+        assert mock_client.launch_instance.call_count == 2
+
+    def test_falls_back_after_capacity_error(self, mock_client):
+        mock_client.get_instance_types.return_value = catalog(
+            gpu_8x_h100=["us-tx-1"], gpu_8x_a100=["us-tx-1", "us-az-1"]
+        )
+        launch_instance = mock_client.launch_instance.side_effect
+
+        def launch_without_h100(instance_type_name, **kwargs):
+            if instance_type_name == "gpu_8x_h100":
+                raise capacity_error()
+            return launch_instance(instance_type_name=instance_type_name, **kwargs)
+
+        mock_client.launch_instance.side_effect = launch_without_h100
+
+        result = FleetLauncher(mock_client).launch(16, ["gpu_8x_h100", "gpu_8x_a100"], ["macbook-pro"])
+
+        assert result.complete
+        assert [(failure.instance_type_name, failure.capacity) for failure in result.failures] == [
+            ("gpu_8x_h100", True)
+        ]
+        assert {launch.instance_type_name for launch in result.launches} == {"gpu_8x_a100"}
+        assert result.gpus == 16
+
+    def test_regions_filter_and_order(self, mock_client):
+        mock_client.get_instance_types.return_value = catalog(gpu_1x_a10=["us-tx-1", "us-az-1", "us-west-1"])
+
+        launcher = FleetLauncher(mock_client)
+
+        assert launcher.candidates(["gpu_1x_a10"], regions=["us-west-1", "us-tx-1"]) == [
+            ("gpu_1x_a10", "us-west-1"),
+            ("gpu_1x_a10", "us-tx-1"),
+        ]
+
+    def test_incomplete_when_capacity_runs_out(self, mock_client):
+        mock_client.get_instance_types.return_value = catalog(gpu_1x_a10=["us-tx-1"])
+        mock_client.launch_instance.side_effect = capacity_error()
+
+        result = FleetLauncher(mock_client).launch(2, ["gpu_1x_a10"], ["macbook-pro"])
+
+        assert not result.complete
+        assert result.instance_ids == []
+        assert len(result.failures) == 1
+
+    def test_unexpected_errors_keep_the_round_launches(self, mock_client):
+        mock_client.get_instance_types.return_value = catalog(gpu_1x_a10=["us-tx-1", "us-az-1", "us-west-1"])
+        launch_instance = mock_client.launch_instance.side_effect
+
+        def undecodable_in_tx(region_name, **kwargs):
+            if region_name == "us-tx-1":
+                raise ValueError("the response is not JSON")
+            return launch_instance(region_name=region_name, **kwargs)
+
+        mock_client.launch_instance.side_effect = undecodable_in_tx
+
+        result = FleetLauncher(mock_client).launch(3, ["gpu_1x_a10"], ["macbook-pro"])
+
+        assert result.complete
+        assert set(result.by_region()) == {"us-az-1", "us-west-1"}
+        assert [(failure.region_name, failure.capacity) for failure in result.failures] == [("us-tx-1", False)]
+        assert isinstance(result.failures[0].error, ValueError)
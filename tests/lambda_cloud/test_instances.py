@@ -9,7 +9,7 @@ from lambda_cloud.instances import LambdaCloudInstance
 # Mock the request function
 @pytest.fixture(autouse=True)
 def mock_request():
-    with patch("lambda_cloud.instances.request") as mock:
+    with patch("requests.Session.request") as mock:
         yield mock
 
 
@@ -38,6 +38,7 @@ class TestLambdaCloudInstance:
             "POST",
             "https://cloud.lambdalabs.com/api/v1/instance-operations/launch",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
             json=instance,
         )
 
@@ -79,6 +80,7 @@ class TestLambdaCloudInstance:
             "GET",
             "https://cloud.lambdalabs.com/api/v1/instance-types",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
         )
         assert result == instance_types_response
 
@@ -118,6 +120,7 @@ class TestLambdaCloudInstance:
             "GET",
             "https://cloud.lambdalabs.com/api/v1/instances",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
         )
         assert result == instances_response
 
@@ -155,6 +158,7 @@ class TestLambdaCloudInstance:
             "GET",
             "https://cloud.lambdalabs.com/api/v1/instances/0920582c7ff041399e34823a0be62549",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
         )
         assert result == instance_response
 
@@ -198,6 +202,7 @@ class TestLambdaCloudInstance:
             "POST",
             "https://cloud.lambdalabs.com/api/v1/instance-operations/terminate",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
             json={"instance_ids": instance_req},
         )
         assert result == instance_response
@@ -242,6 +247,35 @@ class TestLambdaCloudInstance:
             "POST",
             "https://cloud.lambdalabs.com/api/v1/instance-operations/restart",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
             json={"instance_ids": instance_req},
         )
         assert result == instance_response
+
+    def test_wait_for_status_polls_whole_batch(self, mock_request):
+        listings = [
+            {"data": [{"id": "a", "status": "booting"}, {"id": "b", "status": "booting"}]},
+            {"data": [{"id": "a", "status": "active"}, {"id": "b", "status": "booting"}]},
+            {"data": [{"id": "a", "status": "active"}, {"id": "b", "status": "active"}]},
+        ]
+        mock_responses = []
+        for listing in listings:
+            mock_response = Response()
+            mock_response.status_code = 200
+            mock_response._content = json.dumps(listing).encode("utf-8")
+            mock_responses.append(mock_response)
+        mock_request.side_effect = mock_responses
+
+        lambda_cloud_instance = LambdaCloudInstance("api_key", rate_limiter=None)
+        with patch("lambda_cloud.instances.time.sleep") as mock_sleep:
+            result = lambda_cloud_instance.wait_for_status(["a", "b"], status="active")
+
+        assert set(result) == {"a", "b"}
+        assert mock_request.call_count == 3
+        assert mock_sleep.call_count == 2
+        mock_request.assert_called_with(
+            "GET",
+            "https://cloud.lambdalabs.com/api/v1/instances",
+            headers={"Authorization": "Bearer api_key"},
+            timeout=30,
+        )
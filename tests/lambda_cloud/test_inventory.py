@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import MagicMock
+from lambda_cloud.inventory import InstanceInventory
+
+
+def make_instance(instance_id, status="active", region="us-tx-1", instance_type="gpu_1x_a100", name=None):
+    return {
+        "id": instance_id,
+        "name": name or f"node-{instance_id}",
+        "status": status,
+        "region": {"name": region, "description": "Austin, Texas"},
+        "instance_type": {"name": instance_type},
+    }
+
+
+@pytest.fixture
+def mock_client():
+    return MagicMock()
+
+
+# Test the InstanceInventory class
+class TestInstanceInventory:
+    def test_refresh_builds_indexes(self, mock_client):
+        mock_client.get_all_instances.return_value = {
+            "data": [
+                make_instance("a"),
+                make_instance("b", status="booting", region="us-az-1"),
+                make_instance("c", instance_type="gpu_8x_h100"),
+            ]
+        }
+        inventory = InstanceInventory(mock_client)
+        diff = inventory.refresh()
+
+        assert len(diff.added) == 3
+        assert len(inventory) == 3
+        assert inventory.get("b")["status"] == "booting"
+        assert {record["id"] for record in inventory.by_region("us-tx-1")} == {"a", "c"}
+        assert [record["id"] for record in inventory.by_status("booting")] == ["b"]
+        assert [record["id"] for record in inventory.find(region="us-tx-1", instance_type="gpu_8x_h100")] == ["c"]
+        assert [record["id"] for record in inventory.by_name("node-a")] == ["a"]
+        assert inventory.counts("status") == {"active": 2, "booting": 1}
+
+    def test_apply_only_touches_diff(self, mock_client):
+        inventory = InstanceInventory(mock_client)
+        unchanged = make_instance("a")
+        inventory.apply([unchanged, make_instance("b", status="booting")])
+
+        diff = inventory.apply([unchanged, make_instance("b"), make_instance("d")])
+
+        assert [record["id"] for record in diff.added] == ["d"]
+        assert [(old["status"], new["status"]) for old, new in diff.changed] == [("booting", "active")]
+        assert diff.removed == []
+        assert inventory.by_status("booting") == []
+        assert inventory.counts("status") == {"active": 3}
+
+    def test_removed_instances_leave_indexes(self, mock_client):
+        inventory = InstanceInventory(mock_client)
+        inventory.apply([make_instance("a"), make_instance("b", region="us-az-1")])
+
+        diff = inventory.apply([make_instance("a")])
+
+        assert [record["id"] for record in diff.removed] == ["b"]
+        assert "b" not in inventory
+        assert inventory.by_region("us-az-1") == []
+        assert inventory.counts("region") == {"us-tx-1": 1}
+
+    def test_no_changes_is_empty_diff(self, mock_client):
+        inventory = InstanceInventory(mock_client)
+        inventory.apply([make_instance("a")])
+
+        assert not inventory.apply([make_instance("a")])
+
+    def test_unknown_criteria(self, mock_client):
+        with pytest.raises(ValueError):
+            InstanceInventory(mock_client).find(ip="10.10.10.1")
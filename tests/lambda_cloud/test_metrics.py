@@ -0,0 +1,142 @@
+import json
+
+import pytest
+from requests import ConnectionError, HTTPError
+from requests.models import Response
+from unittest.mock import patch
+from lambda_cloud.cache import ResponseCache
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.metrics import MetricsCollector, RequestEvent, RequestHooks, endpoint_template
+from lambda_cloud.rate_limit import RetryPolicy
+
+
+def make_response(status_code, body):
+    response = Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+# Mock the request function
+@pytest.fixture(autouse=True)
+def mock_request():
+    with patch("requests.Session.request") as mock:
+        mock.return_value = make_response(200, {"data": []})
+        yield mock
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def client(events):
+    return LambdaCloudClient(
+        "api_key",
+        rate_limiter=None,
+        retry_policy=RetryPolicy(backoff=0),
+        cache=ResponseCache(),
+        hooks=RequestHooks(events.append),
+    )
+
+
+# Test the request hooks and the MetricsCollector class
+class TestRequestHooks:
+    def test_event_per_call(self, client, events, mock_request):
+        mock_request.side_effect = [make_response(429, {}), make_response(200, {"data": {"id": "a"}})]
+        client.instances.get_instance("0920582c7ff041399e34823a0be62549")
+
+        (event,) = events
+        assert event.method == "GET"
+        assert event.endpoint == "/v1/instances/{id}"
+        assert event.status_code == 200
+        assert event.retries == 1
+        assert event.throttled == 1
+        assert event.bytes_received == len(b'{"data": {"id": "a"}}')
+        assert event.duration >= 0
+        assert not event.cache_hit
+
+    def test_cache_hits_and_bytes_sent(self, client, events):
+        client.ssh_keys.get_ssh_keys()
+        client.ssh_keys.get_ssh_keys()
+        client.ssh_keys.add_ssh_key("new-key", "ssh-ed25519 AAAA")
+
+        assert [event.cache_hit for event in events] == [False, True, False]
+        assert events[2].bytes_sent == len(json.dumps({"name": "new-key", "public_key": "ssh-ed25519 AAAA"}))
+
+    def test_errors_are_reported(self, client, events, mock_request):
+        mock_request.return_value = make_response(404, {})
+        with pytest.raises(HTTPError):
+            client.instances.get_instance("missing")
+
+        mock_request.side_effect = ConnectionError("refused")
+        with pytest.raises(ConnectionError):
+            client.instances.get_all_instances()
+
+        assert [event.status_code for event in events] == [404, None]
+        assert all(isinstance(event.error, Exception) for event in events)
+
+    def test_failing_hook_does_not_break_call(self):
+        def broken(event):
+            raise RuntimeError("exporter down")
+
+        client = LambdaCloudClient("api_key", rate_limiter=None, hooks=RequestHooks(broken))
+
+        assert client.file_systems.get_file_systems() == {"data": []}
+
+    def test_empty_registry_is_falsy(self):
+        hooks = RequestHooks()
+        assert not hooks
+        callback = hooks.add(print)
+        assert hooks
+        hooks.remove(callback)
+        assert len(hooks) == 0
+
+    def test_endpoint_template(self):
+        assert endpoint_template("/v1/ssh-keys/abc") == "/v1/ssh-keys/{id}"
+        assert endpoint_template("/v1/ssh-keys") == "/v1/ssh-keys"
+
+
+class TestMetricsCollector:
+    def test_snapshot(self):
+        collector = MetricsCollector(buckets=(0.1, 1.0))
+        collector(RequestEvent("GET", "/v1/instances", 200, 0.05, bytes_received=100))
+        collector(RequestEvent("GET", "/v1/instances", 200, 0.5, retries=2, throttled=2, bytes_received=100))
+        collector(RequestEvent("GET", "/v1/instances", None, 0.0, cache_hit=True))
+
+        snapshot = collector.snapshot()
+
+        assert snapshot["requests"] == {"GET /v1/instances": {"200": 2, "cache": 1}}
+        assert snapshot["counters"]["GET /v1/instances"] == {
+            "retries": 2,
+            "throttled": 2,
+            "bytes_received": 200,
+            "cache_hits": 1,
+        }
+        latency = snapshot["latency_seconds"]["GET /v1/instances"]
+        assert latency["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 2}
+        assert latency["sum"] == pytest.approx(0.55)
+
+    def test_prometheus_exposition(self):
+        collector = MetricsCollector(buckets=(0.1,))
+        collector(RequestEvent("POST", "/v1/instance-operations/launch", 429, 2.0, throttled=1))
+
+        text = collector.to_prometheus()
+
+        assert "# TYPE lambda_cloud_requests_total counter" in text
+        assert (
+            'lambda_cloud_requests_total{method="POST",endpoint="/v1/instance-operations/launch",status="429"} 1'
+            in text
+        )
+        assert 'lambda_cloud_request_duration_seconds_bucket{method="POST",endpoint="/v1/instance-operations/launch",le="0.1"} 0' in text
+        assert 'lambda_cloud_request_duration_seconds_count{method="POST",endpoint="/v1/instance-operations/launch"} 1' in text
+        assert 'lambda_cloud_throttled_total{method="POST",endpoint="/v1/instance-operations/launch"} 1' in text
+
+    def test_collects_from_client(self):
+        collector = MetricsCollector()
+        client = LambdaCloudClient("api_key", rate_limiter=None, hooks=RequestHooks(collector))
+        client.instances.get_all_instances()
+        client.ssh_keys.get_ssh_keys()
+
+        assert collector.snapshot()["requests"] == {"GET /v1/instances": {"200": 1}, "GET /v1/ssh-keys": {"200": 1}}
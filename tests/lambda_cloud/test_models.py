@@ -0,0 +1,145 @@
+import json
+import sys
+
+import pytest
+from requests.models import Response
+from unittest.mock import patch
+from lambda_cloud.cache import ResponseCache
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.models import FileSystem, Instance, InstanceType, ModelList, Region, SshKey
+
+INSTANCE = {
+    "id": "0920582c7ff041399e34823a0be62549",
+    "name": "training-node-1",
+    "ip": "10.10.10.1",
+    "status": "active",
+    "ssh_key_names": ["macbook-pro"],
+    "file_system_names": ["shared-fs"],
+    "region": {"name": "us-tx-1", "description": "Austin, Texas"},
+    "instance_type": {
+        "name": "gpu_8x_a100",
+        "description": "8x A100 (40 GB SXM4)",
+        "price_cents_per_hour": 880,
+        "specs": {"vcpus": 124, "memory_gib": 1800, "storage_gib": 6000},
+    },
+    "hostname": "10-0-8-196.cloud.lambdalabs.com",
+    "jupyter_token": "53968f128c4a4489b688c2c0a181d083",
+    "jupyter_url": "https://jupyter-3ac4c5c6-9026-47d2-9a33-71efccbcd0ee.lambdaspaces.com/?token=53968f128c4a4489b688c2c0a181d083",
+}
+
+
+def make_response(body):
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+# Mock the request function
+@pytest.fixture(autouse=True)
+def mock_request():
+    with patch("requests.Session.request") as mock:
+        yield mock
+
+
+# Test the response models
+class TestModels:
+    def test_instance_fields(self):
+        instance = Instance(INSTANCE)
+
+        assert instance.id == INSTANCE["id"]
+        assert instance.ssh_key_names == ("macbook-pro",)
+        assert instance.region == Region("us-tx-1", "Austin, Texas")
+        assert instance.instance_type.gpus == 8
+        assert instance.instance_type.memory_gib == 1800
+        assert instance.to_dict() == INSTANCE
+
+    def test_nested_fields_are_decoded_lazily_and_shared(self):
+        first, second = Instance(INSTANCE), Instance(dict(INSTANCE, id="other"))
+
+        assert isinstance(object.__getattribute__(first, "_region"), dict)
+        assert first.region is second.region
+        assert first.instance_type is second.instance_type
+        assert not isinstance(object.__getattribute__(first, "_region"), dict)
+
+    def test_models_are_immutable_and_slotted(self):
+        instance = Instance(INSTANCE)
+
+        with pytest.raises(AttributeError):
+            instance.status = "terminated"
+        with pytest.raises(AttributeError):
+            del instance.name
+        assert not hasattr(instance, "__dict__")
+
+    def test_smaller_than_dicts(self):
+        assert sys.getsizeof(Instance(INSTANCE)) < sys.getsizeof(dict(INSTANCE))
+
+    def test_model_list_converts_on_access(self):
+        records = [dict(INSTANCE, id=str(index)) for index in range(3)]
+        listing = ModelList(records, Instance)
+
+        assert len(listing) == 3
+        assert listing[1].id == "1"
+        assert isinstance(listing._items[0], dict)
+        assert listing[1] is listing[1]
+        assert [item.id for item in listing[1:]] == ["1", "2"]
+        assert list(listing.by_id()) == ["0", "1", "2"]
+        assert listing.to_dicts() == records
+        # the records handed in are left alone
+        assert all(isinstance(record, dict) for record in records)
+
+
+class TestClientModels:
+    def test_get_all_instances(self, mock_request):
+        mock_request.return_value = make_response({"data": [INSTANCE]})
+
+        client = LambdaCloudClient("api_key", rate_limiter=None, cache=ResponseCache({"/v1/instances": 5}))
+        listing = client.instances.get_all_instances(models=True)
+
+        assert isinstance(listing, ModelList)
+        assert listing[0].name == "training-node-1"
+        # the cache keeps the plain response for callers who want dicts
+        assert client.instances.get_all_instances() == {"data": [INSTANCE]}
+        assert mock_request.call_count == 1
+
+    def test_get_instance_and_types(self, mock_request):
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+
+        mock_request.return_value = make_response({"data": INSTANCE})
+        assert client.instances.get_instance(INSTANCE["id"], models=True) == Instance(INSTANCE)
+
+        mock_request.return_value = make_response(
+            {
+                "data": {
+                    "gpu_8x_a100": {
+                        "instance_type": INSTANCE["instance_type"],
+                        "regions_with_capacity_available": [INSTANCE["region"]],
+                    }
+                }
+            }
+        )
+        instance_types = client.instances.get_instance_types(models=True)
+        assert isinstance(instance_types["gpu_8x_a100"], InstanceType)
+        assert instance_types["gpu_8x_a100"].regions_with_capacity_available == (Region("us-tx-1", "Austin, Texas"),)
+
+    def test_ssh_keys_and_file_systems(self, mock_request):
+        client = LambdaCloudClient("api_key", rate_limiter=None)
+
+        mock_request.return_value = make_response({"data": [{"id": "key", "name": "macbook-pro", "public_key": "AAAA"}]})
+        (ssh_key,) = client.ssh_keys.get_ssh_keys(models=True)
+        assert ssh_key == SshKey({"id": "key", "name": "macbook-pro", "public_key": "AAAA"})
+
+        file_system = {
+            "id": "0920582c7ff041399e34823a0be62547",
+            "name": "shared-fs",
+            "created": "2023-02-24T20:48:56+00:00",
+            "created_by": {"id": "0920582c7ff041399e34823a0be62548", "email": "test@example.com"},
+            "mount_point": "/home/ubuntu/shared-fs",
+            "region": INSTANCE["region"],
+            "is_in_use": True,
+        }
+        mock_request.return_value = make_response({"data": [file_system]})
+        (model,) = client.file_systems.get_file_systems(models=True)
+        assert isinstance(model, FileSystem)
+        assert model.created_by["email"] == "test@example.com"
+        assert model.to_dict() == file_system
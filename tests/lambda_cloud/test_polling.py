@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import patch
+from lambda_cloud.polling import AdaptiveInterval, StatusWaiter
+
+
+# Test the AdaptiveInterval class
+class TestAdaptiveInterval:
+    def test_grows_and_resets(self):
+        interval = AdaptiveInterval(minimum=1, maximum=3, factor=2)
+
+        assert interval.next(changed=False) == 2
+        assert interval.next(changed=False) == 3
+        assert interval.next(changed=False) == 3
+        assert interval.next(changed=True) == 1
+
+    def test_invalid_bounds(self):
+        with pytest.raises(ValueError):
+            AdaptiveInterval(minimum=5, maximum=1)
+
+
+# Test the StatusWaiter class
+class TestStatusWaiter:
+    def test_done_when_all_reach_status(self):
+        waiter = StatusWaiter(["a", "b"], "active", timeout=60)
+
+        assert not waiter.update([{"id": "a", "status": "active"}, {"id": "b", "status": "booting"}])
+        assert waiter.pending == {"b"}
+        assert waiter.update([{"id": "a", "status": "active"}, {"id": "b", "status": "active"}])
+        assert set(waiter.reached) == {"a", "b"}
+
+    def test_missing_instance_counts_as_terminated(self):
+        waiter = StatusWaiter(["a"], "terminated", timeout=60)
+
+        assert waiter.update([])
+        assert waiter.reached == {"a": {"id": "a", "status": "terminated"}}
+
+    def test_fails_fast_when_status_is_unreachable(self):
+        waiter = StatusWaiter(["a"], "active", timeout=60)
+
+        with pytest.raises(RuntimeError):
+            waiter.update([{"id": "a", "status": "terminating"}])
+
+    def test_interval_resets_on_change(self):
+        waiter = StatusWaiter(["a"], "active", timeout=60, interval=AdaptiveInterval(1, 10, 2))
+        waiter.update([{"id": "a", "status": "booting"}])
+        assert waiter.next_interval() == 2
+        waiter.update([{"id": "a", "status": "unhealthy"}])
+        assert waiter.next_interval() == 1
+
+    def test_shared_interval_is_left_alone(self):
+        interval = AdaptiveInterval(1, 10, 2)
+        waiters = [StatusWaiter([instance_id], "active", timeout=60, interval=interval) for instance_id in "ab"]
+        for waiter in waiters:
+            waiter.update([])
+
+        assert [waiter.next_interval() for waiter in waiters] == [2, 2]
+        assert interval.current == 1
+
+    def test_timeout(self):
+        with patch("lambda_cloud.polling.time.monotonic", return_value=0):
+            waiter = StatusWaiter(["a"], "active", timeout=5)
+        waiter.update([])
+        with patch("lambda_cloud.polling.time.monotonic", return_value=4):
+            assert waiter.next_interval() == 1
+        with patch("lambda_cloud.polling.time.monotonic", return_value=6):
+            with pytest.raises(TimeoutError):
+                waiter.next_interval()
@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.pool import ClientPool, PoolError
+from lambda_cloud.rate_limit import RateLimiter
+from lambda_cloud.testing import FakeLambdaCloud
+
+
+@pytest.fixture
+def fakes():
+    with FakeLambdaCloud(seed=1) as first, FakeLambdaCloud(seed=2) as second:
+        yield {"research": first, "production": second}
+
+
+@pytest.fixture
+def pool(fakes):
+    clients = {
+        name: LambdaCloudClient(f"{name}-token", base_url=fake.base_url, rate_limiter=None)
+        for name, fake in fakes.items()
+    }
+    with ClientPool(clients) as pool:
+        yield pool
+
+
+# Test the ClientPool class
+class TestClientPool:
+    def test_listings_are_merged(self, fakes, pool):
+        fakes["research"].seed_instances(2)
+        fakes["production"].seed_instances(3)
+
+        assert len(pool.get_all_instances()["data"]) == 5
+        by_account = pool.get_all_instances(by_account=True)
+        assert {name: len(records) for name, records in by_account.items()} == {"research": 2, "production": 3}
+
+    def test_listings_are_fetched_concurrently(self, pool):
+        # each listing waits for the other to start, so a sequential gather breaks the barrier
+        barrier = threading.Barrier(len(pool.accounts), timeout=5)
+
+        def together(listing):
+            def wait_then_list():
+                barrier.wait()
+                return listing()
+
+            return wait_then_list
+
+        for client in pool.clients.values():
+            client.ssh_keys.get_ssh_keys = together(client.ssh_keys.get_ssh_keys)
+
+        assert pool.get_ssh_keys() == {"data": []}
+        assert not barrier.broken
+
+    def test_catalog_reads_take_turns(self, fakes, pool):
+        for _ in range(4):
+            pool.get_instance_types(fresh=True)
+
+        assert [fake.calls["GET /v1/instance-types"] for fake in fakes.values()] == [2, 2]
+
+    def test_writes_go_to_the_owner(self, fakes, pool):
+        research = fakes["research"].seed_instances(3)
+        production = fakes["production"].seed_instances(1)
+
+        result = pool.terminate_instance([research[0], production[0], research[1]])
+
+        assert len(result["data"]["terminated_instances"]) == 3
+        assert [fake.calls["POST /v1/instance-operations/terminate"] for fake in fakes.values()] == [1, 1]
+        # unseen ids cost one round of listings, then owners are known
+        assert [fake.calls["GET /v1/instances"] for fake in fakes.values()] == [1, 1]
+        assert pool.owner(production[0]) == "production"
+        assert pool.get_instance(research[2])["data"]["id"] == research[2]
+        assert [fake.calls["GET /v1/instances"] for fake in fakes.values()] == [1, 1]
+
+    def test_failed_account_keeps_the_others_results(self, fakes, pool):
+        research = fakes["research"].seed_instances(2)
+        production = fakes["production"].seed_instances(1)
+        fakes["production"].fail_next(400, path="/v1/instance-operations/terminate")
+
+        with pytest.raises(PoolError) as raised:
+            pool.terminate_instance(research + production)
+
+        terminated = raised.value.results["data"]["terminated_instances"]
+        assert {record["id"] for record in terminated} == set(research)
+        assert list(raised.value.failures) == ["production"]
+        assert fakes["production"].instances[production[0]]["status"] == "active"
+
+    def test_failed_ssh_key_add_keeps_the_added_keys(self, fakes, pool):
+        fakes["research"].fail_next(400, path="/v1/ssh-keys")
+
+        with pytest.raises(PoolError) as raised:
+            pool.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+
+        (added,) = raised.value.results.values()
+        assert list(raised.value.results) == ["production"]
+        assert list(raised.value.failures) == ["research"]
+        assert pool.owner(added["id"]) == "production"
+        # the key is known where it was added, so launches need no listing
+        pool.launch_instance("us-tx-1", "gpu_1x_a10", ["macbook-pro"])
+        assert [fake.calls["GET /v1/ssh-keys"] for fake in fakes.values()] == [0, 0]
+
+    def test_unknown_ids_raise(self, pool):
+        with pytest.raises(KeyError):
+            pool.restart_instance(["0920582c7ff041399e34823a0be62549"])
+
+    def test_launch_uses_an_account_holding_the_key(self, fakes, pool):
+        pool.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user", account="production")
+
+        launched = pool.launch_instance("us-tx-1", "gpu_1x_a10", ["macbook-pro"], quantity=2)
+        instance_ids = launched["data"]["instance_ids"]
+
+        assert set(instance_ids) == set(fakes["production"].instances)
+        assert {pool.owner(instance_id) for instance_id in instance_ids} == {"production"}
+        with pytest.raises(ValueError):
+            pool.launch_instance("us-tx-1", "gpu_1x_a10", ["laptop"])
+
+    def test_ssh_keys_added_everywhere_and_deleted_at_the_owner(self, fakes, pool):
+        added = pool.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+
+        assert set(added) == {"research", "production"}
+        pool.delete_ssh_keys(added["research"]["id"])
+        assert not fakes["research"].ssh_keys
+        assert len(fakes["production"].ssh_keys) == 1
+
+    def test_from_tokens(self, fakes):
+        with ClientPool.from_tokens(["a", "b"], base_url=fakes["research"].base_url) as pool:
+            assert pool.accounts == ["account-0", "account-1"]
+            assert pool.clients["account-0"].rate_limiter is not pool.clients["account-1"].rate_limiter
+        with pytest.raises(ValueError):
+            ClientPool.from_tokens(["a"], rate_limiter=RateLimiter())
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+from requests import HTTPError
+from requests.models import Response
+from unittest.mock import patch
+from lambda_cloud.instances import LambdaCloudInstance
+from lambda_cloud.rate_limit import RateLimiter, RetryPolicy, TokenBucket, retry_after
+
+
+def make_response(status_code, body=None, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode("utf-8")
+    response.headers.update(headers or {})
+    return response
+
+
+# Mock the request function
+@pytest.fixture(autouse=True)
+def mock_request():
+    with patch("requests.Session.request") as mock:
+        yield mock
+
+
+# Mock the sleep function
+@pytest.fixture(autouse=True)
+def mock_sleep():
+    with patch("lambda_cloud.base.time.sleep") as mock:
+        yield mock
+
+
+# Test the rate limiting and retry helpers
+class TestTokenBucket:
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5, abs=0.01)
+        assert bucket.reserve() == pytest.approx(1.0, abs=0.01)
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0, capacity=1)
+
+    def test_try_acquire_and_wait_time(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert bucket.wait_time() == pytest.approx(0.5, abs=0.01)
+
+
+class TestRateLimiter:
+    def test_path_limit_is_stricter(self):
+        limiter = RateLimiter(rate=100, burst=100, path_limits={"/v1/instance-operations/launch": (0.1, 1)})
+
+        assert limiter.reserve("/v1/instance-operations/launch") == 0
+        assert limiter.reserve("/v1/instances") == 0
+        assert limiter.reserve("/v1/instance-operations/launch") == pytest.approx(10, abs=0.01)
+
+    def test_hold_delays_every_path(self):
+        limiter = RateLimiter(rate=100, burst=100)
+        limiter.hold(3)
+
+        assert limiter.reserve("/v1/ssh-keys") == pytest.approx(3, abs=0.01)
+
+    def test_refused_try_acquire_takes_no_token(self):
+        limiter = RateLimiter(rate=0.01, burst=1, path_limits={"/v1/instance-operations/launch": (0.1, 1)})
+        assert limiter.try_acquire("/v1/instances")
+
+        assert not limiter.try_acquire("/v1/instance-operations/launch")
+        # the launch slot refused above is still free
+        assert limiter.path_buckets["/v1/instance-operations/launch"].wait_time() == 0
+
+
+class TestRetryPolicy:
+    def test_honours_retry_after(self):
+        policy = RetryPolicy()
+        response = make_response(429, headers={"Retry-After": "7"})
+
+        assert policy.next_delay("POST", response, retries=0, elapsed=0) == 7
+
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(backoff=1, max_backoff=4)
+        response = make_response(429)
+
+        for retries in range(5):
+            assert 0 <= policy.next_delay("POST", response, retries, elapsed=0) <= min(4, 2**retries)
+
+    def test_gives_up_past_deadline_or_retries(self):
+        policy = RetryPolicy(max_retries=2, deadline=10)
+        response = make_response(429, headers={"Retry-After": "5"})
+
+        assert policy.next_delay("GET", response, retries=0, elapsed=6) is None
+        assert policy.next_delay("GET", response, retries=2, elapsed=0) is None
+
+    def test_server_errors_only_retried_for_get(self):
+        policy = RetryPolicy(backoff=0)
+        response = make_response(503)
+
+        assert policy.next_delay("GET", response, retries=0, elapsed=0) == 0
+        assert policy.next_delay("POST", response, retries=0, elapsed=0) is None
+
+    def test_retry_after_http_date(self):
+        response = make_response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+
+        assert retry_after(response) == 0
+
+
+class TestRetries:
+    def test_any_endpoint_retries_429(self, mock_request, mock_sleep):
+        ssh_response = {"data": []}
+        mock_request.side_effect = [
+            make_response(429, headers={"Retry-After": "2"}),
+            make_response(200, ssh_response),
+        ]
+
+        lambda_cloud_instance = LambdaCloudInstance("api_key", rate_limiter=RateLimiter(rate=100, burst=100))
+        result = lambda_cloud_instance.get_all_instances()
+
+        assert result == ssh_response
+        assert mock_request.call_count == 2
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args[0][0] == pytest.approx(2, abs=0.01)
+
+    def test_gives_up_with_http_error(self, mock_request):
+        mock_request.return_value = make_response(429)
+
+        lambda_cloud_instance = LambdaCloudInstance(
+            "api_key", rate_limiter=None, retry_policy=RetryPolicy(max_retries=3, backoff=0)
+        )
+        with pytest.raises(HTTPError):
+            lambda_cloud_instance.get_instance_types()
+        assert mock_request.call_count == 4
+
+    def test_retries_disabled(self, mock_request):
+        mock_request.return_value = make_response(429)
+
+        lambda_cloud_instance = LambdaCloudInstance("api_key", rate_limiter=None, retry_policy=None)
+        with pytest.raises(HTTPError):
+            lambda_cloud_instance.get_instance_types()
+        assert mock_request.call_count == 1
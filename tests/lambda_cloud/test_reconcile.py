@@ -0,0 +1,126 @@
+import pytest
+from lambda_cloud.reconcile import DesiredState, Launch, Reconciler
+
+WRITES = (
+    "POST /v1/ssh-keys",
+    "POST /v1/instance-operations/launch",
+    "POST /v1/instance-operations/terminate",
+    "POST /v1/instance-operations/restart",
+)
+
+
+def desired(a10=2, a100=1):
+    instances = {("gpu_1x_a10", "us-tx-1"): a10, ("gpu_1x_a100", "us-west-1"): a100}
+    return DesiredState(instances, ssh_keys={"macbook-pro": "ssh-ed25519 AAAA user"}, name="training")
+
+
+def writes(fake):
+    return {call: fake.calls[call] for call in WRITES if fake.calls[call]}
+
+
+# Test the Reconciler class
+class TestReconciler:
+    def test_plan_from_empty_account(self, client):
+        plan = Reconciler(client).plan(desired())
+
+        assert plan.ssh_keys == [("macbook-pro", "ssh-ed25519 AAAA user")]
+        assert plan.launches == [Launch("gpu_1x_a10", "us-tx-1", 2), Launch("gpu_1x_a100", "us-west-1", 1)]
+        assert plan.requests == 3
+        assert plan.summary()[:2] == ["+ ssh key macbook-pro", "+ launch 2 gpu_1x_a10 in us-tx-1"]
+
+    def test_apply_then_nothing_left_to_do(self, fake, client):
+        reconciler = Reconciler(client)
+
+        result = reconciler.reconcile(desired())
+
+        assert result.ok
+        assert len(result.launched[("gpu_1x_a10", "us-tx-1")]) == 2
+        assert writes(fake) == {"POST /v1/ssh-keys": 1, "POST /v1/instance-operations/launch": 2}
+        assert not reconciler.plan(desired())
+
+    def test_scale_down_and_restart_in_single_batches(self, fake, client):
+        reconciler = Reconciler(client)
+        reconciler.reconcile(desired(a10=4, a100=2))
+        records = client.instances.get_all_instances()["data"]
+        a10 = [record["id"] for record in records if record["instance_type"]["name"] == "gpu_1x_a10"]
+        a100 = [record["id"] for record in records if record["instance_type"]["name"] == "gpu_1x_a100"]
+        for instance_id in (a10[2], a100[0], a100[1]):
+            fake.set_instance_status(instance_id, "unhealthy")
+
+        plan = reconciler.plan(desired(a10=1, a100=2))
+
+        # the unhealthy A10 goes first; the unhealthy A100s are still wanted, so they are restarted
+        assert plan.terminate[0] == a10[2]
+        assert len(plan.terminate) == 3 and set(plan.terminate) < set(a10)
+        assert sorted(plan.restart) == sorted(a100)
+        assert plan.launches == []
+        result = reconciler.apply(plan)
+        assert result.ok
+        assert writes(fake)["POST /v1/instance-operations/terminate"] == 1
+        assert writes(fake)["POST /v1/instance-operations/restart"] == 1
+
+    def test_instances_outside_the_spec_are_left_alone(self, fake, client):
+        fake.seed_instances(3)
+
+        plan = Reconciler(client).plan(desired(a10=0, a100=0))
+
+        assert not plan.terminate
+        # without a name, every instance of the account is managed
+        assert len(Reconciler(client).plan(DesiredState({})).terminate) == 3
+
+    def test_dry_run_sends_nothing(self, fake, client):
+        result = Reconciler(client).reconcile(desired(), dry_run=True)
+
+        assert result.dry_run
+        assert result.plan.requests == 3
+        assert writes(fake) == {}
+
+    def test_launch_failures_are_reported(self, fake, client):
+        fake.capacity["gpu_1x_a100"]["us-west-1"] = 0
+
+        result = Reconciler(client).reconcile(desired())
+
+        assert not result.ok
+        assert [operation for operation, _ in result.errors] == ["launch 1 gpu_1x_a100 in us-west-1"]
+        assert len(result.launched[("gpu_1x_a10", "us-tx-1")]) == 2
+
+    def test_failed_ssh_key_skips_only_the_launches(self, fake, client):
+        reconciler = Reconciler(client)
+        reconciler.reconcile(desired(a10=3, a100=0))
+        state = DesiredState(
+            {("gpu_1x_a10", "us-tx-1"): 1, ("gpu_1x_a100", "us-west-1"): 1},
+            ssh_keys={"desktop": "ssh-ed25519 BBBB user"},
+            name="training",
+        )
+        plan = reconciler.plan(state)
+        fake.fail_next(400, path="/v1/ssh-keys")
+
+        result = reconciler.apply(plan)
+
+        assert [operation for operation, _ in result.errors] == [
+            "add ssh key desktop",
+            "launch 1 gpu_1x_a100 in us-west-1",
+        ]
+        assert result.errors[1][1] is result.errors[0][1]
+        assert len(result.terminated) == 2
+        # only the launch of the first reconcile went out
+        assert writes(fake)["POST /v1/instance-operations/launch"] == 1
+
+    def test_from_dict(self):
+        state = DesiredState.from_dict(
+            {
+                "name": "training",
+                "ssh_keys": {"macbook-pro": None},
+                "instances": [
+                    {"instance_type": "gpu_1x_a10", "region": "us-tx-1", "count": 2},
+                    {"instance_type": "gpu_1x_a10", "region": "us-tx-1"},
+                ],
+            }
+        )
+
+        assert state.instances == {("gpu_1x_a10", "us-tx-1"): 3}
+        assert state.launch_ssh_key == "macbook-pro"
+
+    def test_launch_needs_an_ssh_key(self, client):
+        with pytest.raises(ValueError):
+            Reconciler(client).plan(DesiredState({("gpu_1x_a10", "us-tx-1"): 1}))
@@ -0,0 +1,236 @@
+import asyncio
+import time
+
+import pytest
+from requests import HTTPError, Timeout
+from lambda_cloud.bulk import BulkOperations
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.fleet import FleetLauncher
+from lambda_cloud.resilience import CircuitBreaker, CircuitOpenError, HedgePolicy
+
+
+def make_client(fake, **kwargs):
+    return LambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=None, retry_policy=None, **kwargs)
+
+
+# Test the HedgePolicy class and hedged reads
+class TestHedging:
+    def test_delay_follows_percentile(self):
+        hedging = HedgePolicy(percentile=0.9, min_delay=0.0, min_samples=10)
+        for latency in range(1, 10):
+            hedging.record("/v1/instances/abc", latency / 100)
+
+        assert hedging.delay("/v1/instances/abc") is None
+        hedging.record("/v1/instances/def", 0.1)
+        assert hedging.delay("/v1/instances/ghi") == pytest.approx(0.1)
+        assert hedging.delay("/v1/instances") is None
+
+    def test_slow_read_is_hedged(self, fake):
+        fake.seed_instances(2)
+        hedging = HedgePolicy(min_samples=5, min_delay=0.05, budget=1.0)
+        with make_client(fake, hedging=hedging) as client:
+            for _ in range(5):
+                client.instances.get_all_instances()
+            fake.stall_next(2.0, path="/v1/instances")
+
+            listing = client.instances.get_all_instances()
+
+        assert len(listing["data"]) == 2
+        # the duplicate answered while the original was still stalled
+        assert hedging.stats()["hedged"] == 1
+        assert hedging.stats()["hedge_wins"] == 1
+
+    def test_budget_limits_hedges(self, fake):
+        hedging = HedgePolicy(min_samples=5, min_delay=0.05, budget=0.0)
+        with make_client(fake, hedging=hedging) as client:
+            for _ in range(5):
+                client.instances.get_all_instances()
+            fake.stall_next(0.3, path="/v1/instances")
+
+            started = time.monotonic()
+            client.instances.get_all_instances()
+
+        assert time.monotonic() - started >= 0.3
+        assert fake.calls["GET /v1/instances"] == 6
+        assert hedging.stats()["hedged"] == 0
+
+    def test_writes_are_never_hedged(self, fake):
+        hedging = HedgePolicy(min_samples=1, min_delay=0.0, budget=1.0)
+        with make_client(fake, hedging=hedging) as client:
+            client.ssh_keys.get_ssh_keys()
+            client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+            fake.stall_next(0.2, path="/v1/ssh-keys")
+            client.ssh_keys.add_ssh_key("laptop", "ssh-ed25519 BBBB user")
+
+        assert fake.calls["POST /v1/ssh-keys"] == 2
+        assert len(fake.ssh_keys) == 2
+
+    def test_async_slow_read_is_hedged(self, fake):
+        pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        hedging = HedgePolicy(min_samples=5, min_delay=0.05, budget=1.0)
+
+        async def run():
+            async with AsyncLambdaCloudClient(
+                "api_key", base_url=fake.base_url, rate_limiter=None, hedging=hedging
+            ) as client:
+                for _ in range(5):
+                    await client.instances.get_all_instances()
+                fake.stall_next(2.0, path="/v1/instances")
+                return await client.instances.get_all_instances()
+
+        assert asyncio.run(run())["data"] == []
+        assert hedging.stats()["hedged"] == 1
+        assert hedging.stats()["hedge_wins"] == 1
+
+
+# Test per-endpoint timeouts and the CircuitBreaker class
+class TestCircuitBreaker:
+    def test_timeouts_per_endpoint(self, fake):
+        (instance_id,) = fake.seed_instances(1)
+        fake.stall_next(0.3, count=2)
+        with make_client(fake, timeouts={"/v1/instances/{id}": 0.1}) as client:
+            with pytest.raises(Timeout):
+                client.instances.get_instance(instance_id)
+            assert len(client.instances.get_all_instances()["data"]) == 1
+
+    def test_opens_after_consecutive_failures(self, fake):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        fake.fail_next(503, count=10)
+        with make_client(fake, circuit_breaker=breaker) as client:
+            for _ in range(3):
+                with pytest.raises(HTTPError):
+                    client.instances.get_all_instances()
+            with pytest.raises(CircuitOpenError) as raised:
+                client.ssh_keys.get_ssh_keys()
+
+        assert raised.value.retry_in > 50
+        assert fake.calls["GET /v1/ssh-keys"] == 0
+        assert breaker.stats()["state"] == "open"
+        assert breaker.stats()["rejected"] == 1
+
+    def test_client_errors_do_not_open(self, fake):
+        breaker = CircuitBreaker(failure_threshold=1)
+        with make_client(fake, circuit_breaker=breaker) as client:
+            with pytest.raises(HTTPError):
+                client.instances.get_instance("missing")
+
+        assert breaker.state == "closed"
+
+    def test_serves_last_good_read_while_open(self, fake):
+        fake.seed_instances(2)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        with make_client(fake, circuit_breaker=breaker) as client:
+            listing = client.instances.get_all_instances()
+            fake.fail_next(503)
+            with pytest.raises(HTTPError):
+                client.ssh_keys.get_ssh_keys()
+
+            assert client.instances.get_all_instances() is listing
+            with pytest.raises(CircuitOpenError):
+                client.file_systems.get_file_systems()
+
+        assert fake.calls["GET /v1/instances"] == 1
+        assert breaker.stats()["served_stale"] == 1
+
+    def test_timeouts_count_as_failures(self, fake):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        fake.stall_next(0.3)
+        with make_client(fake, timeout=0.1, circuit_breaker=breaker) as client:
+            with pytest.raises(Timeout):
+                client.instances.get_all_instances()
+            with pytest.raises(CircuitOpenError):
+                client.instances.get_all_instances()
+
+    def test_trial_request_closes_after_reset_timeout(self, fake):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05, serve_stale=False)
+        fake.fail_next(503)
+        with make_client(fake, circuit_breaker=breaker) as client:
+            with pytest.raises(HTTPError):
+                client.instances.get_all_instances()
+            time.sleep(0.06)
+            assert breaker.state == "half-open"
+
+            client.instances.get_all_instances()
+
+        assert breaker.state == "closed"
+        assert breaker.stats()["opened"] == 1
+
+    def test_cancelled_trial_is_released(self, fake):
+        pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2, serve_stale=False)
+        fake.fail_next(503)
+
+        async def run():
+            # without coalescing, so the cancelled caller's own request is the trial
+            async with AsyncLambdaCloudClient(
+                "api_key",
+                base_url=fake.base_url,
+                rate_limiter=None,
+                retry_policy=None,
+                single_flight=None,
+                circuit_breaker=breaker,
+            ) as client:
+                with pytest.raises(HTTPError):
+                    await client.instances.get_all_instances()
+                await asyncio.sleep(0.25)
+                fake.stall_next(1.0)
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(client.instances.get_all_instances(), 0.05)
+                # well within reset_timeout of the cancelled trial, so only a released trial lets this through
+                await client.instances.get_all_instances()
+
+        asyncio.run(run())
+
+        assert breaker.state == "closed"
+        assert breaker.stats()["rejected"] == 0
+
+    def test_unreleased_trial_expires(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        assert breaker.allow()
+        assert not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+
+    def test_only_the_trial_holder_releases_it(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        assert breaker.admit() == 0
+        breaker.record_failure()
+        time.sleep(0.06)
+        expired = breaker.admit()
+        time.sleep(0.06)
+        trial = breaker.admit()
+
+        # a request sent while closed, and a trial that expired, end without an answer
+        breaker.release(0)
+        breaker.release(expired)
+        assert expired and trial and trial != expired
+        assert not breaker.allow()
+        breaker.release(trial)
+        assert breaker.allow()
+
+    def test_bulk_and_fleet_report_an_open_circuit(self, fake):
+        instance_ids = fake.seed_instances(3)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        with make_client(fake, circuit_breaker=breaker) as client:
+            launcher = FleetLauncher(client.instances)
+            candidates = launcher.candidates(["gpu_1x_a10", "gpu_8x_a100"])
+            breaker.record_failure()
+
+            terminated = BulkOperations(client.instances, batch_size=2).terminate(instance_ids)
+            # the catalog is served from the last good answer, the launches are held back
+            launched = launcher.launch(8, ["gpu_1x_a10", "gpu_8x_a100"], ["macbook-pro"])
+
+        assert set(terminated.failed) == set(instance_ids)
+        assert all(isinstance(error, CircuitOpenError) for error in terminated.failed.values())
+        assert terminated.requests == 2
+        assert candidates and not launched.launches
+        assert all(isinstance(failure.error, CircuitOpenError) for failure in launched.failures)
+        assert fake.calls["POST /v1/instance-operations/terminate"] == 0
+        assert fake.calls["POST /v1/instance-operations/launch"] == 0
@@ -0,0 +1,72 @@
+import pytest
+from lambda_cloud.cache import ResponseCache
+from lambda_cloud.selector import CatalogIndex, InstanceSelector
+
+CAPACITY = {
+    "gpu_1x_a10": {"us-east-1": 2},
+    "gpu_1x_a100": {"us-tx-1": 1, "us-west-1": 1},
+    "gpu_8x_a100": {"us-tx-1": 1},
+    "gpu_8x_h100_sxm5": {"us-east-1": 1, "us-tx-1": 1},
+}
+
+
+@pytest.fixture
+def fake_options():
+    return {"capacity": CAPACITY}
+
+
+@pytest.fixture
+def client_options():
+    return {"cache": ResponseCache()}
+
+
+# Test the CatalogIndex and InstanceSelector classes
+class TestInstanceSelector:
+    def test_cheapest_fit(self, client):
+        selector = InstanceSelector(client.instances)
+
+        assert selector.cheapest().instance_type_name == "gpu_1x_a10"
+        assert selector.cheapest(min_gpus=2).instance_type_name == "gpu_8x_a100"
+        assert selector.cheapest(min_memory_gib=1000, regions=["us-east-1"]).instance_type_name == "gpu_8x_h100_sxm5"
+        assert selector.cheapest(gpu="h100").price_cents_per_hour == 2792
+        assert selector.cheapest(min_gpus=16) is None
+
+    def test_ranking_follows_price_then_region_preference(self, client):
+        candidates = InstanceSelector(client.instances).select(regions=["us-west-1", "us-tx-1"], max_price_cents=1100)
+
+        assert [(candidate.instance_type_name, candidate.region_name) for candidate in candidates] == [
+            ("gpu_1x_a100", "us-west-1"),
+            ("gpu_1x_a100", "us-tx-1"),
+            ("gpu_8x_a100", "us-tx-1"),
+        ]
+
+    def test_rank_per_gpu(self, client):
+        candidates = InstanceSelector(client.instances).select(per_gpu=True, regions=["us-tx-1"])
+
+        names = [candidate.instance_type_name for candidate in candidates]
+        assert names == ["gpu_1x_a100", "gpu_8x_a100", "gpu_8x_h100_sxm5"]
+
+    def test_candidates_launch_directly(self, client):
+        client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+        candidate = InstanceSelector(client.instances).cheapest(min_gpus=8)
+
+        launched = client.instances.launch_instance(ssh_key_names=["macbook-pro"], quantity=1, **candidate.launch_kwargs)
+
+        assert len(launched["data"]["instance_ids"]) == 1
+
+    def test_catalog_compiled_once_per_response(self, fake, client):
+        selector = InstanceSelector(client.instances)
+        index = selector.index()
+        for _ in range(100):
+            selector.cheapest(min_gpus=1)
+
+        assert selector.index() is index
+        assert fake.calls["GET /v1/instance-types"] == 1
+        client.cache.invalidate()
+        assert selector.index() is not index
+
+    def test_empty_catalog(self):
+        index = CatalogIndex({})
+
+        assert len(index) == 0
+        assert index.select(min_gpus=1) == []
@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+from lambda_cloud import ssh_key_index
+from lambda_cloud.ssh_key_index import SshKeyIndex, fingerprint
+
+LAPTOP_KEY = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIGxhcHRvcA== user@laptop"
+DESKTOP_KEY = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIGRlc2t0b3A= user@desktop"
+
+
+@pytest.fixture
+def index(client):
+    return SshKeyIndex(client.ssh_keys)
+
+
+# Test the fingerprint function
+class TestFingerprint:
+    def test_matches_ssh_keygen(self):
+        assert fingerprint("ssh-ed25519 AAAA") == "SHA256:cJ6AyISHokEeHuTfufIqhhSS0gxHZRUMDHlKvXD4FHw"
+        assert fingerprint(LAPTOP_KEY) == fingerprint(LAPTOP_KEY.rsplit(" ", 1)[0])
+
+    def test_malformed_keys_raise(self):
+        with pytest.raises(ValueError):
+            fingerprint("ssh-ed25519")
+        with pytest.raises(ValueError):
+            fingerprint("ssh-ed25519 not-base64!")
+
+
+# Test the SshKeyIndex class
+class TestSshKeyIndex:
+    def test_existing_key_is_resolved_from_the_index(self, fake, client, index):
+        added = client.ssh_keys.add_ssh_key("laptop", LAPTOP_KEY)["data"]
+
+        for _ in range(5):
+            assert index.ensure_ssh_key("laptop", LAPTOP_KEY)["id"] == added["id"]
+
+        assert fake.calls["GET /v1/ssh-keys"] == 1
+        assert fake.calls["POST /v1/ssh-keys"] == 1
+
+    def test_missing_key_is_added_and_indexed(self, fake, index):
+        record = index.ensure_ssh_key("laptop", LAPTOP_KEY)
+
+        assert index.ensure_ssh_key("laptop", LAPTOP_KEY) == record
+        assert [found["id"] for found in index.find(fingerprint(LAPTOP_KEY))] == [record["id"]]
+        assert fake.calls["GET /v1/ssh-keys"] == 1
+        assert fake.calls["POST /v1/ssh-keys"] == 1
+
+    def test_generated_private_key_is_not_kept(self, index):
+        record = index.ensure_ssh_key("generated")
+
+        assert "private_key" in record
+        assert "private_key" not in index.get("generated")
+
+    def test_another_public_key_raises_unless_replaced(self, fake, index):
+        old = index.ensure_ssh_key("laptop", LAPTOP_KEY)
+
+        with pytest.raises(ValueError):
+            index.ensure_ssh_key("laptop", DESKTOP_KEY)
+        new = index.ensure_ssh_key("laptop", DESKTOP_KEY, replace=True)
+
+        assert new["id"] != old["id"]
+        assert [record["public_key"] for record in fake.ssh_keys.values()] == [DESKTOP_KEY]
+        assert index.find(LAPTOP_KEY) == []
+
+    def test_key_added_elsewhere_is_found_on_conflict(self, fake, client, index):
+        index.refresh()
+        added = client.ssh_keys.add_ssh_key("laptop", LAPTOP_KEY)["data"]
+
+        assert index.ensure_ssh_key("laptop", LAPTOP_KEY)["id"] == added["id"]
+        assert fake.calls["GET /v1/ssh-keys"] == 2
+
+    def test_stale_index_refreshes_incrementally(self, client, index, monkeypatch):
+        client.ssh_keys.add_ssh_key("laptop", LAPTOP_KEY)
+        index.max_age = 0
+        index.refresh()
+        hashed = []
+        monkeypatch.setattr(ssh_key_index, "fingerprint", lambda key: hashed.append(key) or fingerprint(key))
+        client.ssh_keys.add_ssh_key("desktop", DESKTOP_KEY)
+
+        assert "desktop" in index
+        assert not index.refresh()
+        assert hashed == [DESKTOP_KEY]
+        assert index.refreshes == 3
+        assert len(index) == 2
+
+    def test_delete_by_name_and_fingerprint(self, fake, client, index):
+        laptop = client.ssh_keys.add_ssh_key("laptop", LAPTOP_KEY)["data"]
+        copy = client.ssh_keys.add_ssh_key("laptop-copy", LAPTOP_KEY)["data"]
+        desktop = client.ssh_keys.add_ssh_key("desktop", DESKTOP_KEY)["data"]
+        client.ssh_keys.add_ssh_key("kept", None)
+
+        result = index.delete(names=["desktop", "missing"], fingerprints=[fingerprint(LAPTOP_KEY)])
+
+        assert set(result.succeeded) == {laptop["id"], copy["id"], desktop["id"]}
+        assert list(result.failed) == ["missing"]
+        assert [record["name"] for record in fake.ssh_keys.values()] == ["kept"]
+        assert list(index._by_name) == ["kept"]
+        assert fake.calls["GET /v1/ssh-keys"] == 1
+
+    def test_deletes_are_sent_concurrently(self, fake, client, index):
+        ssh_key_ids = [client.ssh_keys.add_ssh_key(f"key-{number}", None)["data"]["id"] for number in range(6)]
+        index.refresh()
+        # every delete waits for all the others to be in flight, so sending them one by one breaks the barrier
+        barrier = threading.Barrier(len(ssh_key_ids), timeout=5)
+        delete = client.ssh_keys.delete_ssh_keys
+
+        def delete_together(ssh_key_id):
+            barrier.wait()
+            return delete(ssh_key_id)
+
+        client.ssh_keys.delete_ssh_keys = delete_together
+
+        result = index.delete(ids=ssh_key_ids)
+
+        assert result.ok
+        assert not fake.ssh_keys
@@ -9,7 +9,7 @@ from lambda_cloud.ssh_keys import LambdaCloudSshKey
 # Mock the request function
 @pytest.fixture(autouse=True)
 def mock_request():
-    with patch("lambda_cloud.ssh_keys.request") as mock:
+    with patch("requests.Session.request") as mock:
         yield mock
 
 
@@ -38,6 +38,7 @@ class TestLambdaCloudSshKey:
             "POST",
             "https://cloud.lambdalabs.com/api/v1/ssh-keys",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
             json=ssh,
         )
 
@@ -67,6 +68,7 @@ class TestLambdaCloudSshKey:
             "GET",
             "https://cloud.lambdalabs.com/api/v1/ssh-keys",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
         )
         assert result == ssh_response
 
@@ -86,5 +88,6 @@ class TestLambdaCloudSshKey:
             "DELETE",
             "https://cloud.lambdalabs.com/api/v1/ssh-keys/random_ssh_key_id",
             headers={"Authorization": "Bearer api_key"},
+            timeout=30,
         )
         assert result == ssh_response
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+import requests
+from requests import HTTPError
+import utilities
+from lambda_cloud.models import Instance
+from lambda_cloud.rate_limit import RetryPolicy
+from lambda_cloud.streaming import JsonArrayStream
+from utilities import get_json_backend, process_request, set_json_backend
+
+
+@pytest.fixture
+def fake(fake):
+    fake.seed_instances(25)
+    return fake
+
+
+@pytest.fixture
+def client_options():
+    return {"retry_policy": RetryPolicy(backoff=0.01)}
+
+
+# Test the JsonArrayStream class
+class TestJsonArrayStream:
+    def test_items_split_across_chunks(self):
+        records = [{"id": str(index), "name": "ünïcode ]}", "tags": [1, 2]} for index in range(5)]
+        body = json.dumps({"data": records}).encode("utf-8")
+        decoder = JsonArrayStream()
+
+        items = []
+        for start in range(0, len(body), 7):
+            items.extend(decoder.feed(body[start : start + 7]))
+        decoder.finish()
+
+        assert items == records
+
+    def test_empty_array(self):
+        decoder = JsonArrayStream()
+        assert decoder.feed(b'{"data" : [ ]}') == []
+        decoder.finish()
+
+    def test_truncated_body(self):
+        decoder = JsonArrayStream()
+        decoder.feed(b'{"data": [{"id": "a"}, {"id"')
+        with pytest.raises(ValueError):
+            decoder.finish()
+
+    def test_not_an_array(self):
+        with pytest.raises(ValueError):
+            JsonArrayStream().feed(b'{"data": {"id": "a"}}')
+
+
+class TestStreamingListing:
+    def test_matches_full_listing(self, client):
+        streamed = client.instances.get_all_instances(stream=True)
+
+        assert not isinstance(streamed, (dict, list))
+        assert list(streamed) == client.instances.get_all_instances()["data"]
+
+    def test_models(self, client):
+        instances = list(client.instances.get_all_instances(stream=True, models=True))
+
+        assert len(instances) == 25
+        assert all(isinstance(instance, Instance) for instance in instances)
+
+    def test_errors_are_raised(self, fake, client):
+        fake.fail_next(401, path="/v1/instances")
+
+        with pytest.raises(HTTPError):
+            list(client.instances.get_all_instances(stream=True))
+
+    def test_async(self, fake):
+        pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        async def run():
+            async with AsyncLambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=None) as client:
+                streamed = [record async for record in client.instances.get_all_instances(stream=True)]
+                return streamed, await client.instances.get_all_instances()
+
+        streamed, listing = asyncio.run(run())
+
+        assert streamed == listing["data"]
+
+
+class TestJsonBackend:
+    def test_default_prefers_orjson(self):
+        expected = "orjson" if utilities.orjson is not None else "json"
+        assert get_json_backend() == expected
+
+    def test_custom_backend(self, fake, client):
+        decoded = []
+
+        def loads(data):
+            decoded.append(data)
+            return json.loads(data)
+
+        previous = get_json_backend()
+        set_json_backend("recording", loads)
+        try:
+            client.ssh_keys.get_ssh_keys()
+        finally:
+            set_json_backend(previous)
+
+        assert [json.loads(data) for data in decoded] == [{"data": []}]
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            set_json_backend("simdjson")
+
+    def test_process_request_decodes_bytes(self, fake, client):
+        response = requests.get(f"{fake.base_url}/v1/ssh-keys", headers=client.ssh_keys.headers)
+        assert process_request(response) == response.json()
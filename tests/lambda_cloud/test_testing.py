@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from requests import HTTPError
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.rate_limit import RetryPolicy
+from lambda_cloud.testing import FakeLambdaCloud
+from utilities import error_code
+
+
+@pytest.fixture
+def client_options():
+    return {"retry_policy": RetryPolicy(backoff=0.01)}
+
+
+# Test the FakeLambdaCloud class through the real clients
+class TestFakeLambdaCloud:
+    def test_instance_lifecycle(self, fake, client):
+        client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+        launched = client.instances.launch_instance(
+            region_name="us-tx-1", instance_type_name="gpu_1x_a10", ssh_key_names=["macbook-pro"], quantity=2
+        )["data"]["instance_ids"]
+
+        active = client.instances.wait_for_status(launched, status="active", timeout=5)
+        assert all(record["ip"] for record in active.values())
+
+        restarted = client.instances.restart_instance(launched)["data"]["restarted_instances"]
+        assert {record["status"] for record in restarted} == {"booting"}
+
+        client.instances.terminate_instance(launched)
+        client.instances.wait_for_status(launched, status="terminated", timeout=5)
+        assert client.instances.get_all_instances() == {"data": []}
+        assert fake.calls["POST /v1/instance-operations/launch"] == 1
+
+    def test_capacity_scarcity(self, fake, client):
+        client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+        fake.set_capacity("gpu_8x_h100_sxm5", "us-tx-1", 1)
+
+        client.instances.launch_instance(
+            region_name="us-tx-1", instance_type_name="gpu_8x_h100_sxm5", ssh_key_names=["macbook-pro"], quantity=1
+        )
+        with pytest.raises(HTTPError) as raised:
+            client.instances.launch_instance(
+                region_name="us-tx-1",
+                instance_type_name="gpu_8x_h100_sxm5",
+                ssh_key_names=["macbook-pro"],
+                quantity=1,
+            )
+
+        assert error_code(raised.value) == "instance-operations/launch/insufficient-capacity"
+        regions = client.instances.get_instance_types()["data"]["gpu_8x_h100_sxm5"]["regions_with_capacity_available"]
+        assert "us-tx-1" not in [region["name"] for region in regions]
+
+    def test_rate_limit_is_retried_by_client(self):
+        with FakeLambdaCloud(rate_limit=(50, 1)) as fake:
+            client = LambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=None)
+            for _ in range(5):
+                client.file_systems.get_file_systems()
+
+        assert fake.calls["GET /v1/file-systems"] > 5
+
+    def test_injected_errors(self, fake, client):
+        fake.fail_next(503, count=2, path="/v1/ssh-keys")
+        assert client.ssh_keys.get_ssh_keys() == {"data": []}
+
+        fake.fail_next(503)
+        no_retries = LambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=None, retry_policy=None)
+        with pytest.raises(HTTPError):
+            no_retries.file_systems.get_file_systems()
+
+    def test_ssh_keys_and_file_systems(self, fake, client):
+        generated = client.ssh_keys.add_ssh_key("generated")["data"]
+        assert generated["private_key"]
+        fake.add_file_system("shared-fs")
+
+        assert [key["name"] for key in client.ssh_keys.get_ssh_keys()["data"]] == ["generated"]
+        assert [fs["name"] for fs in client.file_systems.get_file_systems()["data"]] == ["shared-fs"]
+
+        client.ssh_keys.delete_ssh_keys(generated["id"])
+        with pytest.raises(HTTPError):
+            client.ssh_keys.delete_ssh_keys(generated["id"])
+
+    def test_rejects_unknown_tokens(self):
+        with FakeLambdaCloud(tokens=["good"]) as fake:
+            client = LambdaCloudClient("bad", base_url=fake.base_url, retry_policy=RetryPolicy(max_retries=0))
+            with pytest.raises(HTTPError) as raised:
+                client.instances.get_all_instances()
+
+        assert raised.value.response.status_code == 401
+
+    def test_async_client(self, fake):
+        pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        fake.seed_instances(3)
+
+        async def run():
+            async with AsyncLambdaCloudClient(
+                "api_key", base_url=fake.base_url, rate_limiter=None, single_flight=None
+            ) as client:
+                return await asyncio.gather(*(client.instances.get_all_instances() for _ in range(5)))
+
+        listings = asyncio.run(run())
+
+        assert all(len(listing["data"]) == 3 for listing in listings)
+        assert fake.calls["GET /v1/instances"] == 5
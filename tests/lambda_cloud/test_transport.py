@@ -0,0 +1,132 @@
+import asyncio
+import gzip
+import time
+from types import SimpleNamespace
+
+import pytest
+from requests import HTTPError
+from lambda_cloud import transport
+from lambda_cloud.client import LambdaCloudClient
+from lambda_cloud.testing import FakeLambdaCloud
+from lambda_cloud.transport import RecordingTransport, ReplayTransport, load_cassette
+
+
+def record(path=None, **fake_options):
+    """
+    run a short session against a fake API and return the recorder
+    """
+    with FakeLambdaCloud(seed=1, **fake_options) as fake:
+        fake.seed_instances(3)
+        recorder = RecordingTransport(path)
+        with LambdaCloudClient("secret-token", base_url=fake.base_url, rate_limiter=None, transport=recorder) as client:
+            client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+            client.instances.get_all_instances()
+            client.instances.launch_instance("us-tx-1", "gpu_1x_a10", ["macbook-pro"], quantity=1)
+            client.instances.get_all_instances()
+            with pytest.raises(HTTPError):
+                client.instances.get_instance("missing")
+    if path is not None:
+        recorder.save()
+    return recorder
+
+
+OFFLINE_URL = "http://offline.invalid/api"
+
+
+def replay_client(transport):
+    return LambdaCloudClient("other-token", base_url=OFFLINE_URL, rate_limiter=None, transport=transport)
+
+
+# Test the RecordingTransport and ReplayTransport classes
+class TestTransport:
+    def test_replay_serves_recorded_session_offline(self, tmp_path):
+        cassette = str(tmp_path / "session.jsonl")
+        recorder = record(cassette)
+        replay = ReplayTransport(cassette)
+
+        with replay_client(replay) as client:
+            client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+            assert len(client.instances.get_all_instances()["data"]) == 3
+            client.instances.launch_instance("us-tx-1", "gpu_1x_a10", ["macbook-pro"], quantity=1)
+            assert len(client.instances.get_all_instances()["data"]) == 4
+            with pytest.raises(HTTPError) as raised:
+                client.instances.get_instance("missing")
+            assert not client._shared_session.built
+
+        assert raised.value.response.status_code == 404
+        assert replay.served == len(recorder.interactions) == 5
+        assert b"secret-token" not in (tmp_path / "session.jsonl").read_bytes()
+
+    def test_identical_requests_replay_in_order_then_repeat(self):
+        replay = ReplayTransport(record().interactions)
+
+        with replay_client(replay) as client:
+            counts = [len(client.instances.get_all_instances()["data"]) for _ in range(4)]
+
+        assert counts == [3, 4, 4, 4]
+
+    def test_unrecorded_requests_raise(self):
+        replay = ReplayTransport(record().interactions, repeat=False)
+
+        with replay_client(replay) as client:
+            with pytest.raises(KeyError):
+                client.instances.launch_instance("us-east-1", "gpu_1x_a10", ["macbook-pro"], quantity=1)
+            client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+            with pytest.raises(KeyError):
+                client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+
+    def test_compressed_cassette(self, tmp_path):
+        cassette = str(tmp_path / "session.jsonl.gz")
+        record(cassette)
+
+        assert gzip.decompress((tmp_path / "session.jsonl.gz").read_bytes()).count(b"\n") == 5
+        methods = [interaction["method"] for interaction in load_cassette(cassette)]
+        assert methods == ["POST", "GET", "POST", "GET", "GET"]
+
+    def test_recorded_timings(self, monkeypatch):
+        interactions = record(latency=0.05).interactions
+        assert all(interaction["seconds"] >= 0.05 for interaction in interactions)
+        sleeps = []
+        monkeypatch.setattr(transport, "time", SimpleNamespace(monotonic=time.monotonic, sleep=sleeps.append))
+
+        with replay_client(ReplayTransport(interactions, timing=True, speed=2)) as client:
+            client.instances.get_all_instances()
+        assert sleeps == [pytest.approx(interactions[1]["seconds"] / 2)]
+        with replay_client(ReplayTransport(interactions)) as client:
+            client.instances.get_all_instances()
+        assert len(sleeps) == 1
+
+    def test_streamed_listing_replays(self):
+        replay = ReplayTransport(record().interactions)
+
+        with replay_client(replay) as client:
+            assert len(list(client.instances.get_all_instances(stream=True))) == 3
+
+    def test_async_record_and_replay(self):
+        pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        async def session(client):
+            listing = await client.instances.get_all_instances()
+            streamed = [record async for record in client.instances.get_all_instances(stream=True)]
+            return len(listing["data"]), len(streamed)
+
+        with FakeLambdaCloud(seed=1) as fake:
+            fake.seed_instances(2)
+            recorder = RecordingTransport()
+
+            async def run_recording():
+                async with AsyncLambdaCloudClient(
+                    "token", base_url=fake.base_url, rate_limiter=None, single_flight=None, transport=recorder
+                ) as client:
+                    return await session(client)
+
+            recorded = asyncio.run(run_recording())
+
+        async def run_replay():
+            async with AsyncLambdaCloudClient(
+                "token", base_url=OFFLINE_URL, rate_limiter=None, transport=ReplayTransport(recorder.interactions)
+            ) as client:
+                return await session(client)
+
+        assert recorded == asyncio.run(run_replay()) == (2, 2)
@@ -0,0 +1,172 @@
+import time
+
+import pytest
+from requests import HTTPError
+from lambda_cloud.bulk import DEFAULT_MAX_ATTEMPTS
+from lambda_cloud.polling import AdaptiveInterval
+from lambda_cloud.warm_pool import WarmPool
+
+A10 = ("gpu_1x_a10", "us-tx-1")
+H100 = ("gpu_8x_h100_sxm5", "us-east-1")
+
+
+@pytest.fixture
+def fake_options():
+    return {"boot_seconds": 0.05}
+
+
+@pytest.fixture
+def client(client):
+    client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+    return client
+
+
+def warm_pool(client, sizes=None, **options):
+    options.setdefault("interval", AdaptiveInterval(minimum=0.01, maximum=0.05))
+    return WarmPool(client.instances, sizes or {A10: 2, H100: 1}, ["macbook-pro"], **options)
+
+
+def fill(pool):
+    pool.maintain()
+    time.sleep(0.06)
+    pool.maintain()
+
+
+# Test the WarmPool class
+class TestWarmPool:
+    def test_maintain_fills_each_pool_with_one_launch(self, fake, client):
+        pool = warm_pool(client)
+
+        fill(pool)
+
+        pools = pool.stats()["pools"]
+        assert (pools["gpu_1x_a10/us-tx-1"]["ready"], pools["gpu_8x_h100_sxm5/us-east-1"]["ready"]) == (2, 1)
+        assert fake.calls["POST /v1/instance-operations/launch"] == 2
+        assert pool.launched == 3
+
+    def test_hit_hands_out_an_active_instance_and_refills(self, fake, client):
+        pool = warm_pool(client)
+        fill(pool)
+
+        record = pool.acquire(*A10)
+        pool.maintain()
+
+        assert record["status"] == "active"
+        assert record["instance_type"]["name"] == "gpu_1x_a10"
+        stats = pool.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 0, 1.0)
+        assert stats["pools"]["gpu_1x_a10/us-tx-1"]["pending"] == 1
+
+    def test_miss_launches_and_waits(self, fake, client):
+        pool = warm_pool(client)
+
+        record = pool.acquire("gpu_1x_a100", "us-west-1")
+
+        assert record["status"] == "active"
+        stats = pool.stats()
+        assert stats["misses"] == 1
+        assert stats["wait_max"] >= 0.05
+        # demand for an unpooled type is tracked without keeping instances for it
+        assert stats["pools"]["gpu_1x_a100/us-west-1"]["target"] == 0
+
+    @pytest.mark.parametrize("fake", [{"boot_seconds": 5}], indirect=True)
+    def test_miss_that_times_out_terminates_its_instance(self, fake, client):
+        pool = warm_pool(client)
+
+        with pytest.raises(TimeoutError):
+            pool.acquire("gpu_1x_a100", "us-west-1", timeout=0.05)
+
+        (instance_id,) = fake.instances
+        assert fake.instances[instance_id]["status"] in ("terminating", "terminated")
+        assert pool.stats()["to_terminate"] == 0
+
+    def test_idle_instances_expire_and_demand_restores_the_pool(self, fake, client):
+        pool = warm_pool(client, {A10: 2}, ttl=0.05)
+        fill(pool)
+        time.sleep(0.06)
+
+        pool.maintain()
+        pool.maintain()
+
+        assert pool.expired == 2
+        assert fake.calls["POST /v1/instance-operations/terminate"] == 1
+        assert pool.stats()["pools"]["gpu_1x_a10/us-tx-1"]["pending"] == 0
+
+        pool.acquire(*A10)
+        pool.maintain()
+        assert pool.stats()["pools"]["gpu_1x_a10/us-tx-1"]["pending"] == 2
+
+    def test_idle_cost_ceiling(self, fake, client):
+        # 2792 cents an hour for the H100 passes a 0.01 cent ceiling within 0.013 seconds; the A10 needs 0.48
+        pool = warm_pool(client, max_idle_cents=0.01)
+        fill(pool)
+        time.sleep(0.02)
+
+        pool.maintain()
+
+        pools = pool.stats()["pools"]
+        assert pools["gpu_8x_h100_sxm5/us-east-1"]["ready"] == 0
+        assert pools["gpu_1x_a10/us-tx-1"]["ready"] == 2
+
+    def test_broken_instances_are_replaced(self, fake, client):
+        pool = warm_pool(client, {A10: 1})
+        pool.maintain()
+        (instance_id,) = [record["id"] for record in client.instances.get_all_instances()["data"]]
+        fake.set_instance_status(instance_id, "unhealthy")
+
+        pool.maintain()
+
+        assert pool.stats()["pools"]["gpu_1x_a10/us-tx-1"]["pending"] == 1
+        assert fake.calls["POST /v1/instance-operations/terminate"] == 1
+
+    def test_failed_terminations_are_sent_again(self, fake, client):
+        pool = warm_pool(client, {A10: 1})
+        pool.maintain()
+        (instance_id,) = fake.instances
+        fake.set_instance_status(instance_id, "unhealthy")
+        # every attempt of the first cycle fails
+        fake.fail_next(503, count=DEFAULT_MAX_ATTEMPTS, path="/v1/instance-operations/terminate")
+
+        pool.maintain()
+
+        assert pool.stats()["to_terminate"] == 1
+        assert fake.instances[instance_id]["status"] == "unhealthy"
+        pool.maintain()
+        assert pool.stats()["to_terminate"] == 0
+        assert instance_id not in fake.instances or fake.instances[instance_id]["status"] != "unhealthy"
+
+    def test_unlisted_launches_are_terminated_after_the_grace_period(self, fake, client):
+        pool = warm_pool(client, {A10: 0})
+        pool._slots[A10].pending["0920582c7ff041399e34823a0be62549"] = time.monotonic() - 120
+
+        pool.maintain()
+
+        assert fake.calls["POST /v1/instance-operations/terminate"] == 1
+        # the API does not know the id, so it is gone and nothing is left to retry
+        assert pool.stats()["to_terminate"] == 0
+
+    def test_failed_drain_keeps_the_instances(self, fake, client):
+        pool = warm_pool(client, {A10: 2})
+        fill(pool)
+        fake.fail_next(503, count=DEFAULT_MAX_ATTEMPTS, path="/v1/instance-operations/terminate")
+
+        with pytest.raises(HTTPError):
+            pool.drain()
+        assert pool.stats()["to_terminate"] == 2
+
+        assert len(pool.drain()) == 2
+        assert pool.stats()["to_terminate"] == 0
+
+    def test_background_refill_and_drain(self, fake, client):
+        with warm_pool(client, {A10: 1}) as pool:
+            deadline = time.monotonic() + 2
+            while pool.stats()["pools"]["gpu_1x_a10/us-tx-1"]["ready"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            acquired = pool.acquire(*A10)
+            while pool.stats()["pools"]["gpu_1x_a10/us-tx-1"]["ready"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert pool.stats()["hits"] == 1
+
+        assert not pool.running
+        # the acquired instance belongs to the caller and outlives the pool
+        assert [record["id"] for record in client.instances.get_all_instances()["data"]] == [acquired["id"]]
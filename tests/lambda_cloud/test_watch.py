@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from lambda_cloud.inventory import InventoryDiff
+from lambda_cloud.polling import AdaptiveInterval
+from lambda_cloud.watch import CREATED, GONE, IP_ASSIGNED, STATUS_CHANGED, InstanceWatcher, events_from_diff
+
+
+def record(instance_id, status, ip=None):
+    return {"id": instance_id, "status": status, "ip": ip}
+
+
+def fast_interval():
+    return AdaptiveInterval(minimum=0.01, maximum=0.05)
+
+
+@pytest.fixture
+def fake_options():
+    return {"boot_seconds": 0.1, "terminate_seconds": 0.1}
+
+
+def launch(client, quantity=1):
+    client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+    return client.instances.launch_instance(
+        region_name="us-tx-1", instance_type_name="gpu_1x_a10", ssh_key_names=["macbook-pro"], quantity=quantity
+    )["data"]["instance_ids"]
+
+
+# Test the InstanceWatcher class
+class TestInstanceWatcher:
+    def test_events_from_diff(self):
+        diff = InventoryDiff()
+        diff.added.append(record("a", "booting"))
+        diff.changed.append((record("b", "booting"), record("b", "active", "10.0.0.1")))
+        diff.changed.append((record("c", "active", "10.0.0.2"), record("c", "active", "10.0.0.3")))
+        diff.removed.append(record("d", "terminating"))
+
+        events = events_from_diff(diff)
+
+        assert [(event.kind, event.instance_id) for event in events] == [
+            (CREATED, "a"),
+            (STATUS_CHANGED, "b"),
+            (IP_ASSIGNED, "b"),
+            (GONE, "d"),
+        ]
+        assert (events[1].previous_status, events[1].status) == ("booting", "active")
+        assert (events[3].previous_status, events[3].status) == ("terminating", "terminated")
+
+    def test_poll_publishes_to_callbacks(self, fake, client):
+        watcher = InstanceWatcher(client.instances)
+        seen = []
+        watcher.subscribe(seen.append)
+
+        assert watcher.poll() == []
+        (instance_id,) = launch(client)
+        watcher.poll()
+        fake.set_instance_status(instance_id, "unhealthy")
+        watcher.poll()
+
+        assert [(event.kind, event.status) for event in seen] == [(CREATED, "booting"), (STATUS_CHANGED, "unhealthy")]
+
+    def test_failing_callback_does_not_stop_others(self, client):
+        watcher = InstanceWatcher(client.instances, emit_existing=True)
+        seen = []
+
+        @watcher.subscribe
+        def broken(event):
+            raise RuntimeError("consumer down")
+
+        watcher.subscribe(seen.append)
+        launch(client)
+        watcher.poll()
+
+        assert [event.kind for event in seen] == [CREATED]
+
+    def test_iterators_share_one_poll_loop(self, fake, client):
+        launched = launch(client, quantity=2)
+        watcher = InstanceWatcher(client.instances, interval=fast_interval())
+        first, second = watcher.events(timeout=2), watcher.events(timeout=2)
+
+        with watcher:
+            events = [next(first) for _ in range(4)]
+            client.instances.terminate_instance(launched)
+            kinds = set()
+            for event in second:
+                kinds.add(event.kind)
+                if event.kind == GONE and event.instance_id == launched[-1]:
+                    break
+
+        assert {event.kind for event in events} == {STATUS_CHANGED, IP_ASSIGNED}
+        assert kinds == {STATUS_CHANGED, IP_ASSIGNED, GONE}
+        assert not watcher.running
+        # after stop, open iterators drain what was published and end
+        assert GONE in {event.kind for event in first}
+
+    def test_async_iterator(self, fake):
+        pytest.importorskip("httpx")
+        from lambda_cloud.client import AsyncLambdaCloudClient
+
+        async def run():
+            async with AsyncLambdaCloudClient("api_key", base_url=fake.base_url, rate_limiter=None) as client:
+                await client.ssh_keys.add_ssh_key("macbook-pro", "ssh-ed25519 AAAA user")
+                watcher = InstanceWatcher(client.instances, interval=fast_interval())
+                events = []
+                subscription = watcher.events_async(timeout=2)
+                await asyncio.sleep(0.05)
+                await client.instances.launch_instance(
+                    region_name="us-tx-1", instance_type_name="gpu_1x_a10", ssh_key_names=["macbook-pro"], quantity=1
+                )
+                async for event in subscription:
+                    events.append(event.kind)
+                    if event.kind == IP_ASSIGNED:
+                        break
+                watcher.stop()
+                return events
+
+        assert asyncio.run(run()) == [CREATED, STATUS_CHANGED, IP_ASSIGNED]
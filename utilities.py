@@ -1,4 +1,64 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: pip install 'lambdacloudwrapper[fast]'
+    orjson = None
+
+JSON_BACKENDS = {"json": json.loads}  # type: Dict[str, Callable[[Any], Any]]
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = orjson.loads
+
+_json_backend = "orjson" if orjson is not None else "json"
+_loads = JSON_BACKENDS[_json_backend]
+
+
+def set_json_backend(name: str, loads: Callable[[Any], Any] = None):
+    """
+    choose the decoder for response bodies. orjson is used when installed, the stdlib json otherwise
+    :param name: name of a registered backend, or of a new one when loads is given
+    :param loads: function decoding bytes into Python objects, to register a backend of your own
+    """
+    global _json_backend, _loads
+    if loads is not None:
+        JSON_BACKENDS[name] = loads
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"unknown JSON backend {name!r}, expected one of {sorted(JSON_BACKENDS)}")
+    _json_backend, _loads = name, JSON_BACKENDS[name]
+
+
+def get_json_backend() -> str:
+    """
+    :return: name of the decoder used for response bodies
+    """
+    return _json_backend
+
+
+def loads(data) -> Any:
+    """
+    decode JSON with the current backend
+    :param data: JSON document as bytes or str
+    """
+    return _loads(data)
+
+
 def process_request(request_obj):
     if 200 <= request_obj.status_code <= 299:
-        return request_obj.json()
+        return _loads(request_obj.content)
     return request_obj.raise_for_status()
+
+
+def error_code(error) -> Optional[str]:
+    """
+    read the API error code, e.g. instance-operations/launch/insufficient-capacity, from a raised HTTPError
+    :param error: exception raised by process_request
+    :return: the error code, or None when the response carries none
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return response.json()["error"]["code"]
+    except (ValueError, KeyError, TypeError):
+        return None